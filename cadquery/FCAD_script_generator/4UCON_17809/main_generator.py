@@ -111,7 +111,7 @@ from Gui.Command import *
 import cq_cad_tools
 reload(cq_cad_tools)
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
- exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors, \
+ exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors, compoundObjs_wColors, \
  checkRequirements
 
 Gui.activateWorkbench("CadQueryWorkbench")
@@ -213,11 +213,11 @@ def export_one_part(modul, variant):
 
 
     scale=1/2.54
-    colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+    colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
 
     expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, L.LIST_int_license)
 
-    fusion = multiFuseObjs_wColors(FreeCAD, FreeCADGui,
+    fusion = compoundObjs_wColors(FreeCAD, FreeCADGui,
                      ModelName, objs, keepOriginals=True)
 
     exportSTEP(doc,FileName,out_dir,fusion)
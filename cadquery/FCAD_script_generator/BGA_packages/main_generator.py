@@ -57,8 +57,9 @@ import argparse
 global save_memory
 save_memory=False #reducing memory consuming for all generation params
 
-from math import tan, radians, sqrt
+from math import tan, radians, sqrt, sin, cos
 from collections import namedtuple
+from itertools import chain
 
 import sys, os
 import datetime
@@ -108,7 +109,8 @@ reload(cq_cad_tools)
 # Explicitly load all needed functions
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, exportVRML, saveFCdoc, z_RotateObject, Color_Objects, \
- CutObjs_wColors, checkRequirements
+ CutObjs_wColors, checkRequirements, profileStage, setProfileVariant
+from cq_helpers import union_all
 
 try:
     # Gui.SendMsgToActiveView("Run")
@@ -166,6 +168,57 @@ def make_plg(wp, rw, rh, cv1, cv):
     #return wp.polyline(points).wire() #, forConstruction=True)
 ##
 
+def make_ball(params):
+    """ one ball, centered on the origin in x and y """
+    b   = params.b
+    sp   = params.sp
+    sphere_r = b/2 *(1.05) #added extra 0.5% diameter for fusion
+    s_center =(0,0,0)
+    sphere = cq.Workplane("XY", s_center). \
+             sphere(sphere_r)
+    return sphere.translate((0,0,b/2-sp))
+
+def ball_positions(params):
+    """ (x, y) of every ball of the package, before the 180 deg rotation of make_case """
+    e   = params.e
+    npx = params.npx
+    npy = params.npy
+    if params.excluded_pins is not None:
+        epl = list(params.excluded_pins)
+        #expVRML.say(epl)
+        i=0
+        for i in range (0, len(epl)):           
+            if isinstance(epl[i], ( int, long )):
+                epl[i]=str(int(epl[i]))
+                i=i+1
+        excluded_pins=tuple(epl)
+        #expVRML.say(excluded_pins)
+        #stop
+    else:
+        excluded_pins=() ##no pin excluded 
+
+    positions = []
+    pincounter = 1
+    first_pos_x = (npx-1)*e/2
+    for j in range(npy):
+        for i in range(npx):
+            if "internals" in excluded_pins:
+                if str(int(pincounter)) not in excluded_pins:
+                    if j==0 or j==npy-1 or i==0 or i==npx-1:
+                        positions.append((first_pos_x-i*e, (npy*e/2-e/2)-j*e))
+            elif str(int(pincounter)) not in excluded_pins:
+                positions.append((first_pos_x-i*e, (npy*e/2-e/2)-j*e))
+                #expVRML.say(j)
+            pincounter += 1
+    return positions
+
+def ball_placements(params):
+    """ placements of the balls in the exported model (see expVRML.MeshInstances):
+    the 180 deg rotation of make_case plus the rotation of the variant """
+    angle = radians(180 + params.rotation)
+    c, s = cos(angle), sin(angle)
+    return [((c*x - s*y, s*x + c*y, 0.0), (0, 0, 1), angle) for x, y in ball_positions(params)]
+
 def make_case(params):
 
     ef  = params.ef
@@ -194,52 +247,18 @@ def make_case(params):
     if cf is None:
         cf = cff
         
-    if params.excluded_pins is not None:
-        epl = list(params.excluded_pins)
-        #expVRML.say(epl)
-        i=0
-        for i in range (0, len(epl)):           
-            if isinstance(epl[i], ( int, long )):
-                epl[i]=str(int(epl[i]))
-                i=i+1
-        excluded_pins=tuple(epl)
-        #expVRML.say(excluded_pins)
-        #stop
-    else:
-        excluded_pins=() ##no pin excluded 
-
-        
-    sphere_r = b/2 *(1.05) #added extra 0.5% diameter for fusion
-    s_center =(0,0,0)
-    sphere = cq.Workplane("XY", s_center). \
-             sphere(sphere_r)
-    bpin=sphere.translate((0,0,b/2-sp))
+    bpin = make_ball(params)
 
     pins = []
     # create top, bottom side pins
-    pincounter = 1
-    first_pos_x = (npx-1)*e/2
-    for j in range(npy):
-        for i in range(npx):
-            if "internals" in excluded_pins:
-                if str(int(pincounter)) not in excluded_pins:
-                    if j==0 or j==npy-1 or i==0 or i==npx-1:
-                        pin = bpin.translate((first_pos_x-i*e, (npy*e/2-e/2)-j*e, 0)).\
-                                rotate((0,0,0), (0,0,1), 180)
-                        pins.append(pin)
-            elif str(int(pincounter)) not in excluded_pins:
-                pin = bpin.translate((first_pos_x-i*e, (npy*e/2-e/2)-j*e, 0)).\
-                        rotate((0,0,0), (0,0,1), 180)
-                pins.append(pin)
-                #expVRML.say(j)
-            pincounter += 1
-    expVRML.say(pincounter-1)
+    for x, y in ball_positions(params):
+        pin = bpin.translate((x, y, 0)).\
+                rotate((0,0,0), (0,0,1), 180)
+        pins.append(pin)
+    expVRML.say(params.npx*params.npy)
 
     # merge all pins to a single object
-    merged_pins = pins[0]
-    for p in pins[1:]:
-        merged_pins = merged_pins.union(p)
-    pins = merged_pins
+    pins = union_all(pins)
 
     # first pin indicator is created with a spherical pocket
     if fp_r == 0:
@@ -356,6 +375,7 @@ if __name__ == "__main__" or __name__ == "main_generator":
     models_dir=sub_path+"_3Dmodels"
 
     color_pin_mark=True
+    instance_pins=False
     if len(sys.argv) < 3:
         FreeCAD.Console.PrintMessage('No variant name is given! building BGA-48_6x8_8.0x9.0mm_Pitch0.8mm')
         model_to_build='BGA-48_6x8_8.0x9.0mm_Pitch0.8mm'
@@ -367,6 +387,8 @@ if __name__ == "__main__" or __name__ == "main_generator":
                 color_pin_mark=False
             else:
                 color_pin_mark=True
+            # one tessellated ball written with DEF/USE in the VRML file
+            instance_pins = sys.argv[3].find('instance-pins')!=-1
 
 
     save_memory=False #reducing memory consuming for all generation params
@@ -376,6 +398,8 @@ if __name__ == "__main__" or __name__ == "main_generator":
     else:
         variants = [model_to_build]
 
+    # one document per variant, the previous one is closed
+    doc_pool = cq_cad_tools.DocumentPool(App, Gui)
     for variant in variants:
         excluded_pins_x=() ##no pin excluded
         excluded_pins_xmirror=() ##no pin excluded
@@ -387,11 +411,11 @@ if __name__ == "__main__" or __name__ == "main_generator":
             continue
         ModelName = all_params[variant].modelName
         CheckedModelName = ModelName.replace('.', '').replace('-', '_').replace('(', '').replace(')', '')
-        Newdoc = App.newDocument(CheckedModelName)
-        App.setActiveDocument(CheckedModelName)
-        Gui.ActiveDocument=Gui.getDocument(CheckedModelName)
+        Newdoc = doc_pool.newDocument(CheckedModelName)
+        setProfileVariant(ModelName)
         #case, pins, pinmark = make_case(all_params[variant])
-        case_bot, case, pins, pinmark = make_case(all_params[variant])
+        with profileStage('make_case'):
+            case_bot, case, pins, pinmark = make_case(all_params[variant])
 
         if case_bot is not None:
             show(case_bot)
@@ -504,7 +528,15 @@ if __name__ == "__main__" or __name__ == "main_generator":
         expVRML.say("######################################################################")
         export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
         export_file_name=out_dir+os.sep+ModelName+'.wrl'
-        colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+        # the balls are the only faces of the pins color, unless the body or mark share it
+        if instance_pins and pins_color_key not in (body_color_key, marking_color_key):
+            # the ball faces are left out before tessellation, one ball is tessellated instead
+            colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale, skip_colors=(pins_color_key,))
+            balls = expVRML.getInstancedMesh(make_ball(all_params[variant]).toFreecad(),
+                                  ball_placements(all_params[variant]), pins_color_key, 0.0, scale, 'BGA-BALL')
+            colored_meshes = chain(colored_meshes, [balls])
+        else:
+            colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
         #expVRML.writeVRMLFile added creaeAngle
         expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license, 0.9)
         # Save the doc in Native FC format
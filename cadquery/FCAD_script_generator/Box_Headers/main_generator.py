@@ -290,7 +290,7 @@ def MakeHeader(n):
     expVRML.say("######################################################################")
     export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
     export_file_name=out_dir+os.sep+name+'.wrl'
-    colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+    colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
     expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
 
     ###save the VRML file
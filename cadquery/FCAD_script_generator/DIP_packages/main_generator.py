@@ -103,6 +103,7 @@ reload(cq_cad_tools)
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, exportVRML, saveFCdoc, z_RotateObject, Color_Objects, \
  CutObjs_wColors, checkRequirements
+from cq_helpers import union_all
 
 try:
     # Gui.SendMsgToActiveView("Run")
@@ -459,12 +460,6 @@ def make_dip(params):
 
     pins.append(pinl)
 
-    def union_all(objects):
-        o = objects[0]
-        for i in range(1,len(objects)):
-            o = o.union(objects[i])
-        return o
-
     # union all pins
     pins = union_all(pins)
 
@@ -702,7 +697,7 @@ if __name__ == "__main__" or __name__ == "main_generator":
         expVRML.say("######################################################################")
         export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
         export_file_name=out_dir+os.sep+ModelName+'.wrl'
-        colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+        colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
         #expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys)# , LIST_license
         expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
         #scale=0.3937001
@@ -115,6 +115,7 @@ reload(cq_cad_tools)
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, exportVRML, saveFCdoc, z_RotateObject, Color_Objects, \
  CutObjs_wColors, checkRequirements
+from cq_helpers import union_all
 
 try:
     # Gui.SendMsgToActiveView("Run")
@@ -320,10 +321,7 @@ def make_gw(params):
             #extrude(A1+A1/10)
             pins.append(epad)
     # merge all pins to a single object
-    merged_pins = pins[0]
-    for p in pins[1:]:
-        merged_pins = merged_pins.union(p)
-    pins = merged_pins
+    pins = union_all(pins)
 
     # extract pins from case
     case = case.cut(pins)
@@ -380,6 +378,8 @@ if __name__ == "__main__" or __name__ == "main_generator":
     else:
         variants = [model_to_build]
 
+    # one document per variant, the previous one is closed
+    doc_pool = cq_cad_tools.DocumentPool(App, Gui)
     for variant in variants:
         place_pinMark=True ##default =True used to exclude pin mark to build sot23-3; sot23-5; sc70 (asimmetrical pins, no pinmark)
 
@@ -389,9 +389,7 @@ if __name__ == "__main__" or __name__ == "main_generator":
             continue
         ModelName = all_params[variant].modelName
         CheckedModelName = ModelName.replace('.', '').replace('-', '_').replace('(', '').replace(')', '')
-        Newdoc = App.newDocument(CheckedModelName)
-        App.setActiveDocument(CheckedModelName)
-        Gui.ActiveDocument=Gui.getDocument(CheckedModelName)
+        Newdoc = doc_pool.newDocument(CheckedModelName)
         body, pins, mark = make_gw(all_params[variant])
 
         show(body)
@@ -458,7 +456,7 @@ if __name__ == "__main__" or __name__ == "main_generator":
         expVRML.say("######################################################################")
         export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
         export_file_name=out_dir+os.sep+ModelName+'.wrl'
-        colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+        colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
         expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
         # Save the doc in Native FC format
         if footprints_dir is not None and os.path.isdir(footprints_dir):
@@ -111,7 +111,7 @@ reload(cq_cad_tools)
 # Explicitly load all needed functions
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, exportVRML, saveFCdoc, z_RotateObject, Color_Objects, \
- CutObjs_wColors, checkRequirements
+ CutObjs_wColors, checkRequirements, profileStage, setProfileVariant
 
 
 # from export_x3d import exportX3D, Mesh
@@ -234,6 +234,7 @@ def MakeHeader(n, params):
     
     global LIST_license
     name = HeaderName(n,params)
+    setProfileVariant(name)
     
     destination_dir="/Pin_Headers"
     
@@ -262,14 +263,15 @@ def MakeHeader(n, params):
     App.setActiveDocument(docname)
     Gui.ActiveDocument=Gui.getDocument(docname)
     
-    pins = MakePinRow(n,1,params)
-    
-    #duplicate pin rows
-    if params.rows > 1:
-        for i in range(1,params.rows):
-            pins = pins.union(MakePinRow(n,i,params).translate((0,i*params.p,0)))
-    
-    base = MakeBase(n,params)
+    with profileStage('make_header'):
+        pins = MakePinRow(n,1,params)
+
+        #duplicate pin rows
+        if params.rows > 1:
+            for i in range(1,params.rows):
+                pins = pins.union(MakePinRow(n,i,params).translate((0,i*params.p,0)))
+
+        base = MakeBase(n,params)
         
     show(base)
     show(pins)
@@ -330,7 +332,7 @@ def MakeHeader(n, params):
     expVRML.say("######################################################################")
     export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
     export_file_name=out_dir+os.sep+name+'.wrl'
-    colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+    colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
     expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
 
     #save the VRML file
@@ -72,9 +72,11 @@ marking_color_key = "light brown label"
 marking_color = shaderColors.named_colors[marking_color_key].getDiffuseFloat()
 
 # maui start
-import FreeCAD, Draft, FreeCADGui
-import ImportGui
-import FreeCADGui as Gui
+import FreeCAD, Draft
+if FreeCAD.GuiUp:
+    import FreeCADGui
+    import ImportGui
+    import FreeCADGui as Gui
 #from Gui.Command import *
 
 
@@ -103,35 +105,47 @@ reload(cq_cad_tools)
 # Explicitly load all needed functions
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, exportVRML, saveFCdoc, z_RotateObject, Color_Objects, \
- CutObjs_wColors, checkRequirements
-
-try:
-    # Gui.SendMsgToActiveView("Run")
-    from Gui.Command import *
-    Gui.activateWorkbench("CadQueryWorkbench")
-    import cadquery as cq
-    from Helpers import show
-    # CadQuery Gui
-except: # catch *all* exceptions
-    msg="missing CadQuery 0.3.0 or later Module!\r\n\r\n"
-    msg+="https://github.com/jmwright/cadquery-freecad-module/wiki\n"
-    reply = QtGui.QMessageBox.information(None,"Info ...",msg)
-    # maui end
+ CutObjs_wColors, checkRequirements, profileStage, setProfileVariant
+from cq_helpers import union_all
+# headless (FreeCADCmd) export
+import cq_headless
+from cq_headless import coloredPart, cutParts, fuseParts, rotateParts, \
+ exportSTEPheadless, exportVRMLheadless
+
+if FreeCAD.GuiUp:
+    try:
+        # Gui.SendMsgToActiveView("Run")
+        from Gui.Command import *
+        Gui.activateWorkbench("CadQueryWorkbench")
+        import cadquery as cq
+        from Helpers import show
+        # CadQuery Gui
+    except: # catch *all* exceptions
+        msg="missing CadQuery 0.3.0 or later Module!\r\n\r\n"
+        msg+="https://github.com/jmwright/cadquery-freecad-module/wiki\n"
+        reply = QtGui.QMessageBox.information(None,"Info ...",msg)
+        # maui end
+else:
+    cq = cq_headless.importCadQuery()
 
 #checking requirements
 checkRequirements(cq)
 
-try:
-    close_CQ_Example(App, Gui)
-except: # catch *all* exceptions
-    print "CQ 030 doesn't open example file"
+if FreeCAD.GuiUp:
+    try:
+        close_CQ_Example(App, Gui)
+    except: # catch *all* exceptions
+        print "CQ 030 doesn't open example file"
 
-import cq_parameters  # modules parameters
-from cq_parameters import *
+# the Params of a variant are only built when it is looked up
+import param_registry
+cq_parameters = param_registry.loadModule('cq_parameters')  # modules parameters
+kicad_naming_params_qfn = cq_parameters.kicad_naming_params_qfn
+destination_dir = cq_parameters.destination_dir
 
-footprints_dir_diodes=None
-import cq_parameters_diode  # modules parameters
-from cq_parameters_diode import *
+cq_parameters_diode = param_registry.loadModule('cq_parameters_diode')  # modules parameters
+kicad_naming_params_diode = cq_parameters_diode.kicad_naming_params_diode
+footprints_dir_diodes = cq_parameters_diode.footprints_dir_diodes
 
 #   all_params= all_params_qfn
 all_params= kicad_naming_params_qfn.copy()
@@ -336,10 +350,7 @@ def make_qfn(params):
             pins.append(epad)
 
     # merge all pins to a single object
-    merged_pins = pins[0]
-    for p in pins[1:]:
-        merged_pins = merged_pins.union(p)
-    pins = merged_pins
+    pins = union_all(pins)
 
     #show(pins)
     #sleep
@@ -348,8 +359,54 @@ def make_qfn(params):
 
     return (case, pins, pinmark)
 
+def make_qfn_parts(params, ModelName):
+    """ body, pins and pin 1 mark of a variant as colored shapes,
+    the mark is None when it is not colored """
+
+    case, pins, pinmark = make_qfn(params)
+    body = coloredPart(ModelName+'__body', case, body_color_key)
+    pins = coloredPart(ModelName+'__pins', pins, pins_color_key)
+    mark = None
+    if (color_pin_mark==True) and (place_pinMark==True):
+        mark = coloredPart(ModelName+'__mark', pinmark, marking_color_key)
+    return body, pins, mark
+
+def make_model(params, ModelName):
+    """ the colored model of a variant, built at shape level:
+    pin mark cut into the body, fused with the pins and rotated """
+
+    with profileStage('make_qfn') as stage:
+        body, pins, mark = make_qfn_parts(params, ModelName)
+        stage.shape(body)
+        stage.shape(pins)
+    with profileStage('booleans') as stage:
+        if mark is not None:
+            body = cutParts(body, mark)
+        model = fuseParts([body, pins], ModelName)
+        #rotate if required
+        if (params.rotation!=0):
+            model, = rotateParts([model], params.rotation)
+        stage.shape(model)
+    return model
+
+def export_headless(params, ModelName, out_dir, LIST_license):
+    """ build and export one variant without FreeCADGui (FreeCADCmd) """
+
+    model = make_model(params, ModelName)
+    with profileStage('exportSTEP') as stage:
+        exportSTEPheadless([model], ModelName, out_dir)
+        stage.output(out_dir+os.sep+ModelName+'.step')
+    with profileStage('addLicenseToStep'):
+        Lic.addLicenseToStep(out_dir+'/', ModelName+".step", LIST_license,\
+                           STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licOrg, STR_licPreProc)
+    with profileStage('exportVRML') as stage:
+        exportVRMLheadless([model], ModelName, out_dir, LIST_license)
+        stage.shape(model)
+        stage.output(out_dir+os.sep+ModelName+'.wrl')
+
 #import step_license as L
 import add_license as Lic
+import cq_cache
 
 # when run from command line
 if __name__ == "__main__" or __name__ == "main_generator":
@@ -393,6 +450,8 @@ if __name__ == "__main__" or __name__ == "main_generator":
     else:
         variants = [model_to_build]
 
+    # one document per variant, the previous one is closed
+    doc_pool = cq_cad_tools.DocumentPool(App, Gui if FreeCAD.GuiUp else None)
     for variant in variants:
         excluded_pins_x=() ##no pin excluded
         excluded_pins_xmirror=() ##no pin excluded
@@ -404,60 +463,6 @@ if __name__ == "__main__" or __name__ == "main_generator":
             continue
         ModelName = all_params[variant].modelName
         CheckedModelName = ModelName.replace('.', '').replace('-', '_').replace('(', '').replace(')', '')
-        Newdoc = App.newDocument(CheckedModelName)
-        App.setActiveDocument(CheckedModelName)
-        Gui.ActiveDocument=Gui.getDocument(CheckedModelName)
-        case, pins, pinmark = make_qfn(all_params[variant])
-
-        show(case)
-        show(pins)
-        show(pinmark)
-        #stop
-        
-        doc = FreeCAD.ActiveDocument
-        objs=GetListOfObjects(FreeCAD, doc)
-
-        Color_Objects(Gui,objs[0],body_color)
-        Color_Objects(Gui,objs[1],pins_color)
-        Color_Objects(Gui,objs[2],marking_color)
-
-        col_body=Gui.ActiveDocument.getObject(objs[0].Name).DiffuseColor[0]
-        col_pin=Gui.ActiveDocument.getObject(objs[1].Name).DiffuseColor[0]
-        col_mark=Gui.ActiveDocument.getObject(objs[2].Name).DiffuseColor[0]
-        material_substitutions={
-            col_body[:-1]:body_color_key,
-            col_pin[:-1]:pins_color_key,
-            col_mark[:-1]:marking_color_key
-        }
-        expVRML.say(material_substitutions)
-        ## objs[0].Label='body'
-        ## objs[1].Label='pins'
-        ## objs[2].Label='mark'
-        ###
-        ## print objs[0].Name, objs[1].Name, objs[2].Name
-
-        ## sleep
-        #if place_pinMark==True:
-        if (color_pin_mark==True) and (place_pinMark==True):
-            CutObjs_wColors(FreeCAD, FreeCADGui,
-                           doc.Name, objs[0].Name, objs[2].Name)
-        else:
-            #removing pinMark
-            App.getDocument(doc.Name).removeObject(objs[2].Name)
-        ###
-        #sleep
-        del objs
-        objs=GetListOfObjects(FreeCAD, doc)
-        FuseObjs_wColors(FreeCAD, FreeCADGui,
-                        doc.Name, objs[0].Name, objs[1].Name)
-        doc.Label=CheckedModelName
-        objs=GetListOfObjects(FreeCAD, doc)
-        objs[0].Label=CheckedModelName
-        restore_Main_Tools()
-        #rotate if required
-        if (all_params[variant].rotation!=0):
-            rot= all_params[variant].rotation
-            z_RotateObject(doc, rot)
         #out_dir=destination_dir+all_params[variant].dest_dir_prefix+'/'
         script_dir=os.path.dirname(os.path.realpath(__file__))
         #models_dir=script_dir+"/../_3Dmodels"
@@ -468,14 +473,39 @@ if __name__ == "__main__" or __name__ == "main_generator":
             out_dir=models_dir+destination_dir
         if not os.path.exists(out_dir):
             os.makedirs(out_dir)
-        #out_dir="./generated_qfp/"
-        # export STEP model
-        exportSTEP(doc, ModelName, out_dir)
         if LIST_license[0]=="":
             LIST_license=Lic.LIST_int_license
             LIST_license.append("")
-        Lic.addLicenseToStep(out_dir+'/', ModelName+".step", LIST_license,\
-                           STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licOrg, STR_licPreProc)
+        # skip the build when the variant, its code and the tools are unchanged
+        cache_key = cq_cache.modelKey(all_params[variant], [__file__],
+                                      (color_pin_mark, FreeCAD.GuiUp, cq_cad_tools.save_fcstd, LIST_license,
+                                       STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licOrg, STR_licPreProc))
+        setProfileVariant(ModelName)
+        if cq_cache.fetchModel(cache_key, ModelName, out_dir):
+            expVRML.say(ModelName+' unchanged, copied from the model cache')
+            continue
+        if not FreeCAD.GuiUp:
+            export_headless(all_params[variant], ModelName, out_dir, LIST_license)
+            cq_cache.storeModel(cache_key, ModelName, out_dir, ['.step', '.wrl'])
+            continue
+        Newdoc = doc_pool.newDocument(CheckedModelName)
+        doc = FreeCAD.ActiveDocument
+        # the pin mark is cut and the parts fused before entering the document
+        model = make_model(all_params[variant], ModelName)
+        with profileStage('showColoredParts'):
+            objs, material_substitutions = cq_cad_tools.showColoredParts(FreeCAD, Gui, doc.Name, [model])
+        expVRML.say(material_substitutions)
+        doc.Label=CheckedModelName
+        objs[0].Label=CheckedModelName
+        restore_Main_Tools()
+        #out_dir="./generated_qfp/"
+        # export STEP model
+        with profileStage('exportSTEP') as stage:
+            exportSTEP(doc, ModelName, out_dir)
+            stage.output(out_dir+os.sep+ModelName+'.step')
+        with profileStage('addLicenseToStep'):
+            Lic.addLicenseToStep(out_dir+'/', ModelName+".step", LIST_license,\
+                               STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licOrg, STR_licPreProc)
 
         # scale and export Vrml model
         scale=1/2.54
@@ -484,13 +514,21 @@ if __name__ == "__main__" or __name__ == "main_generator":
         expVRML.say("######################################################################")
         expVRML.say(objs)
         expVRML.say("######################################################################")
-        export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
+        with profileStage('determineColors'):
+            export_objects, used_color_keys = expVRML.determineColors(Gui, objs, material_substitutions)
         export_file_name=out_dir+os.sep+ModelName+'.wrl'
-        colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
-        #expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys)# , LIST_license
-        expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
+        # tessellation and writing are interleaved, one stage
+        with profileStage('exportVRML') as stage:
+            colored_meshes = stage.meshes(expVRML.iterColoredMesh(Gui, export_objects , scale))
+            #expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys)# , LIST_license
+            expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
+            stage.output(export_file_name)
         # Save the doc in Native FC format
-        saveFCdoc(App, Gui, doc, ModelName,out_dir)
+        with profileStage('saveFCdoc') as stage:
+            saveFCdoc(App, Gui, doc, ModelName,out_dir)
+            stage.output(out_dir+os.sep+ModelName+'.FCStd')
+        cq_cache.storeModel(cache_key, ModelName, out_dir,
+                            ['.step', '.wrl'] + (['.FCStd'] if cq_cad_tools.save_fcstd else []))
         #display BBox
         #FreeCADGui.ActiveDocument.getObject("Part__Feature").BoundingBox = True
         Gui.activateWorkbench("PartWorkbench")
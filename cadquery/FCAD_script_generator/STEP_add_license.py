@@ -4,6 +4,7 @@
 features
 - select a folder with your step files
 - the script will inject license details in all step files in the selected folder
+- a whole library tree can be relicensed without FreeCAD with _tools/relicense_steps.py
 '''
 
 __version__=1.5
@@ -15,7 +16,7 @@ import sys, os
 from collections import namedtuple
 
 import shutil
-import hashlib, pyparsing
+import hashlib
 import datetime
 from datetime import datetime
 from os.path import expanduser
@@ -42,11 +43,17 @@ sys.path.append(PATH_FREECADBIN)
 # say(sys.path)
 # import step_license
 # from step_licence import *
+# the STEP rewriter is shared with the generators
+try:
+    sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "_tools"))
+except NameError: # run as macro, no __file__
+    sys.path.append("_tools")
 
 
 import FreeCAD, Import, FreeCADGui, ImportGui, Mesh
 import PySide
 from PySide import QtGui, QtCore
+from add_license import addLicenseToStep
 
 #PATH_toStepFiles = "C:/Cad/Progetti_K/a_mod/a_3Dpkg"
 PATH_toStepFiles = "C:\\Temp\\FCAD_script_generator\\generated_cap"
@@ -86,136 +93,6 @@ LIST_license = ["Copyright (C) "+datetime.now().strftime("%Y")+", " + STR_licAut
                 "If you do not wish to do so, delete this exception statement from your version",
                 ]
 
-def FNCT_modify_step(PMBL_stepfile,
-                     DICT_positions,
-                     LIST_license,
-                     FNME_stepfile,
-                     STR_licAuthor,
-                     STR_licEmail,
-                     STR_licOrgSys,
-                     STR_licPreProc,
-                     STR_licOrg,
-                     ):
-    """
-    - add license right after HEADER
-    - modification of DESCR
-    - total replace of NAME
-    - copy of SCHEMA
-    - space after ENDSEC
-
-    DICT_positions:
-    H .. HEADER
-    D .. DESCRIPTION
-    N .. NAME
-    S .. SCHEMA
-    E .. ENDSEC
-    """
-    PMBL_modstepfile = []
-    FLAG_addlicense = True
-    STR_description = ""
-    STR_schema = ""
-    fname, ext=os.path.splitext(FNME_stepfile)
-    for line in range(DICT_positions["E"]):
-        if line < DICT_positions["H"]: # leave ISO/HEADER alone
-            PMBL_modstepfile.append(PMBL_stepfile[line].strip())
-        if line == DICT_positions["H"] and FLAG_addlicense: # add license
-            PMBL_modstepfile.append("/* " + str(FNME_stepfile) + " 3D STEP model for use in ECAD systems")
-            for licline in LIST_license:
-                PMBL_modstepfile.append(" * " + licline)
-            PMBL_modstepfile.append(" */")
-            PMBL_modstepfile.append("")
-            FLAG_addLicense = False
-        if line >= DICT_positions["D"] and line < (DICT_positions["N"] - 1): # get DESCR part
-            STR_description += PMBL_stepfile[line].strip()
-        if line == (DICT_positions["S"] - 1): # add modded DESCR and NAME
-            # DESCRIPTION
-            PMBL_modstepfile.append("FILE_DESCRIPTION(")
-            #PMBL_modstepfile.append("/* description */ ('model of " + str(FNME_stepfile) + "'),")
-            PMBL_modstepfile.append("/* description */ ('model of " + str(fname) + "'),")
-            STR_description = pyparsing.nestedExpr("/*", "*/").suppress().transformString(STR_description)
-            #PMBL_modstepfile.append("/* implementation_level */ " + STR_description[-len("'2;1');"):])
-            PMBL_modstepfile.append("/* implementation_level */ " + "'2;1');")
-            PMBL_modstepfile.append("")
-            #NAME
-            PMBL_modstepfile.append("FILE_NAME(")
-            PMBL_modstepfile.append("/* name */ '" + str(FNME_stepfile) + "',")
-            STR_TS = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-            PMBL_modstepfile.append("/* time_stamp */ '" + STR_TS + "',")
-            PMBL_modstepfile.append("/* author */ ('" + STR_licAuthor + "','" + STR_licEmail + "'),"),
-            PMBL_modstepfile.append("/* organization */ ('" + STR_licOrg + "'),")
-            PMBL_modstepfile.append("/* preprocessor_version */ '" + STR_licPreProc + "',")
-            PMBL_modstepfile.append("/* originating_system */ '" + STR_licOrgSys + "',")
-            PMBL_modstepfile.append("/* authorisation */ '');")
-            PMBL_modstepfile.append("")
-        if line >= (DICT_positions["S"] - 1) and line <= (DICT_positions["E"] - 1): # get DESCR part
-            STR_schema += PMBL_stepfile[line].strip()
-        if line == (DICT_positions["E"] - 1): # add cleaned SCHEMA/ENDSEC
-            STR_schema = pyparsing.nestedExpr("/*", "*/").suppress().transformString(STR_schema)
-            for item in STR_schema.split(";")[:-1]:
-                PMBL_modstepfile.append(item + ";")
-    PMBL_modstepfile.append("")
-    return(PMBL_modstepfile)
-
-
-
-def addLicenseToStep(FLDR_toStepFiles, FNME_stepfile, LIST_license, STR_licAuthor, STR_licEmail="", STR_licOrgSys="", STR_licPreProc=""):
-    if os.path.isfile(FLDR_toStepFiles + os.sep + FNME_stepfile): # test if folder or file..
-        fname, ext=os.path.splitext(FNME_stepfile)
-        if ext == ".stp" or ext == ".step": # test if step file
-            say("Starting of licensing\n")
-            try:
-                HDLR_stepfile = open(FLDR_toStepFiles + os.sep  + FNME_stepfile, 'r') # open
-            except:
-                say("broken_2")
-
-            HDLR_stepfile.seek(0)
-            PMBL_stepfile = HDLR_stepfile.readlines()
-            HDLR_stepfile.close()
-            CNT_cutoff = 0
-            DICT_positions = {}
-            for line in PMBL_stepfile:
-                CNT_cutoff += 1
-                if line[:6] == "HEADER":
-                    DICT_positions["H"] = CNT_cutoff
-                elif line[:6] == "ENDSEC":
-                    DICT_positions["E"] = CNT_cutoff
-                elif line[:4] == "DATA":
-                    DICT_positions["A"] = CNT_cutoff
-                    break
-                if line[:5] == "FILE_":
-                    if line[5:9] == "DESC":
-                        DICT_positions["D"] = CNT_cutoff
-                    elif line[5:9] == "NAME":
-                        DICT_positions["N"] = CNT_cutoff
-                    elif line[5:9] == "SCHE":
-                        DICT_positions["S"] = CNT_cutoff
-
-            LIST_PMBL = FNCT_modify_step(PMBL_stepfile[:DICT_positions["E"]],
-                                         DICT_positions,
-                                         LIST_license,
-                                         FNME_stepfile,
-                                         STR_licAuthor,
-                                         STR_licEmail,
-                                         STR_licOrgSys,
-                                         STR_licPreProc,
-                                         STR_licOrg,
-                                         )
-
-            # overwrite step file
-            try:
-                HDLR_stepfile_w = open(FLDR_toStepFiles + os.sep  + FNME_stepfile, 'w') # open
-            except:
-                say("broken_3")
-            else:
-                # overwrite with new preamble
-                for line in LIST_PMBL:
-                    HDLR_stepfile_w.write(line + "\n")
-                # add old data section
-                for line in PMBL_stepfile[(DICT_positions["A"]-1):]:
-                    HDLR_stepfile_w.write(line.strip() + "\n")
-                HDLR_stepfile_w.close()
-    say ("done")
-
 ###
 
 if __name__=='__main__':
@@ -240,7 +117,7 @@ if __name__=='__main__':
                 LIST_stepfiles.append(fname)
                 # load STEP model, manipulate and save as VRML
                 say(FC_stepfile)
-                addLicenseToStep(PATH_toStepFiles, FC_stepfile, LIST_license, STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licPreProc)
+                addLicenseToStep(PATH_toStepFiles, FC_stepfile, LIST_license, STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licOrg, STR_licPreProc)
                 #stop
     say(LIST_stepfiles)
                 
\ No newline at end of file
@@ -99,8 +99,8 @@ import FreeCAD
 import Draft
 import ImportGui
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
- exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors, \
- checkRequirements
+ exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors, compoundObjs_wColors, \
+ checkRequirements, profileStage, setProfileVariant
 
 Gui.activateWorkbench("CadQueryWorkbench")
 
@@ -179,13 +179,13 @@ def export_model(model):
                               face_colors=None))
         i += 1
     scale = 1 / 2.54
-    coloured_meshes = expVRML.getColoredMesh(Gui, export_objects, scale)
+    coloured_meshes = expVRML.iterColoredMesh(Gui, export_objects, scale)
 
     L.LIST_int_license[0] = "Copyright (C) " + datetime.now().strftime("%Y") + ", " + L.STR_int_licAuthor
     expVRML.writeVRMLFile(coloured_meshes, export_file_name, used_colour_keys, L.LIST_int_license)
 
     # export STEP
-    fusion = multiFuseObjs_wColors(FreeCAD, FreeCADGui, safe_name, objects, keepOriginals=True)
+    fusion = compoundObjs_wColors(FreeCAD, FreeCADGui, safe_name, objects, keepOriginals=True)
     exportSTEP(doc, file_name, out_dir, fusion)
     L.addLicenseToStep('{d:s}/'.format(d=out_dir), '{n:s}.step'.format(n=file_name), L.LIST_int_license,
                        L.STR_int_licAuthor, L.STR_int_licEmail, L.STR_int_licOrgSys, L.STR_int_licPreProc)
@@ -201,7 +201,14 @@ if __name__ == "__main__":
     build_list = Factory(CONFIG).get_build_list()
     
     for series in build_list:
-        for model in series.build_series(verbose=True):
+        models = series.build_series(verbose=True)
+        while True:
+            # build_series makes a model when the next one is asked for
+            with profileStage('make_series_model'):
+                model = next(models, None)
+            if model is None:
+                break
+            setProfileVariant(model['metadata']['name'])
             export_model(model)
 
     FreeCAD.Console.PrintMessage('\r\nEXPORT FINISHED.\r\n')
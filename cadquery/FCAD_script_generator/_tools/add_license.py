@@ -13,38 +13,74 @@ Rene Poeschl removed everything that is not needed to insert licensing informati
  overall arrangement and snippets came from all over the internet and have been pushed into place by Joan Sparky (c) 2016
 '''
 
-import sys, os, shutil
-import hashlib, pyparsing
+import sys, os, re, shutil, tempfile
+import hashlib
 import datetime
 from datetime import datetime
 
-import FreeCAD
-import Import
-import FreeCADGui
-import ImportGui
-import Draft
+try:
+    import FreeCAD
+    import Import
+    import Draft
 
-# additionally needed for new VRML export script
-import FreeCADGui,Part,Mesh
-import PySide
-from PySide import QtGui, QtCore
+    # additionally needed for new VRML export script
+    import Part,Mesh
+except ImportError: # the STEP rewrite is plain text, it also runs without FreeCAD (relicense_steps.py)
+    FreeCAD = None
+if FreeCAD is not None and FreeCAD.GuiUp:
+    import FreeCADGui
+    import ImportGui
+    import PySide
+    from PySide import QtGui, QtCore
 from collections import namedtuple
 from os.path import expanduser
 
 # additionally needed for POVray export script
-import __builtin__
+try:
+    import __builtin__
+except ImportError: # python 3
+    import builtins as __builtin__
 import subprocess
 from subprocess import call
+try:
+    from cq_profile import profiled
+except ImportError: # profiling is optional
+    profiled = lambda name, accumulate=False: (lambda function: function)
 
 #FNME_hashfile = "_StepFileHashes.txt" # stored in STEP folder above
 
+def buildDate():
+    """ The date stamped into the STEP header and the license
+
+    datetime.now(), or the UTC time of SOURCE_DATE_EPOCH when the variable is
+    set: rebuilding an unchanged model then gives a byte identical file
+    (see https://reproducible-builds.org/specs/source-date-epoch/) """
+    STR_epoch = os.environ.get("SOURCE_DATE_EPOCH", "").strip()
+    if STR_epoch:
+        try:
+            return datetime.utcfromtimestamp(int(STR_epoch))
+        except (ValueError, OverflowError, OSError):
+            raise ValueError("SOURCE_DATE_EPOCH must be the build date in seconds since 1970, not %r" % STR_epoch)
+    return datetime.now()
+
+def reproducibleLicense(LIST_license):
+    """ Replace the current year of the "Copyright (C) <year>" lines by the build year
+
+    the generators compute the year with datetime.now() """
+    STR_now = "Copyright (C) " + datetime.now().strftime("%Y")
+    STR_build = "Copyright (C) " + buildDate().strftime("%Y")
+    if STR_now == STR_build:
+        return LIST_license
+    return [STR_build + line[len(STR_now):] if line.startswith(STR_now) else line
+            for line in LIST_license]
+
 STR_int_licAuthor = "your name"
 STR_int_licEmail = "your email"
 STR_int_licOrgSys = ""
 STR_int_licPreProc = ""
 STR_int_licOrg = "FreeCAD"   
 
-LIST_int_license = ["Copyright (C) "+datetime.now().strftime("%Y")+", " + STR_int_licAuthor,
+LIST_int_license = ["Copyright (C) "+buildDate().strftime("%Y")+", " + STR_int_licAuthor,
                 "",
                 "This program is free software: you can redistribute it and/or modify",
                 "it under the terms of the GNU General Public License as published by",
@@ -79,8 +115,111 @@ LIST_int_license = ["Copyright (C) "+datetime.now().strftime("%Y")+", " + STR_in
 
 
 
+verbose = True # messages of say() outside of FreeCAD
+
 def say(*arg):
-    FreeCAD.Console.PrintMessage(" ".join(map(str,arg)) + "\r\n")
+    if FreeCAD is not None:
+        FreeCAD.Console.PrintMessage(" ".join(map(str,arg)) + "\r\n")
+    elif verbose:
+        print(" ".join(map(str,arg)))
+
+# STEP header tokenizer
+# comments are /* ... */ and may nest; inside a comment a quoted string is
+# skipped as a whole, so a '*/' between quotes does not close it.
+# An unterminated comment is left in place. Quotes outside of comments are
+# not special: this is what pyparsing.nestedExpr("/*", "*/") used to strip.
+_quoted_start = re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"
+                           r'|"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*')
+_white_chars = " \n\t\r"
+
+def _commentEnd(STR_text, pos):
+    """ index after the comment opened at pos, None if it is not closed """
+    depth = 1
+    pos += 2
+    end = len(STR_text)
+    while pos < end:
+        char = STR_text[pos]
+        if char in _white_chars:
+            pos += 1
+        elif STR_text.startswith("*/", pos):
+            pos += 2
+            depth -= 1
+            if depth == 0:
+                return pos
+        elif STR_text.startswith("/*", pos):
+            pos += 2
+            depth += 1
+        else:
+            if char in "'\"":
+                m = _quoted_start.match(STR_text, pos)
+                if m is not None and STR_text[m.end():m.end()+1] == char:
+                    pos = m.end() + 1
+                    continue
+            pos += 1
+    return None
+
+def stripStepComments(STR_text):
+    """ Return STR_text without its /* ... */ comments """
+    LIST_parts = []
+    last = 0
+    pos = STR_text.find("/*")
+    while pos >= 0:
+        end = _commentEnd(STR_text, pos)
+        if end is None:
+            pos = STR_text.find("/*", pos + 1)
+        else:
+            LIST_parts.append(STR_text[last:pos])
+            last = end
+            pos = STR_text.find("/*", end)
+    if not LIST_parts:
+        return STR_text
+    LIST_parts.append(STR_text[last:])
+    return "".join(LIST_parts)
+
+def splitStepEntities(STR_text):
+    """ Split the header text on ';' into entities, each keeping its ';'
+
+    the text after the last ';' is dropped """
+    return [item + ";" for item in stripStepComments(STR_text).split(";")[:-1]]
+
+_statement_stop = re.compile(r"[;'/]")
+
+def splitStepStatements(STR_text):
+    """ Split STEP text on the ';' outside of strings and comments
+
+    One pass over the text: a string runs to the next quote ('' is two
+    strings in a row), a comment ends as in _commentEnd and is dropped.
+    Returns (statements, each keeping its ';', and the rest of the text
+    after the last one); an unterminated string or comment stays in the
+    rest. """
+    LIST_statements = []
+    LIST_parts = []
+    start = pos = 0
+    while True:
+        m = _statement_stop.search(STR_text, pos)
+        if m is None:
+            break
+        pos = m.start()
+        char = m.group(0)
+        if char == ";":
+            LIST_parts.append(STR_text[start:pos+1])
+            LIST_statements.append("".join(LIST_parts))
+            LIST_parts = []
+            start = pos = pos + 1
+        elif char == "'":
+            end = STR_text.find("'", pos + 1)
+            if end < 0:
+                break
+            pos = end + 1
+        elif STR_text.startswith("/*", pos):
+            end = _commentEnd(STR_text, pos)
+            if end is None:
+                break
+            LIST_parts.append(STR_text[start:pos])
+            start = pos = end
+        else:
+            pos += 1
+    return LIST_statements, "".join(LIST_parts) + STR_text[start:]
 
 def FNCT_modify_step(PMBL_stepfile,
                      DICT_positions,
@@ -128,14 +267,14 @@ def FNCT_modify_step(PMBL_stepfile,
             PMBL_modstepfile.append("FILE_DESCRIPTION(")
             #PMBL_modstepfile.append("/* description */ ('model of " + str(FNME_stepfile) + "'),")
             PMBL_modstepfile.append("/* description */ ('model of " + str(fname) + "'),")
-            STR_description = pyparsing.nestedExpr("/*", "*/").suppress().transformString(STR_description)
+            STR_description = stripStepComments(STR_description)
             #PMBL_modstepfile.append("/* implementation_level */ " + STR_description[-len("'2;1');"):])
             PMBL_modstepfile.append("/* implementation_level */ " + "'2;1');")
             PMBL_modstepfile.append("")
             #NAME
             PMBL_modstepfile.append("FILE_NAME(")
             PMBL_modstepfile.append("/* name */ '" + str(FNME_stepfile) + "',")
-            STR_TS = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+            STR_TS = buildDate().strftime("%Y-%m-%dT%H:%M:%S")
             PMBL_modstepfile.append("/* time_stamp */ '" + STR_TS + "',")
             PMBL_modstepfile.append("/* author */ ('" + STR_licAuthor + "','" + STR_licEmail + "'),"),
             PMBL_modstepfile.append("/* organization */ ('" + STR_licOrg + "'),")
@@ -146,73 +285,169 @@ def FNCT_modify_step(PMBL_stepfile,
         if line >= (DICT_positions["S"] - 1) and line <= (DICT_positions["E"] - 1): # get DESCR part
             STR_schema += PMBL_stepfile[line].strip()
         if line == (DICT_positions["E"] - 1): # add cleaned SCHEMA/ENDSEC
-            STR_schema = pyparsing.nestedExpr("/*", "*/").suppress().transformString(STR_schema)
-            for item in STR_schema.split(";")[:-1]:
-                PMBL_modstepfile.append(item + ";")
+            PMBL_modstepfile.extend(splitStepEntities(STR_schema))
     PMBL_modstepfile.append("")
     return(PMBL_modstepfile)
 
 
 
+copy_buffer_size = 1024*1024
+
+def _headerText(line):
+    """ header lines are read as bytes, FNCT_modify_step works on str """
+    if isinstance(line, str): # python 2
+        return line
+    return line.decode('utf-8', 'surrogateescape')
+
+def _headerBytes(text):
+    if isinstance(text, bytes): # python 2
+        return text
+    return text.encode('utf-8', 'surrogateescape')
+
+def readStepHeader(HDLR_stepfile):
+    """ Read the lines of a STEP file opened in binary mode up to the DATA section
+
+    Returns (header lines, DICT_positions, newline); the file is left positioned
+    at the start of the DATA line, the body is never read here.
+    DICT_positions holds the 1-based line numbers used by FNCT_modify_step,
+    "A" is missing when the file has no DATA section. """
+    PMBL_stepfile = []
+    DICT_positions = {}
+    newline = "\n"
+    CNT_cutoff = 0
+    while True:
+        pos = HDLR_stepfile.tell()
+        raw = HDLR_stepfile.readline()
+        if not raw:
+            break
+        line = _headerText(raw)
+        CNT_cutoff += 1
+        if CNT_cutoff == 1 and line.endswith("\r\n"):
+            newline = "\r\n"
+        if line[:6] == "HEADER":
+            DICT_positions["H"] = CNT_cutoff
+        elif line[:6] == "ENDSEC":
+            DICT_positions["E"] = CNT_cutoff
+        elif line[:4] == "DATA":
+            DICT_positions["A"] = CNT_cutoff
+            HDLR_stepfile.seek(pos)
+            break
+        if line[:5] == "FILE_":
+            if line[5:9] == "DESC":
+                DICT_positions["D"] = CNT_cutoff
+            elif line[5:9] == "NAME":
+                DICT_positions["N"] = CNT_cutoff
+            elif line[5:9] == "SCHE":
+                DICT_positions["S"] = CNT_cutoff
+        PMBL_stepfile.append(line)
+    return PMBL_stepfile, DICT_positions, newline
+
+def stepDataDigest(FLPH_stepfile):
+    """ sha1 of the DATA section of a STEP file, the header is left out
+
+    two exports of the same model with the same digest have the same entities
+    in the same order, whatever their time stamps and license. """
+    h = hashlib.sha1()
+    with open(FLPH_stepfile, 'rb') as HDLR_stepfile:
+        readStepHeader(HDLR_stepfile)
+        while True:
+            chunk = HDLR_stepfile.read(copy_buffer_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+# export every STEP a second time and compare the DATA sections
+# (checkStableExport); doubles the STEP export time.
+# CQ_CHECK_STABLE_STEP=1 in the environment sets it too
+check_stable_export = os.environ.get('CQ_CHECK_STABLE_STEP', '0').lower() not in ('0', 'off', 'no', '')
+
+def checkStableExport(export, FLPH_stepfile):
+    """ Check that the OCC writer numbers the entities of a model the same way every time
+
+    export(filepath) writes the model again, to a temporary file next to
+    FLPH_stepfile; the two DATA sections must have the same stepDataDigest.
+    A difference is reported with say(). Returns True when they match. """
+    HDLR_temp, FLPH_again = tempfile.mkstemp(suffix='.step', dir=os.path.dirname(os.path.abspath(FLPH_stepfile)))
+    os.close(HDLR_temp)
+    try:
+        export(FLPH_again)
+        STR_first = stepDataDigest(FLPH_stepfile)
+        STR_again = stepDataDigest(FLPH_again)
+    finally:
+        os.remove(FLPH_again)
+    if STR_first != STR_again:
+        say("warning: two exports of " + FLPH_stepfile + " have different DATA sections (" +
+            STR_first + " / " + STR_again + "), the STEP file is not reproducible")
+        return False
+    return True
+
+def replaceFile(src, dst):
+    """ rename src over dst, atomic where the OS allows it """
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else: # python 2
+        if os.name == 'nt' and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+@profiled('addLicenseToStep')
 def addLicenseToStep(FLDR_toStepFiles, FNME_stepfile, LIST_license, STR_licAuthor, STR_licEmail="", STR_licOrgSys="", STR_licOrg="",STR_licPreProc=""):
-    if os.path.isfile(FLDR_toStepFiles + os.sep + FNME_stepfile): # test if folder or file..
+    """ Rewrite the header of a STEP file with the license and the author details
+
+    Only the header is parsed; the DATA section is copied through unchanged in
+    chunks of copy_buffer_size bytes into a temporary file, which then replaces
+    the original. Memory use does not depend on the size of the model.
+    Returns True when the file has been rewritten. """
+    FLPH_stepfile = FLDR_toStepFiles + os.sep + FNME_stepfile
+    if os.path.isfile(FLPH_stepfile): # test if folder or file..
         fname, ext=os.path.splitext(FNME_stepfile)
         if LIST_license[0] == "":
             LIST_license=LIST_int_license
-        LIST_int_license[0] = "Copyright (C) "+datetime.now().strftime("%Y")+", " + STR_licAuthor
+        LIST_int_license[0] = "Copyright (C) "+buildDate().strftime("%Y")+", " + STR_licAuthor
+        LIST_license = reproducibleLicense(LIST_license)
         if ext == ".stp" or ext == ".step": # test if step file
             say("Starting of licensing\n")
             try:
-                HDLR_stepfile = open(FLDR_toStepFiles + os.sep  + FNME_stepfile, 'r') # open
-            except:
+                HDLR_stepfile = open(FLPH_stepfile, 'rb') # open
+            except (IOError, OSError):
                 say("broken_2")
-
-            HDLR_stepfile.seek(0)
-            PMBL_stepfile = HDLR_stepfile.readlines()
-            HDLR_stepfile.close()
-            CNT_cutoff = 0
-            DICT_positions = {}
-            for line in PMBL_stepfile:
-                CNT_cutoff += 1
-                if line[:6] == "HEADER":
-                    DICT_positions["H"] = CNT_cutoff
-                elif line[:6] == "ENDSEC":
-                    DICT_positions["E"] = CNT_cutoff
-                elif line[:4] == "DATA":
-                    DICT_positions["A"] = CNT_cutoff
-                    break
-                if line[:5] == "FILE_":
-                    if line[5:9] == "DESC":
-                        DICT_positions["D"] = CNT_cutoff
-                    elif line[5:9] == "NAME":
-                        DICT_positions["N"] = CNT_cutoff
-                    elif line[5:9] == "SCHE":
-                        DICT_positions["S"] = CNT_cutoff
-
-            LIST_PMBL = FNCT_modify_step(PMBL_stepfile[:DICT_positions["E"]],
-                                         DICT_positions,
-                                         LIST_license,
-                                         FNME_stepfile,
-                                         STR_licAuthor,
-                                         STR_licEmail,
-                                         STR_licOrgSys,
-                                         STR_licPreProc,
-                                         STR_licOrg,
-                                         )
-
+                return False
+            with HDLR_stepfile:
+                PMBL_stepfile, DICT_positions, STR_newline = readStepHeader(HDLR_stepfile)
+                if not all(k in DICT_positions for k in "HEDNSA"):
+                    say("no STEP header/DATA section found in " + FNME_stepfile)
+                    return False
+                LIST_PMBL = FNCT_modify_step(PMBL_stepfile[:DICT_positions["E"]],
+                                             DICT_positions,
+                                             LIST_license,
+                                             FNME_stepfile,
+                                             STR_licAuthor,
+                                             STR_licEmail,
+                                             STR_licOrgSys,
+                                             STR_licPreProc,
+                                             STR_licOrg,
+                                             )
+                # write the new preamble and the old data section to a temporary file
+                try:
+                    FD_tmp, FLPH_tmp = tempfile.mkstemp(prefix='.'+fname, suffix='.tmp',
+                                                        dir=os.path.dirname(os.path.abspath(FLPH_stepfile)))
+                except (IOError, OSError):
+                    say("broken_3")
+                    return False
+                try:
+                    with os.fdopen(FD_tmp, 'wb') as HDLR_stepfile_w:
+                        HDLR_stepfile_w.write(_headerBytes(STR_newline.join(LIST_PMBL) + STR_newline))
+                        shutil.copyfileobj(HDLR_stepfile, HDLR_stepfile_w, copy_buffer_size)
+                    shutil.copymode(FLPH_stepfile, FLPH_tmp)
+                except:
+                    os.remove(FLPH_tmp)
+                    raise
             # overwrite step file
-            try:
-                HDLR_stepfile_w = open(FLDR_toStepFiles + os.sep  + FNME_stepfile, 'w') # open
-            except:
-                say("broken_3")
-            else:
-                # overwrite with new preamble
-                for line in LIST_PMBL:
-                    HDLR_stepfile_w.write(line + "\n")
-                # add old data section
-                for line in PMBL_stepfile[(DICT_positions["A"]-1):]:
-                    HDLR_stepfile_w.write(line.strip() + "\n")
-                HDLR_stepfile_w.close()
+            replaceFile(FLPH_tmp, FLPH_stepfile)
+            say ("done")
+            return True
     say ("done")
+    return False
 
 ###
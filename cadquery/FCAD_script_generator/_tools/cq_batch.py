@@ -0,0 +1,242 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* batch driver: builds the variants of a family in parallel                *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## the generators build every variant serially inside a single FreeCAD
+## process. This driver runs one FreeCAD process per variant instead and
+## keeps up to N of them busy at the same time, so an "all" build scales
+## with the number of cores.
+##
+## usage (plain python, no FreeCAD needed for the driver itself):
+##   python cq_batch.py ../QFN_packages --params cq_parameters:kicad_naming_params_qfn -j 8
+##   python cq_batch.py ../BGA_packages BGA-48_6x8_8.0x9.0mm_Pitch0.8mm BGA-64_9x9_... -j 2
+##   python cq_batch.py ../QFN_packages --params cq_parameters:kicad_naming_params_qfn -- no-pinmark-color
+##
+## every variant is executed through cq_batch_worker.py, which runs the
+## family main_generator.py for that single variant, records the outcome
+## and terminates FreeCAD. The outcomes are merged into one json report.
+
+__title__ = "batch driver for the family generators"
+__Comment__ = 'run the main_generator of a family for many variants across a pool of FreeCAD processes'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import json
+import time
+import tempfile
+import threading
+import subprocess
+from multiprocessing.pool import ThreadPool
+from collections import namedtuple
+
+import param_registry
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+worker_script = os.path.join(tools_dir, 'cq_batch_worker.py')
+
+# outcome of a single variant
+# status: 'ok', 'failed' or 'timeout'
+VariantResult = namedtuple('VariantResult', ['variant', 'status', 'returncode',
+                                             'seconds', 'error', 'log_file'])
+
+def default_freecad():
+    return os.environ.get('FREECAD', 'freecad')
+
+def default_jobs():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def pool_size(jobs, count):
+    """ the number of FreeCAD processes running `count` variants with `jobs` requested """
+    return max(1, min(jobs or default_jobs(), count or 1))
+
+def load_variants(family_dir, params_spec):
+    """ Return the variant names of a parameter dict.
+
+    `params_spec` is 'module:dict', e.g. 'cq_parameters:kicad_naming_params_qfn'.
+    The parameter modules are plain python, so no FreeCAD is needed here. """
+    module_name, _, dict_name = params_spec.partition(':')
+    family_dir = os.path.realpath(family_dir)
+    if family_dir not in sys.path:
+        sys.path.insert(0, family_dir)
+    # only the names are needed, no Params is built
+    module = param_registry.loadModule(module_name, [family_dir])
+    if not dict_name:
+        dict_name = 'all_params'
+    return sorted(getattr(module, dict_name).keys())
+
+def _safe_name(variant):
+    return ''.join(c if c.isalnum() or c in '._-' else '_' for c in variant)
+
+def run_variant(family_dir, variant, script='main_generator.py', extra_args=(),
+                freecad=None, timeout=None, log_dir=None):
+    """ Build one variant in its own FreeCAD process and return a VariantResult. """
+    family_dir = os.path.realpath(family_dir)
+    freecad = freecad or default_freecad()
+    fd, result_file = tempfile.mkstemp(prefix='cq_batch_', suffix='.json')
+    os.close(fd)
+    os.remove(result_file)
+
+    env = dict(os.environ)
+    env['CQ_BATCH_SCRIPT'] = os.path.join(family_dir, script)
+    env['CQ_BATCH_ARGS'] = json.dumps([variant] + list(extra_args))
+    env['CQ_BATCH_RESULT'] = result_file
+
+    if log_dir is not None:
+        log_file = os.path.join(log_dir, _safe_name(variant) + '.log')
+        log = open(log_file, 'w')
+    else:
+        log_file = None
+        log = open(os.devnull, 'w')
+
+    start = time.time()
+    timed_out = []
+    try:
+        try:
+            proc = subprocess.Popen([freecad, worker_script], cwd=family_dir, env=env,
+                                    stdout=log, stderr=subprocess.STDOUT)
+        except OSError as e:
+            return VariantResult(variant, 'failed', None, 0.0,
+                                 'cannot start %s: %s' % (freecad, e), log_file)
+        timer = None
+        if timeout:
+            def kill():
+                timed_out.append(True)
+                proc.kill()
+            timer = threading.Timer(timeout, kill)
+            timer.start()
+        returncode = proc.wait()
+        if timer is not None:
+            timer.cancel()
+    finally:
+        log.close()
+    seconds = time.time() - start
+
+    error = None
+    worker_ok = False
+    if os.path.isfile(result_file):
+        with open(result_file) as f:
+            worker_result = json.load(f)
+        os.remove(result_file)
+        worker_ok = worker_result.get('status') == 'ok'
+        error = worker_result.get('error')
+
+    if timed_out:
+        status = 'timeout'
+        error = 'killed after %ds' % timeout
+    elif worker_ok and returncode == 0:
+        status = 'ok'
+    else:
+        status = 'failed'
+        if error is None:
+            error = 'FreeCAD exited with code %s before reporting a result' % returncode
+    return VariantResult(variant, status, returncode, seconds, error, log_file)
+
+def run_batch(family_dir, variants, jobs=None, script='main_generator.py', extra_args=(),
+              freecad=None, timeout=None, log_dir=None, progress=None):
+    """ Build `variants` of the family in `family_dir` with `jobs` FreeCAD
+    processes running at the same time.
+
+    Returns the list of VariantResult in the order of `variants`. `progress`
+    is called with every VariantResult as soon as it is known. """
+    variants = list(variants)
+    jobs = pool_size(jobs, len(variants))
+    if log_dir is not None and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    lock = threading.Lock()
+
+    def build(variant):
+        result = run_variant(family_dir, variant, script, extra_args,
+                             freecad, timeout, log_dir)
+        if progress is not None:
+            with lock:
+                progress(result)
+        return result
+
+    # one variant at a time: a process that is done takes the next one
+    pool = ThreadPool(jobs)
+    try:
+        return pool.map(build, variants, 1)
+    finally:
+        pool.close()
+        pool.join()
+
+def make_report(family_dir, results, jobs, seconds):
+    failed = [r for r in results if r.status != 'ok']
+    return {
+        'family': os.path.basename(os.path.realpath(family_dir)),
+        'jobs': jobs,
+        'seconds': round(seconds, 3),
+        'total': len(results),
+        'ok': len(results) - len(failed),
+        'failed': len(failed),
+        'failures': [r.variant for r in failed],
+        'results': [dict(r._asdict(), seconds=round(r.seconds, 3)) for r in results],
+    }
+
+def write_report(report, filename):
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='build the variants of a family in parallel FreeCAD processes')
+    parser.add_argument('family_dir', help='directory holding the main_generator.py of the family')
+    parser.add_argument('variants', nargs='*', help='variant names to build')
+    parser.add_argument('-p', '--params', action='append', default=[],
+                        help="add all variants of a parameter dict, e.g. 'cq_parameters:kicad_naming_params_qfn'")
+    parser.add_argument('-j', '--jobs', type=int, default=default_jobs(), help='number of FreeCAD processes')
+    parser.add_argument('--script', default='main_generator.py', help='generator script within family_dir')
+    parser.add_argument('--freecad', default=default_freecad(), help='FreeCAD executable (default: $FREECAD or freecad)')
+    parser.add_argument('--timeout', type=float, default=None, help='kill a variant after this many seconds')
+    parser.add_argument('--log-dir', default=None, help='keep the FreeCAD output of every variant here')
+    parser.add_argument('--report', default=None, help='json report file (default: <family>_batch_report.json)')
+    args, extra_args = parser.parse_known_args(argv)
+    if extra_args and extra_args[0] == '--':
+        extra_args = extra_args[1:]
+
+    variants = list(args.variants)
+    for spec in args.params:
+        variants += [v for v in load_variants(args.family_dir, spec) if v not in variants]
+    if not variants:
+        parser.error('no variants given')
+
+    def progress(result):
+        print('%-8s %7.1fs  %s%s' % (result.status, result.seconds, result.variant,
+                                     '  ('+result.error+')' if result.error else ''))
+        sys.stdout.flush()
+
+    start = time.time()
+    results = run_batch(args.family_dir, variants, args.jobs, args.script, extra_args,
+                        args.freecad, args.timeout, args.log_dir, progress)
+    report = make_report(args.family_dir, results, pool_size(args.jobs, len(variants)), time.time() - start)
+    report_file = args.report or report['family'] + '_batch_report.json'
+    write_report(report, report_file)
+    print('%d of %d variants built in %.1fs, report: %s' % (report['ok'], report['total'],
+                                                           report['seconds'], report_file))
+    return 1 if report['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* batch worker: runs one generator variant inside FreeCAD                  *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#****************************************************************************
+
+## started by cq_batch.py as: freecad cq_batch_worker.py
+## the job is passed through the environment:
+##   CQ_BATCH_SCRIPT  full path of the family main_generator.py
+##   CQ_BATCH_ARGS    json list of the generator arguments, variant first
+##   CQ_BATCH_RESULT  json file receiving the outcome
+##   CQ_PROFILE       optional stage report (cq_profile), the whole run is
+##                    the stage 'run' of the variant
+## FreeCAD keeps its main window open after running a script, so the worker
+## terminates the process itself once the outcome is written.
+
+import sys, os
+import json
+import traceback
+import runpy
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+
+def generatorGlobals():
+    """ the names FreeCAD provides to scripts it runs (generators use App.newDocument etc.) """
+    import FreeCAD
+    init = {'App': FreeCAD}
+    if FreeCAD.GuiUp:
+        import FreeCADGui
+        init['Gui'] = FreeCADGui
+    return init
+
+def run_job():
+    script = os.environ['CQ_BATCH_SCRIPT']
+    args = json.loads(os.environ.get('CQ_BATCH_ARGS', '[]'))
+    result = {'script': script, 'args': args}
+    try:
+        os.chdir(os.path.dirname(script))
+        sys.path.insert(0, os.path.dirname(script))
+        # generators read the variant from sys.argv[2]
+        sys.argv = ['freecad', script] + args
+        if os.environ.get('CQ_PROFILE'):
+            import cq_profile
+            cq_profile.setProfileVariant(args[0] if args else None)
+            with cq_profile.profileStage('run'):
+                runpy.run_path(script, init_globals=generatorGlobals(), run_name='__main__')
+        else:
+            runpy.run_path(script, init_globals=generatorGlobals(), run_name='__main__')
+        result['status'] = 'ok'
+        result['error'] = None
+    except BaseException as e:
+        result['status'] = 'failed'
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        result['traceback'] = traceback.format_exc()
+        sys.stderr.write(result['traceback'])
+    return result
+
+if 'CQ_BATCH_SCRIPT' in os.environ:
+    outcome = run_job()
+    with open(os.environ['CQ_BATCH_RESULT'], 'w') as f:
+        json.dump(outcome, f)
+    if 'cq_profile' in sys.modules: # os._exit skips the atexit handlers
+        sys.modules['cq_profile'].flushProfile()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0 if outcome['status'] == 'ok' else 1)
@@ -0,0 +1,226 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* benchmark: representative variants timed stage by stage vs a baseline    *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## Builds a few representative variants (benchmark_cases: a small QFN, a
+## large BGA, a 2x40 pin header, a phoenix connector with its plug, the
+## TO268 DPAK series) in their own FreeCAD process (cq_batch) with the stage
+## profile on (cq_profile) and sums the time of every stage into
+##   geometry      the cadquery models, the make_* stages of the generators
+##   boolean       fuse/cut/compound of the parts
+##   tessellation  the meshes of the VRML export
+##   writers       STEP, license, VRML and FCStd files
+##   other         the rest of the run: imports, documents, colors ...
+## `record` writes these timings, the median of --repeat runs, as the
+## baseline; `compare` runs again and fails (exit code 1) when a stage of a
+## case got slower than the baseline by more than --threshold percent (and
+## more than --min-seconds, tiny stages are noise).
+##
+## usage:
+##   python cq_benchmark.py record  --baseline cq_benchmark_baseline.json
+##   python cq_benchmark.py compare --baseline cq_benchmark_baseline.json --threshold 15
+##   python cq_benchmark.py compare --case qfn --case bga -r 3
+
+__title__ = "benchmark of representative variants"
+__Comment__ = 'time the geometry, boolean, tessellation and writer stages of representative variants against a baseline'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import json
+import shutil
+import platform
+import tempfile
+from collections import OrderedDict, namedtuple
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import cq_batch
+import cq_profile
+
+generators_dir = os.path.dirname(tools_dir)
+
+BenchmarkCase = namedtuple('BenchmarkCase', ['name', 'family', 'script', 'args'])
+
+benchmark_cases = [
+    BenchmarkCase('qfn', 'QFN_packages', 'main_generator.py', ['QFN-16-1EP_3x3mm_Pitch0.5mm']),
+    BenchmarkCase('bga', 'BGA_packages', 'main_generator.py', ['BGA-1156_34x34_35.0x35.0mm_Pitch1.0mm']),
+    BenchmarkCase('pin_header', 'Pin_Headers', 'main_generator.py', ['254dual', '40']),
+    BenchmarkCase('phoenix_mstb', 'phoenix_contact', 'export_conn_phoenix.py',
+                  ['series=mstb', 'filter=MSTB_01x02_GF_5.00mm_MH', 'with_plug']),
+    # DPAK_factory reads the series to build from the arguments
+    BenchmarkCase('dpak', 'TO_SOT_Packages_SMD_custom', 'DPAK_export.py', ['TO268']),
+    ]
+
+categories = ['geometry', 'boolean', 'tessellation', 'writers', 'other']
+
+boolean_stages = frozenset(('booleans', 'fuseObjs', 'cutObjs', 'compoundObjs_wColors',
+                            'fuseParts', 'cutParts'))
+tessellation_stages = frozenset(('shapeToMesh',))
+writer_stages = frozenset(('exportSTEP', 'exportSTEPheadless', 'addLicenseToStep',
+                           'exportVRML', 'writeVRMLFile', 'saveFCdoc'))
+
+def stageCategory(stage):
+    if stage in boolean_stages:
+        return 'boolean'
+    if stage in tessellation_stages:
+        return 'tessellation'
+    if stage in writer_stages:
+        return 'writers'
+    if stage.startswith('make_'):
+        return 'geometry'
+    return 'other'
+
+def categorySeconds(records):
+    """ Sum the self_seconds of the stage records by category """
+    seconds = OrderedDict((c, 0.0) for c in categories)
+    for record in records:
+        if record['stage'].endswith(' (failed)'):
+            continue
+        seconds[stageCategory(record['stage'])] += float(record['self_seconds'] or 0.0)
+    seconds['total'] = sum(seconds.values())
+    return OrderedDict((c, round(s, 3)) for c, s in seconds.items())
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+def runCase(case, freecad=None, timeout=None, log_dir=None):
+    """ Build a case once with the stage profile on.
+    Returns (cq_batch.VariantResult, stage records) """
+    work_dir = tempfile.mkdtemp(prefix='cq_benchmark_')
+    report = os.path.join(work_dir, case.name + '.csv')
+    previous = os.environ.get('CQ_PROFILE')
+    os.environ['CQ_PROFILE'] = report  # passed on to FreeCAD by cq_batch
+    try:
+        result = cq_batch.run_variant(os.path.join(generators_dir, case.family), case.args[0],
+                                      script=case.script, extra_args=case.args[1:],
+                                      freecad=freecad, timeout=timeout, log_dir=log_dir)
+        records = cq_profile.readProfileReport(report) if os.path.isfile(report) else []
+    finally:
+        if previous is None:
+            del os.environ['CQ_PROFILE']
+        else:
+            os.environ['CQ_PROFILE'] = previous
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return result, records
+
+def benchmarkCase(case, repeat=1, freecad=None, timeout=None, log_dir=None):
+    """ Return OrderedDict(category: median seconds) of `repeat` builds of
+    a case, None when a build failed """
+    runs = []
+    for i in range(repeat):
+        result, records = runCase(case, freecad, timeout, log_dir)
+        if result.status != 'ok' or not records:
+            sys.stderr.write('%s failed: %s\n' % (case.name, result.error or 'no stage profile written'))
+            return None
+        runs.append(categorySeconds(records))
+    return OrderedDict((c, round(_median([r[c] for r in runs]), 3)) for c in runs[0])
+
+def compareTimings(baseline, timings, threshold=10.0, min_seconds=0.5):
+    """ Return the regressions [(case, category, baseline s, new s, percent)]:
+    the stages slower than the baseline by more than `threshold` percent
+    and more than `min_seconds` """
+    regressions = []
+    for case, categories_seconds in timings.items():
+        if case not in baseline or categories_seconds is None:
+            continue
+        for category, seconds in categories_seconds.items():
+            before = baseline[case].get(category)
+            if before is None or seconds - before <= min_seconds:
+                continue
+            percent = 100.0 * (seconds - before) / before if before else float('inf')
+            if percent > threshold:
+                regressions.append((case, category, before, seconds, percent))
+    return regressions
+
+def machineInfo():
+    return OrderedDict([('node', platform.node()), ('machine', platform.machine()),
+                        ('python', platform.python_version())])
+
+def printTimings(timings):
+    print('%-14s' % 'case' + ''.join('%13s' % c for c in categories + ['total']))
+    for case, seconds in timings.items():
+        if seconds is None:
+            print('%-14s failed' % case)
+        else:
+            print('%-14s' % case + ''.join('%12.2fs' % seconds[c] for c in categories + ['total']))
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='time the stages of representative variants against a baseline')
+    parser.add_argument('mode', choices=['record', 'compare'], help='write the baseline, or compare with it')
+    parser.add_argument('--baseline', default='cq_benchmark_baseline.json', help='baseline json file')
+    parser.add_argument('--case', action='append', default=[],
+                        help='only this case (%s)' % ', '.join(c.name for c in benchmark_cases))
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='builds per case, the median is kept')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed slow down of a stage in percent')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='slow downs below this are ignored')
+    parser.add_argument('--freecad', default=cq_batch.default_freecad(), help='FreeCAD executable (default: $FREECAD or freecad)')
+    parser.add_argument('--timeout', type=float, default=None, help='kill a build after this many seconds')
+    parser.add_argument('--log-dir', default=None, help='keep the FreeCAD output of every build here')
+    args = parser.parse_args(argv)
+
+    cases = [c for c in benchmark_cases if not args.case or c.name in args.case]
+    unknown = set(args.case) - set(c.name for c in benchmark_cases)
+    if unknown:
+        parser.error('unknown case: %s' % ', '.join(sorted(unknown)))
+    baseline = None
+    if args.mode == 'compare':
+        if not os.path.isfile(args.baseline):
+            parser.error('no baseline %s, run the record mode first' % args.baseline)
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+    if args.log_dir is not None and not os.path.isdir(args.log_dir):
+        os.makedirs(args.log_dir)
+
+    timings = OrderedDict()
+    for case in cases:
+        timings[case.name] = benchmarkCase(case, max(1, args.repeat), args.freecad,
+                                           args.timeout, args.log_dir)
+    printTimings(timings)
+    failed = [name for name, seconds in timings.items() if seconds is None]
+
+    if args.mode == 'record':
+        if failed:
+            print('baseline not written, failed: %s' % ', '.join(failed))
+            return 1
+        with open(args.baseline, 'w') as f:
+            json.dump(OrderedDict([('machine', machineInfo()), ('repeat', args.repeat),
+                                   ('cases', timings)]), f, indent=2)
+        print('baseline written to %s' % args.baseline)
+        return 0
+
+    regressions = compareTimings(baseline, timings, args.threshold, args.min_seconds)
+    for case, category, before, seconds, percent in regressions:
+        print('REGRESSION %s %s: %.2fs -> %.2fs (+%.0f%%)' % (case, category, before, seconds, percent))
+    if failed:
+        print('failed: %s' % ', '.join(failed))
+    if regressions or failed:
+        return 1
+    print('no stage slower than the baseline by more than %g%%' % args.threshold)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
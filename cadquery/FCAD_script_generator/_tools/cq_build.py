@@ -0,0 +1,215 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* build entry point: select variants of all families by glob or regex      *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## cq_batch.py builds the variants of one family. This script selects the
+## variants of every family whose generator takes the variant name as its
+## argument (family_params) by glob pattern or regular expression and builds
+## them all in one run, `--jobs` FreeCAD processes at a time.
+## The variant names come from the parameter files (param_registry),
+## no FreeCAD is needed to select them.
+##
+## usage:
+##   python cq_build.py --list
+##   python cq_build.py '*Pitch0.5mm*' -j 8
+##   python cq_build.py --regex '^QFN-(16|20)-' --family QFN_packages --dry-run
+##   python cq_build.py 'SOIC-8_*' -- no-pinmark-color
+##
+## exit code: 0 when every selected variant was built, 1 when one failed,
+## 2 for a usage error or when nothing matched.
+
+__title__ = "build entry point for all the families"
+__Comment__ = 'select variants across the families by glob or regex and build them in parallel FreeCAD processes'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import re
+import time
+import fnmatch
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import param_registry
+import cq_batch
+
+generators_dir = os.path.dirname(tools_dir)
+
+# the families whose main_generator.py builds the variant named by its
+# argument, with the 'module:dict' parameter tables making up its all_params
+family_params = OrderedDict([
+    ('BGA_packages', ['cq_parameters:kicad_naming_params_qfn']),
+    ('Flat_Pin_packages', ['cq_parameters_sot:kicad_naming_params_sot',
+                           'cq_parameters_diode:kicad_naming_params_diode']),
+    ('GW_QFP_SOIC_SSOP_TSSOP_SOT', ['cq_parameters_soic:kicad_naming_params_soic',
+                                    'cq_parameters_qfp:kicad_naming_params_qfp',
+                                    'cq_parameters_ssop:kicad_naming_params_ssop',
+                                    'cq_parameters_tssop:all_params_tssop',
+                                    'cq_parameters_sot:kicad_naming_params_sot',
+                                    'cq_parameters_diode:kicad_naming_params_diode']),
+    ('QFN_packages', ['cq_parameters:kicad_naming_params_qfn',
+                      'cq_parameters_diode:kicad_naming_params_diode']),
+    ('capacitors_SMD', ['cq_parameters:kicad_naming_params_chip_cap']),
+    ('capacitors_radial_SMD', ['cq_parameters:kicad_naming_params_radial_smd_cap']),
+    ('capacitors_radial_THT', ['cq_parameters:kicad_naming_params_radial_th_cap']),
+    ('capacitors_rect_THT', ['cq_parameters:kicad_naming_params_rect_th_cap']),
+    ('capacitors_tantalum_SMD', ['cq_parameters:kicad_naming_params_tantalum']),
+    ('diodes_SMx_SMD', ['cq_parameters:kicad_naming_params_tantalum']),
+    ('resistors_SMD', ['cq_parameters:kicad_naming_params_res']),
+    ('resistors_array_SMD', ['cq_parameters:kicad_naming_params_res']),
+    ])
+
+def familyDir(family):
+    return os.path.join(generators_dir, family)
+
+def familyVariants(family):
+    """ Return the variant names of a family, in the order of its parameter files """
+    variants = OrderedDict()
+    for spec in family_params[family]:
+        module_name, _, table = spec.partition(':')
+        module = param_registry.loadModule(module_name, [familyDir(family)])
+        for variant in getattr(module, table).keys():
+            variants[variant] = True
+    return list(variants)
+
+def _loadableVariants(family):
+    try:
+        return familyVariants(family)
+    except Exception as e:
+        sys.stderr.write('skipping %s, its parameters can not be loaded: %s: %s\n'
+                         % (family, type(e).__name__, e))
+        return None
+
+def selectVariants(patterns=(), regexes=(), families=None):
+    """ Return OrderedDict(family: [variant names]) of the variants matching
+    one of the glob patterns or regular expressions (re.search), in the
+    families matching one of the `families` glob patterns (default all).
+    A family whose parameter files fail to load is skipped with a warning """
+    expressions = [re.compile(r) for r in regexes]
+    selection = OrderedDict()
+    for family in family_params:
+        if families and not any(fnmatch.fnmatchcase(family, f) for f in families):
+            continue
+        variants = _loadableVariants(family)
+        selected = [v for v in variants or ()
+                    if any(fnmatch.fnmatchcase(v, p) for p in patterns) or
+                    any(e.search(v) for e in expressions)]
+        if selected:
+            selection[family] = selected
+    return selection
+
+def buildSelection(selection, jobs=None, extra_args=(), freecad=None, timeout=None,
+                   log_dir=None, progress=None):
+    """ Build the selected variants of all families with `jobs` FreeCAD
+    processes at a time. Returns OrderedDict(family: [cq_batch.VariantResult]) """
+    work = [(family, variant) for family, variants in selection.items() for variant in variants]
+    jobs = cq_batch.pool_size(jobs, len(work))
+
+    if log_dir is not None:
+        for family in selection:
+            if not os.path.isdir(os.path.join(log_dir, family)):
+                os.makedirs(os.path.join(log_dir, family))
+
+    def build(item):
+        family, variant = item
+        family_log_dir = os.path.join(log_dir, family) if log_dir is not None else None
+        result = cq_batch.run_variant(familyDir(family), variant, extra_args=extra_args,
+                                      freecad=freecad, timeout=timeout, log_dir=family_log_dir)
+        if progress is not None:
+            progress(family, result)
+        return family, result
+
+    pool = ThreadPool(jobs)
+    try:
+        outcomes = dict(((family, result.variant), result) for family, result in pool.map(build, work, 1))
+    finally:
+        pool.close()
+        pool.join()
+    return OrderedDict((family, [outcomes[(family, v)] for v in variants])
+                       for family, variants in selection.items())
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='select variants of all the families by glob or regex and build them')
+    parser.add_argument('patterns', nargs='*', help="glob patterns of variant names, e.g. '*Pitch0.5mm*'")
+    parser.add_argument('-r', '--regex', action='append', default=[], help='regular expression searched in the variant names')
+    parser.add_argument('-f', '--family', action='append', default=[], help='only the families matching this glob pattern')
+    parser.add_argument('-j', '--jobs', type=int, default=cq_batch.default_jobs(), help='number of FreeCAD processes')
+    parser.add_argument('--list', action='store_true', help='list the families and their number of variants')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='print the selected variants only')
+    parser.add_argument('--freecad', default=cq_batch.default_freecad(), help='FreeCAD executable (default: $FREECAD or freecad)')
+    parser.add_argument('--timeout', type=float, default=None, help='kill a variant after this many seconds')
+    parser.add_argument('--log-dir', default=None, help='keep the FreeCAD output of every variant here')
+    parser.add_argument('--report', default='cq_build_report.json', help='json report file')
+    args, extra_args = parser.parse_known_args(argv)
+    if extra_args and extra_args[0] == '--':
+        extra_args = extra_args[1:]
+    elif extra_args:
+        parser.error('unrecognized arguments: %s (generator arguments go after --)' % ' '.join(extra_args))
+    try:
+        expressions = [re.compile(r) for r in args.regex]
+    except re.error as e:
+        parser.error('invalid regular expression: %s' % e)
+
+    if args.list:
+        for family in family_params:
+            if not args.family or any(fnmatch.fnmatchcase(family, f) for f in args.family):
+                variants = _loadableVariants(family)
+                if variants is not None:
+                    print('%-28s %5d variants' % (family, len(variants)))
+        return 0
+    if not args.patterns and not args.regex:
+        parser.error('give glob patterns or --regex to select variants')
+
+    selection = selectVariants(args.patterns, args.regex, args.family)
+    total = sum(len(v) for v in selection.values())
+    if not total:
+        print('no variant matches')
+        return 2
+    if args.dry_run:
+        for family, variants in selection.items():
+            for variant in variants:
+                print('%s  %s' % (family, variant))
+        print('%d variants in %d families' % (total, len(selection)))
+        return 0
+
+    def progress(family, result):
+        print('%-8s %7.1fs  %s  %s%s' % (result.status, result.seconds, family, result.variant,
+                                         '  ('+result.error+')' if result.error else ''))
+        sys.stdout.flush()
+
+    start = time.time()
+    results = buildSelection(selection, args.jobs, extra_args, args.freecad, args.timeout,
+                             args.log_dir, progress)
+    seconds = time.time() - start
+    jobs = cq_batch.pool_size(args.jobs, total)
+    reports = [cq_batch.make_report(familyDir(family), family_results, jobs, seconds)
+               for family, family_results in results.items()]
+    failed = sum(r['failed'] for r in reports)
+    cq_batch.write_report({'jobs': jobs, 'seconds': round(seconds, 3), 'total': total,
+                           'ok': total - failed, 'failed': failed, 'families': reports}, args.report)
+    print('%d of %d variants built in %.1fs, report: %s' % (total - failed, total, seconds, args.report))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
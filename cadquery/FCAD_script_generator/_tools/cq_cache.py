@@ -0,0 +1,140 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* model cache: reuse the exported files of unchanged variants              *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#****************************************************************************
+
+## The exported files of a variant depend only on its Params entry, on the
+## generator building it (its whole source: make_* functions, colors,
+## export code) and on the _tools exporting it. A hash of these is the key
+## of a persistent on-disk cache:
+##
+##   key = cq_cache.modelKey(all_params[variant], [__file__], (color_pin_mark,))
+##   if cq_cache.fetchModel(key, ModelName, out_dir):
+##       continue            # .step/.wrl/.FCStd copied from the cache
+##   ... build and export ...
+##   cq_cache.storeModel(key, ModelName, out_dir, ['.step', '.wrl'])
+##
+## The cache lives in ~/.cache/kicad_cq_models, the environment variable
+## CQ_MODEL_CACHE selects another folder or disables it with 'off'.
+
+__title__ = "cache of generated models"
+__Comment__ = 'content addressed cache of the generated STEP, VRML and FCStd files'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import os, sys
+import glob
+import json
+import shutil
+import hashlib
+import tempfile
+from os.path import expanduser
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+
+def cacheDir():
+    """ Return the cache folder, None when the cache is disabled """
+    value = os.environ.get('CQ_MODEL_CACHE', '')
+    if value.lower() in ('off', '0', 'no'):
+        return None
+    if value:
+        return value
+    return os.path.join(expanduser('~'), '.cache', 'kicad_cq_models')
+
+_tools_fingerprint = None
+def toolsFingerprint():
+    """ Hash of the _tools sources, the exporters are part of every key """
+    global _tools_fingerprint
+    if _tools_fingerprint is None:
+        h = hashlib.sha1()
+        for filename in sorted(glob.glob(os.path.join(tools_dir, '*.py'))):
+            h.update(os.path.basename(filename).encode('utf-8'))
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        _tools_fingerprint = h.hexdigest()
+    return _tools_fingerprint
+
+def modelKey(params, source_files, extra=()):
+    """ Return the cache key of a variant.
+
+    `params` : the Params namedtuple of the variant
+    `source_files` : the files building the model, e.g. [__file__] of the
+                     generator: its module globals and export code count too
+    `extra` : anything else changing the output (options, license text ...)
+    """
+    h = hashlib.sha1()
+    h.update(repr(params).encode('utf-8'))
+    for filename in source_files:
+        filename = os.path.realpath(filename)
+        if filename.endswith(('.pyc', '.pyo')):
+            filename = filename[:-1]
+        with open(filename, 'rb') as f:
+            h.update(f.read())
+    h.update(repr(tuple(extra)).encode('utf-8'))
+    # the STEP header carries the build date of a reproducible build
+    h.update(os.environ.get('SOURCE_DATE_EPOCH', '').strip().encode('utf-8'))
+    h.update(toolsFingerprint().encode('utf-8'))
+    return h.hexdigest()
+
+def _entryDir(key):
+    base = cacheDir()
+    if base is None:
+        return None
+    return os.path.join(base, key[:2], key)
+
+def fetchModel(key, modelName, out_dir):
+    """ Copy the cached files of `key` to out_dir as modelName.*
+
+    Returns False (and copies nothing) on a cache miss. """
+    entry = _entryDir(key)
+    if entry is None or not os.path.isfile(os.path.join(entry, 'manifest.json')):
+        return False
+    with open(os.path.join(entry, 'manifest.json')) as f:
+        manifest = json.load(f)
+    extensions = manifest['extensions']
+    if not all(os.path.isfile(os.path.join(entry, 'model'+ext)) for ext in extensions):
+        return False
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    for ext in extensions:
+        shutil.copyfile(os.path.join(entry, 'model'+ext), os.path.join(out_dir, modelName+ext))
+    return True
+
+def storeModel(key, modelName, out_dir, extensions):
+    """ Store the out_dir/modelName.* files under `key`
+
+    `extensions` : the files this build wrote, e.g. ['.step', '.wrl'];
+    an older modelName.FCStd left in out_dir is not taken """
+    entry = _entryDir(key)
+    if entry is None:
+        return False
+    found = [ext for ext in extensions if os.path.isfile(os.path.join(out_dir, modelName+ext))]
+    if len(found) != len(extensions):
+        return False
+    parent = os.path.dirname(entry)
+    if not os.path.exists(parent):
+        os.makedirs(parent)
+    # fill a temporary folder and rename it, parallel builds never see half an entry
+    tmp = tempfile.mkdtemp(prefix='tmp_', dir=parent)
+    try:
+        for ext in found:
+            shutil.copyfile(os.path.join(out_dir, modelName+ext), os.path.join(tmp, 'model'+ext))
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump({'model': modelName, 'extensions': found}, f)
+        if os.path.exists(entry):
+            shutil.rmtree(entry)
+        os.rename(tmp, entry)
+    except OSError:
+        # another process stored the same key in the meantime
+        shutil.rmtree(tmp, ignore_errors=True)
+    return True
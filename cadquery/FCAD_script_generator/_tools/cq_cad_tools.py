@@ -30,12 +30,23 @@ __Comment__ = 'CadQuery exporting and fusion libs to generate STEP and VRML mode
 
 ___ver___ = "1.2.3 16/08/2015"
 
-import FreeCAD, Draft, FreeCADGui
-import ImportGui
-if FreeCAD.GuiUp:
+try:
+    import FreeCAD, Draft
+except ImportError: # the argument and text helpers also run without FreeCAD (cq_microbench.py)
+    FreeCAD = None
+if FreeCAD is not None and FreeCAD.GuiUp:
+    import FreeCADGui
+    import ImportGui
     from PySide import QtCore, QtGui
 #from Gui.Command import *
-import os
+import os, sys
+import step_optimize
+import add_license
+import cq_headless
+import shaderColors
+# build stage profiling (CQ_PROFILE=<report file>), see cq_profile
+from cq_profile import profileStage, profiled, setProfileVariant, writeProfileReport, \
+    profile_records, peakRSS
 
 #helper funcs for displaying messages in FreeCAD
 def say(*arg):
@@ -46,6 +57,12 @@ def sayw(*arg):
 
 def saye(*arg):
     FreeCAD.Console.PrintError(" ".join(map(str,arg)) + "\r\n")
+
+#message box in the GUI, warning on the console when headless
+def infoMessage(title, msg):
+    if FreeCAD.GuiUp:
+        return QtGui.QMessageBox.information(None, title, msg)
+    sayw(title, msg)
     
 #from an argument string, extract a list of numbers
 #numbers can be individual e.g. "3"
@@ -115,131 +132,126 @@ def close_CQ_Example(App, Gui):
 
 
 ###################################################################
-# FuseObjs_wColors()  maui
-#	Function to fuse two objects together.
+# lean boolean API
+#	The booleans run directly on the shapes (Shape.multiFuse /
+#	Shape.cut), the face colors of the result are mapped once from
+#	the colors of the operands (cq_headless.fuseParts/cutParts) and a
+#	single Part::Feature is added to the document: no Part::MultiFuse
+#	or Part::Cut feature, no recompute, no copy of view properties.
 ###################################################################
-def FuseObjs_wColors(App, Gui,
-                           docName, part1, part2, keepOriginals=False):
-
-    # Fuse two objects
-    App.ActiveDocument=None
-    Gui.ActiveDocument=None
+def _activateDoc(App, Gui, docName):
     App.setActiveDocument(docName)
     App.ActiveDocument=App.getDocument(docName)
-    Gui.ActiveDocument=Gui.getDocument(docName)
-    App.activeDocument().addObject("Part::MultiFuse","Fusion")
-    App.activeDocument().Fusion.Shapes = [App.ActiveDocument.getObject(part1), App.ActiveDocument.getObject(part2)]
-    Gui.ActiveDocument.Fusion.ShapeColor=Gui.ActiveDocument.getObject(part1).ShapeColor
-    Gui.ActiveDocument.Fusion.DisplayMode=Gui.ActiveDocument.getObject(part1).DisplayMode
-    App.ActiveDocument.recompute()
-
-    App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape
-    App.ActiveDocument.ActiveObject.Label=docName
-    fused_obj = App.ActiveDocument.ActiveObject
-
-    Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    App.ActiveDocument.recompute()
-
-    ## ## TBD refine Shape to reduce size maui
-    ## App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape.removeSplitter()
-    ## App.ActiveDocument.ActiveObject.Label=App.ActiveDocument.Fusion.Label
-    ## Gui.ActiveDocument.Fusion.hide()
-    ##
-    ## Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    ## Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    ## Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    ## Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    ## App.ActiveDocument.recompute()
-    ## App.ActiveDocument.ActiveObject.Label=docName
-    #######################################################
-    # Remove the part1 part2 objects
+    if Gui is not None and FreeCAD.GuiUp:
+        Gui.ActiveDocument=Gui.getDocument(docName)
+
+def objectPart(Gui, docName, obj):
+    """ ColoredPart of a document object, colored like its view provider """
+    color = None
+    face_colors = None
+    if Gui is not None and FreeCAD.GuiUp:
+        view = Gui.getDocument(docName).getObject(obj.Name)
+        color = view.ShapeColor
+        face_colors = view.DiffuseColor
+    return cq_headless.ColoredPart(obj.Label, obj.Shape, color, face_colors)
+
+def addColoredPart(App, Gui, docName, part, label=None, objName='Fusion'):
+    """ Add a ColoredPart to the document as one Part::Feature with per face colors """
+    obj = App.getDocument(docName).addObject('Part::Feature', objName)
+    obj.Shape = part.shape
+    obj.Label = label or part.name
+    if Gui is not None and FreeCAD.GuiUp and part.color is not None:
+        view = Gui.getDocument(docName).getObject(obj.Name)
+        view.ShapeColor = part.color
+        view.DiffuseColor = cq_headless.partFaceColors(part)
+    return obj
+
+@profiled('fuseObjs')
+def fuseObjs(App, Gui, docName, objs, label=None, keepOriginals=False):
+    """ Fuse document objects into a new colored object, returned """
+    _activateDoc(App, Gui, docName)
+    parts = [objectPart(Gui, docName, o) for o in objs]
+    fused_obj = addColoredPart(App, Gui, docName, cq_headless.fuseParts(parts), label or docName)
     if not keepOriginals:
-        App.getDocument(docName).removeObject(part1)
-        App.getDocument(docName).removeObject(part2)
-
-    # Remove the fusion itself
-    App.getDocument(docName).removeObject("Fusion")
-    ## App.getDocument(docName).removeObject("Fusion001")
-
+        for o in objs:
+            App.getDocument(docName).removeObject(o.Name)
     return fused_obj
-###################################################################
-# FuseObjs_wColors()  poeschlr
-#	Function to fuse multible objects together.
-###################################################################
-def multiFuseObjs_wColors(App, Gui, docName, objs, keepOriginals=False):
-
-    # Fuse two objects
-    App.ActiveDocument=None
-    Gui.ActiveDocument=None
-    App.setActiveDocument(docName)
-    App.ActiveDocument=App.getDocument(docName)
-    Gui.ActiveDocument=Gui.getDocument(docName)
-    App.activeDocument().addObject("Part::MultiFuse","Fusion")
-    App.activeDocument().Fusion.Shapes = objs
-    Gui.ActiveDocument.Fusion.ShapeColor=Gui.ActiveDocument.getObject(objs[0].Name).ShapeColor
-    Gui.ActiveDocument.Fusion.DisplayMode=Gui.ActiveDocument.getObject(objs[0].Name).DisplayMode
-    App.ActiveDocument.recompute()
-
-    App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape
-    App.ActiveDocument.ActiveObject.Label=docName
-    fused_obj = App.ActiveDocument.ActiveObject
-
-    Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    App.ActiveDocument.recompute()
 
-    # Remove the part1 part2 objects
+@profiled('cutObjs')
+def cutObjs(App, Gui, docName, obj, tool, label=None, keepOriginals=False):
+    """ Cut tool from obj into a new colored object, returned;
+    the faces left by the tool keep its color """
+    _activateDoc(App, Gui, docName)
+    cut = cq_headless.cutParts(objectPart(Gui, docName, obj), objectPart(Gui, docName, tool))
+    cut_obj = addColoredPart(App, Gui, docName, cut, label or docName)
     if not keepOriginals:
-        for o in objs:
-            App.getDocument(docName).removeObject(o.Name)
+        App.getDocument(docName).removeObject(obj.Name)
+        App.getDocument(docName).removeObject(tool.Name)
+    return cut_obj
+
+def showColoredParts(App, Gui, docName, parts):
+    """ Add ColoredParts built at shape level (colors as named color keys,
+    see cq_headless) to the document, one Part::Feature each.
+
+    Returns (objects, material substitutions for expVRML.determineColors) """
+    objs = []
+    material_substitutions = {}
+    for part in parts:
+        keys = cq_headless.partFaceColors(part)
+        rgb_part = cq_headless.ColoredPart(part.name, part.shape, cq_headless.colorToRGB(part.color),
+                                           [cq_headless.colorToRGB(k) for k in keys])
+        obj = addColoredPart(App, Gui, docName, rgb_part, part.name, 'Part')
+        objs.append(obj)
+        if Gui is not None and FreeCAD.GuiUp:
+            view = Gui.getDocument(docName).getObject(obj.Name)
+            for color, key in zip(view.DiffuseColor, keys):
+                if key in shaderColors.named_colors:
+                    material_substitutions[tuple(color[:-1])] = key
+    return objs, material_substitutions
 
-    # Remove the fusion itself
-    App.getDocument(docName).removeObject("Fusion")
+###################################################################
+# FuseObjs_wColors()  maui
+#	Function to fuse two objects together.
+###################################################################
+def FuseObjs_wColors(App, Gui,
+                           docName, part1, part2, keepOriginals=False):
 
-    return fused_obj
+    doc = App.getDocument(docName)
+    return fuseObjs(App, Gui, docName, [doc.getObject(part1), doc.getObject(part2)],
+                    docName, keepOriginals)
 
 ###################################################################
-# FuseObjs_wColors()  poeschlr
+# multiFuseObjs_wColors()  poeschlr
 #	Function to fuse multible objects together.
 ###################################################################
 def multiFuseObjs_wColors(App, Gui, docName, objs, keepOriginals=False):
 
-    # Fuse two objects
-    App.ActiveDocument=None
-    Gui.ActiveDocument=None
-    App.setActiveDocument(docName)
-    App.ActiveDocument=App.getDocument(docName)
-    Gui.ActiveDocument=Gui.getDocument(docName)
-    App.activeDocument().addObject("Part::MultiFuse","Fusion")
-    App.activeDocument().Fusion.Shapes = objs
-    Gui.ActiveDocument.Fusion.ShapeColor=Gui.ActiveDocument.getObject(objs[0].Name).ShapeColor
-    Gui.ActiveDocument.Fusion.DisplayMode=Gui.ActiveDocument.getObject(objs[0].Name).DisplayMode
-    App.ActiveDocument.recompute()
-
-    App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape
-    App.ActiveDocument.ActiveObject.Label=docName
-    fused_obj = App.ActiveDocument.ActiveObject
+    return fuseObjs(App, Gui, docName, objs, docName, keepOriginals)
 
-    Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    App.ActiveDocument.recompute()
-
-    # Remove the part1 part2 objects
+###################################################################
+# compoundObjs_wColors()
+#	Function to group objects into one colored compound,
+#	drop-in replacement of multiFuseObjs_wColors for the STEP export:
+#	no boolean fusion, every face keeps the color of its object.
+###################################################################
+@profiled('compoundObjs_wColors')
+def compoundObjs_wColors(App, Gui, docName, objs, keepOriginals=False):
+
+    import Part
+    parts = [objectPart(Gui, docName, o) for o in objs]
+    face_colors = []
+    for p in parts:
+        face_colors += cq_headless.partFaceColors(p)
+    compound = cq_headless.ColoredPart(docName, Part.makeCompound([p.shape for p in parts]),
+                                       parts[0].color, face_colors)
+    compound_obj = addColoredPart(App, Gui, docName, compound, docName, 'Compound')
+
+    # Remove the part objects
     if not keepOriginals:
         for o in objs:
             App.getDocument(docName).removeObject(o.Name)
 
-    # Remove the fusion itself
-    App.getDocument(docName).removeObject("Fusion")
-
-    return fused_obj
+    return compound_obj
 
 ###################################################################
 # FuseObjs_wColors_naming()  maui
@@ -248,89 +260,21 @@ def multiFuseObjs_wColors(App, Gui, docName, objs, keepOriginals=False):
 def FuseObjs_wColors_naming(App, Gui,
                            docName, part1, part2, name, keepOriginals=False):
 
-    # Fuse two objects
-    App.ActiveDocument=None
-    Gui.ActiveDocument=None
-    App.setActiveDocument(docName)
-    App.ActiveDocument=App.getDocument(docName)
-    Gui.ActiveDocument=Gui.getDocument(docName)
-    App.activeDocument().addObject("Part::MultiFuse","Fusion")
-    App.activeDocument().Fusion.Shapes = [App.ActiveDocument.getObject(part1), App.ActiveDocument.getObject(part2)]
-    Gui.ActiveDocument.Fusion.ShapeColor=Gui.ActiveDocument.getObject(part1).ShapeColor
-    Gui.ActiveDocument.Fusion.DisplayMode=Gui.ActiveDocument.getObject(part1).DisplayMode
-    App.ActiveDocument.recompute()
-
-    App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape
-    App.ActiveDocument.ActiveObject.Label=name
-
-    Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    App.ActiveDocument.recompute()
-
-    ## ## TBD refine Shape to reduce size maui
-    ## App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape.removeSplitter()
-    ## App.ActiveDocument.ActiveObject.Label=App.ActiveDocument.Fusion.Label
-    ## Gui.ActiveDocument.Fusion.hide()
-    ##
-    ## Gui.ActiveDocument.ActiveObject.ShapeColor=Gui.ActiveDocument.Fusion.ShapeColor
-    ## Gui.ActiveDocument.ActiveObject.LineColor=Gui.ActiveDocument.Fusion.LineColor
-    ## Gui.ActiveDocument.ActiveObject.PointColor=Gui.ActiveDocument.Fusion.PointColor
-    ## Gui.ActiveDocument.ActiveObject.DiffuseColor=Gui.ActiveDocument.Fusion.DiffuseColor
-    ## App.ActiveDocument.recompute()
-    ## App.ActiveDocument.ActiveObject.Label=docName
-    #######################################################
-    # Remove the part1 part2 objects
-    if not keepOriginals:
-        App.getDocument(docName).removeObject(part1)
-        App.getDocument(docName).removeObject(part2)
-
-    # Remove the fusion itself
-    App.getDocument(docName).removeObject("Fusion")
-    ## App.getDocument(docName).removeObject("Fusion001")
-
+    doc = App.getDocument(docName)
+    fuseObjs(App, Gui, docName, [doc.getObject(part1), doc.getObject(part2)],
+             name, keepOriginals)
     return 0
 
 ###################################################################
 # CutObjs_wColors()  maui
-#	Function to fuse two objects together.
+#	Function to cut part2 from part1.
 ###################################################################
 def CutObjs_wColors(App, Gui,
                            docName, part1, part2):
 
-    # Fuse two objects
-    App.ActiveDocument=None
-    Gui.ActiveDocument=None
-    App.setActiveDocument(docName)
-    App.ActiveDocument=App.getDocument(docName)
-    Gui.ActiveDocument=Gui.getDocument(docName)
-    #Gui.activateWorkbench("PartWorkbench")
-    obj1=App.ActiveDocument.getObject(part1)
-    obj2=App.ActiveDocument.getObject(part2)
-    App.activeDocument().addObject("Part::Cut","Cut")
-
-    App.activeDocument().Cut.Base = obj1
-    App.activeDocument().Cut.Tool = obj2
-    #Gui.activeDocument().getObject(objs[0].Name).Visibility=False
-    #Gui.activeDocument().getObject(objs[2].Name).Visibility=False
-    #Gui.ActiveDocument.Cut.ShapeColor=Gui.ActiveDocument.Shape0_0403661773302.ShapeColor
-    #Gui.ActiveDocument.Cut.DisplayMode=Gui.ActiveDocument.Shape0_0403661773302.DisplayMode
-    App.ActiveDocument.recompute()
-
-    ### App.ActiveDocument.addObject('Part::Feature','Fusion').Shape=App.ActiveDocument.Fusion.Shape
-    App.ActiveDocument.ActiveObject.Label=docName
-
-    # Remove the part1 part2 objects
-    App.getDocument(docName).removeObject(part1)
-    App.getDocument(docName).removeObject(part2)
-
-    # Remove the fusion itself
-    #App.getDocument(docName).removeObject("Fusion")
-    ## App.getDocument(docName).removeObject("Fusion001")
-
+    doc = App.getDocument(docName)
+    cutObjs(App, Gui, docName, doc.getObject(part1), doc.getObject(part2), docName)
     return 0
-
 ###################################################################
 # GetListOfObjects()  maui
 #	Function to fuse two objects together.
@@ -372,6 +316,9 @@ def Color_Objects(Gui,obj,color):
 ###################################################################
 def restore_Main_Tools():
 
+    if not FreeCAD.GuiUp: #nothing to restore in FreeCADCmd
+        return 0
+
     #Getting the main window will allow us to start setting things up the way we want
     mw = FreeCADGui.getMainWindow()
 
@@ -405,6 +352,7 @@ def z_RotateObject(doc, rot):
 #	Function to Export to STEP
 #
 ###################################################################
+@profiled('exportSTEP')
 def exportSTEP(doc,modelName, dir, objectToExport=None):
 
     ## Export to STEP
@@ -424,6 +372,11 @@ def exportSTEP(doc,modelName, dir, objectToExport=None):
     # FreeCAD.Console.PrintMessage(objs)
     FreeCAD.Console.PrintMessage('\r\n'+outdir)
     ImportGui.export(objs,StepFileName)
+    if add_license.check_stable_export:
+        add_license.checkStableExport(lambda filepath: ImportGui.export(objs, filepath), StepFileName)
+    result = step_optimize.optimizeExport(StepFileName)
+    if result is not None:
+        say('STEP optimized: '+step_optimize.describe(result))
 
     return 0
 
@@ -472,13 +425,68 @@ def exportVRML(doc,modelName,scale,dir):
 
     return 0
 
+###################################################################
+# DocumentPool()
+#	Documents of the variants built in one run. newDocument() closes
+#	the oldest ones so that at most `keep` stay open: an "all" run no
+#	longer piles up one document per variant. Closed on exit when
+#	used as a context manager.
+#	  doc_pool = DocumentPool(App, Gui)
+#	  for variant in variants:
+#	      doc = doc_pool.newDocument(CheckedModelName)
+###################################################################
+# FCStd output of saveFCdoc, CQ_SAVE_FCSTD=0 in the environment skips it
+save_fcstd = os.environ.get('CQ_SAVE_FCSTD', '1').lower() not in ('0', 'off', 'no')
+# documents left open by a DocumentPool, the last model stays on screen
+keep_documents = 1
+
+class DocumentPool(object):
+
+    def __init__(self, App, Gui=None, keep=None):
+        self.App = App
+        self.Gui = Gui
+        self.keep = keep_documents if keep is None else keep
+        self.names = []
+
+    def newDocument(self, name):
+        self.trim(self.keep - 1)
+        doc = self.App.newDocument(name)
+        # newDocument renames on a clash, use the actual name
+        self.App.setActiveDocument(doc.Name)
+        self.App.ActiveDocument = self.App.getDocument(doc.Name)
+        if self.Gui is not None and self.App.GuiUp:
+            self.Gui.ActiveDocument = self.Gui.getDocument(doc.Name)
+        self.names.append(doc.Name)
+        return doc
+
+    def trim(self, keep):
+        """ close the oldest documents until `keep` are left """
+        while len(self.names) > max(keep, 0):
+            name = self.names.pop(0)
+            if name in self.App.listDocuments(): # not already closed by the user
+                self.App.closeDocument(name)
+
+    def close(self):
+        self.trim(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
 ###################################################################
 # saveFCdoc()  maui
 #	Function to save in Native FreeCAD format the doc
 #
 ###################################################################
+@profiled('saveFCdoc')
 def saveFCdoc(App, Gui, doc, modelName,dir):
 
+    if not save_fcstd:
+        FreeCAD.Console.PrintMessage('\r\n'+modelName+'.FCStd not saved (save_fcstd off)\r\n')
+        return 0
     ## Save to disk in native format
     App.ActiveDocument=None
     Gui.ActiveDocument=None
@@ -491,12 +499,10 @@ def saveFCdoc(App, Gui, doc, modelName,dir):
     FreeCAD.Console.PrintMessage('\r\n'+outdir)
     FCName=outdir+os.sep+modelName+'.FCStd'
     FreeCAD.Console.PrintMessage('\r\n'+FCName+'\r\n')
-    App.getDocument(doc.Name).saveAs(FCName)
     App.ActiveDocument.recompute()
-
+    # label first, the document is then written (zipped) only once
     App.getDocument(doc.Name).Label = doc.Name
-    Gui.SendMsgToActiveView("Save")
-    App.getDocument(doc.Name).save()
+    App.getDocument(doc.Name).saveAs(FCName)
     try:
         os.remove(outdir+os.sep+modelName+'.FCStd1') #removing backup file
     except:
@@ -519,14 +525,14 @@ def checkRequirements(cq):
     
     if int(FC_majorV) <= 0:
         if int(FC_minorV) < 15:
-            reply = QtGui.QMessageBox.information(None,"Warning! ...","use FreeCAD version >= "+FC_majorV+"."+FC_minorV+"\r\n")
+            reply = infoMessage("Warning! ...","use FreeCAD version >= "+FC_majorV+"."+FC_minorV+"\r\n")
 
     #check version
     cqv=cq.__version__.split(".")
     #say2(cqv)
     if int(cqv[0])==0 and int(cqv[1])<3:
         msg = "CadQuery Module needs to be at least 0.3.0!\r\n\r\n"
-        reply = QtGui.QMessageBox.information(None, "Info ...", msg)
+        reply = infoMessage("Info ...", msg)
         say("cq needs to be at least 0.3.0")
         stop
     
@@ -534,6 +540,6 @@ def checkRequirements(cq):
         msg="missing CadQuery 0.3.0 or later Module!\r\n\r\n"
         msg+="https://github.com/jmwright/cadquery-freecad-module/wiki\n"
         msg+="actual CQ version "+cq.__version__
-        reply = QtGui.QMessageBox.information(None,"Info ...",msg)
+        reply = infoMessage("Info ...",msg)
 
     return 0
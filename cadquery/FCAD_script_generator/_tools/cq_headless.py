@@ -0,0 +1,412 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* headless tools: colored parts and STEP/VRML export without FreeCADGui    *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## The GUI tools in cq_cad_tools keep the color of a part in its view
+## provider (Gui.ActiveDocument.getObject(...).DiffuseColor), so every model
+## needs a FreeCAD main window. Here the color travels as data next to the
+## shape instead, which works the same in FreeCADCmd:
+##
+##   body = coloredPart('body', case, 'black body')
+##   pins = coloredPart('pins', pins, 'metal grey pins')
+##   model = fuseParts([body, pins], ModelName)
+##   exportSTEPheadless([model], ModelName, out_dir)
+##   exportVRMLheadless([model], ModelName, out_dir, LIST_license)
+
+__title__ = "CadQuery headless exporting and fusion libs"
+__Comment__ = 'export STEP and VRML models with colors from FreeCADCmd, without FreeCADGui'
+
+___ver___ = "1.0.0 18/10/2026"
+
+try:
+    import FreeCAD, Part
+except ImportError: # the helpers of cq_cad_tools are imported without FreeCAD too (cq_microbench.py)
+    FreeCAD = None
+import os, sys
+import tempfile
+from collections import namedtuple
+
+import shaderColors
+import exportPartToVRML as expVRML
+import exportMeshFormats
+import step_optimize
+import add_license
+from cq_profile import profiled
+
+def say(*arg):
+    FreeCAD.Console.PrintMessage(" ".join(map(str,arg)) + "\r\n")
+
+def sayw(*arg):
+    FreeCAD.Console.PrintWarning(" ".join(map(str,arg)) + "\r\n")
+
+# name: label of the part
+# shape: Part.Shape
+# color: named color key of shaderColors.named_colors or (r, g, b), values from 0 to 1.0
+# face_colors: one color per shape.Faces entry, None means `color` on every face
+ColoredPart = namedtuple('ColoredPart', ['name', 'shape', 'color', 'face_colors'])
+
+def toPartShape(obj):
+    """ Return the Part.Shape of a cadquery Workplane, cadquery Shape or Part.Shape """
+    if hasattr(obj, 'toFreecad'):
+        return obj.toFreecad()
+    if hasattr(obj, 'wrapped'):
+        return obj.wrapped
+    return obj
+
+def coloredPart(name, obj, color, face_colors=None):
+    return ColoredPart(name, toPartShape(obj), color, face_colors)
+
+def importCadQuery():
+    """ Import cadquery without activating the CadQuery workbench.
+
+    The workbench only adds its Libs folder to sys.path, do the same here so
+    the generators also run in FreeCADCmd. """
+    try:
+        import cadquery
+        return cadquery
+    except ImportError:
+        pass
+    for base in (FreeCAD.getUserAppDataDir(), FreeCAD.getHomePath()):
+        mod_dir = os.path.join(base, 'Mod', 'CadQuery')
+        for path in (mod_dir, os.path.join(mod_dir, 'Libs')):
+            if os.path.isdir(path) and path not in sys.path:
+                sys.path.append(path)
+    import cadquery
+    return cadquery
+
+###################################################################
+# face colors
+###################################################################
+def partFaceColors(part):
+    """ Return the list of colors of the part, one for every face """
+    if part.face_colors is not None and len(part.face_colors) == len(part.shape.Faces):
+        return list(part.face_colors)
+    return [part.color] * len(part.shape.Faces)
+
+def colorToRGB(color):
+    """ Return the diffuse (r, g, b) of a named color key or the color itself """
+    if color in shaderColors.named_colors:
+        return shaderColors.named_colors[color].getDiffuseFloat()
+    return tuple(color[:3])
+
+def _pointOnFace(face):
+    """ Return a point lying on `face`, away from its boundary edges. """
+    points, triangles = face.tessellate(0.1)
+    if triangles:
+        best = None
+        best_area = -1.0
+        for t in triangles:
+            a, b, c = points[t[0]], points[t[1]], points[t[2]]
+            area = (b - a).cross(c - a).Length
+            if area > best_area:
+                best, best_area = (a, b, c), area
+        a, b, c = best
+        p = FreeCAD.Vector((a.x+b.x+c.x)/3.0, (a.y+b.y+c.y)/3.0, (a.z+b.z+c.z)/3.0)
+    else:
+        u0, u1, v0, v1 = face.ParameterRange
+        p = face.valueAt((u0+u1)/2.0, (v0+v1)/2.0)
+    # the triangle centre is off a curved surface by up to the deviation
+    try:
+        u, v = face.Surface.parameter(p)
+        p = face.Surface.value(u, v)
+    except Exception:
+        pass
+    return p
+
+def _faceHash(face):
+    try:
+        return face.hashCode()
+    except AttributeError: # FreeCAD without TopoShape.hashCode
+        return None
+
+def mapFaceColors(shape, parts, tolerance=1e-3):
+    """ Return the color of every face of `shape`, the result of a boolean
+    operation between `parts`, without the history of the operation.
+
+    The faces the operation left unchanged are shared with the operands
+    and found by hash. Any other result face is a piece of one face of the
+    operands, so it gets the color of the first operand face it lies on.
+    The operands are searched in the given order. This is the fallback of
+    fuseParts/cutParts without pythonocc (see _occBoolean). """
+    sources = []
+    unchanged = {}
+    for part in parts:
+        for face, color in zip(part.shape.Faces, partFaceColors(part)):
+            bb = FreeCAD.BoundBox(face.BoundBox)
+            bb.enlarge(tolerance)
+            sources.append((face, bb, color))
+            key = _faceHash(face)
+            if key is not None:
+                unchanged.setdefault(key, []).append((face, color))
+    default_color = parts[0].color
+
+    face_colors = []
+    for face in shape.Faces:
+        same = [c for f, c in unchanged.get(_faceHash(face), ()) if f.isSame(face)]
+        if same:
+            face_colors.append(same[0])
+            continue
+        p = _pointOnFace(face)
+        vertex = Part.Vertex(p)
+        color = default_color
+        for src_face, bb, src_color in sources:
+            if bb.isInside(p) and src_face.distToShape(vertex)[0] <= tolerance:
+                color = src_color
+                break
+        face_colors.append(color)
+    return face_colors
+
+###################################################################
+# boolean operations keeping the colors
+###################################################################
+def _hasOCC():
+    try:
+        import OCC
+        return True
+    except ImportError:
+        return False
+
+_warned_no_history = []
+def _resultFaceColors(shape, parts):
+    # uncolored operands (documents without GUI): nothing to map
+    if all(p.color is None for p in parts):
+        return None
+    if not _warned_no_history:
+        _warned_no_history.append(True)
+        sayw('pythonocc not available, the face colors of the booleans are matched by position')
+    return mapFaceColors(shape, parts)
+
+def _occFaceMap(occ_shape):
+    """ the faces of a pythonocc shape, indexed from 1 in the order of Part.Shape.Faces """
+    from OCC.TopTools import TopTools_IndexedMapOfShape
+    from OCC.TopExp import topexp_MapShapes
+    from OCC.TopAbs import TopAbs_FACE
+    face_map = TopTools_IndexedMapOfShape()
+    topexp_MapShapes(occ_shape, TopAbs_FACE, face_map)
+    return face_map
+
+def _occFaces(occ_shape, colors):
+    """ [(face, color)] of a pythonocc shape """
+    face_map = _occFaceMap(occ_shape)
+    return [(face_map.FindKey(i+1), colors[i]) for i in range(face_map.Extent())]
+
+def _occBoolean(cut, parts):
+    """ Fuse the parts, or cut parts[1:] from parts[0], in OCC and carry the
+    face colors through the history of every step: a face keeps its color
+    when the step leaves it, its pieces (Modified) get it, deleted faces
+    are dropped. Returns (Part.Shape, face colors); a face that is the
+    image of several operand faces gets the color of the first operand. """
+    from OCC.BRepAlgoAPI import BRepAlgoAPI_Fuse, BRepAlgoAPI_Cut
+    from OCC.TopTools import TopTools_ListIteratorOfListOfShape
+    result = _toOCC(parts[0].shape)
+    tracked = _occFaces(result, partFaceColors(parts[0]))
+    for part in parts[1:]:
+        tool = _toOCC(part.shape)
+        tracked += _occFaces(tool, partFaceColors(part))
+        step = BRepAlgoAPI_Cut(result, tool) if cut else BRepAlgoAPI_Fuse(result, tool)
+        if not step.IsDone():
+            raise RuntimeError('boolean operation of %s with %s failed' % (parts[0].name, part.name))
+        images = []
+        for face, color in tracked:
+            modified = step.Modified(face)
+            if modified.IsEmpty():
+                if not step.IsDeleted(face):
+                    images.append((face, color))
+                continue
+            it = TopTools_ListIteratorOfListOfShape(modified)
+            while it.More():
+                images.append((it.Value(), color))
+                it.Next()
+        tracked = images
+        result = step.Shape()
+    face_map = _occFaceMap(result)
+    face_colors = [None] * face_map.Extent()
+    for face, color in tracked:
+        i = face_map.FindIndex(face)
+        if i and face_colors[i-1] is None:
+            face_colors[i-1] = color
+    return _fromOCC(result), [parts[0].color if c is None else c for c in face_colors]
+
+@profiled('fuseParts')
+def fuseParts(parts, name=None):
+    """ Fuse colored parts into one ColoredPart with per face colors """
+    shapes = [p.shape for p in parts]
+    if len(shapes) == 1:
+        return ColoredPart(name or parts[0].name, shapes[0].copy(), parts[0].color, parts[0].face_colors)
+    if _hasOCC() and any(p.color is not None for p in parts):
+        fused, face_colors = _occBoolean(False, parts)
+        return ColoredPart(name or parts[0].name, fused, parts[0].color, face_colors)
+    if hasattr(shapes[0], 'multiFuse'):
+        fused = shapes[0].multiFuse(shapes[1:])
+    else:
+        fused = shapes[0]
+        for s in shapes[1:]:
+            fused = fused.fuse(s)
+    return ColoredPart(name or parts[0].name, fused, parts[0].color,
+                       _resultFaceColors(fused, parts))
+
+@profiled('cutParts')
+def cutParts(part, tool, name=None):
+    """ Cut `tool` from `part`; the faces left by the tool keep its color
+    (e.g. the pin 1 mark pocket in the body) """
+    if _hasOCC() and (part.color is not None or tool.color is not None):
+        cut, face_colors = _occBoolean(True, [part, tool])
+        return ColoredPart(name or part.name, cut, part.color, face_colors)
+    cut = part.shape.cut(tool.shape)
+    return ColoredPart(name or part.name, cut, part.color,
+                       _resultFaceColors(cut, [part, tool]))
+
+def rotateParts(parts, angle, axis=(0,0,1)):
+    """ Rotate the parts around the origin, like z_RotateObject does for document objects """
+    rotated = []
+    for p in parts:
+        shape = p.shape.copy()
+        shape.rotate(FreeCAD.Vector(0,0,0), FreeCAD.Vector(*axis), angle)
+        rotated.append(p._replace(shape=shape))
+    return rotated
+
+###################################################################
+# STEP export
+###################################################################
+def _toOCC(shape):
+    """ Convert a FreeCAD Part.Shape into a pythonocc TopoDS_Shape """
+    from OCC.TopoDS import TopoDS_Shape
+    from OCC.BRep import BRep_Builder
+    from OCC.BRepTools import breptools_Read
+    fd, brep_file = tempfile.mkstemp(suffix='.brep')
+    os.close(fd)
+    try:
+        shape.exportBrep(brep_file)
+        occ_shape = TopoDS_Shape()
+        breptools_Read(occ_shape, brep_file, BRep_Builder())
+    finally:
+        os.remove(brep_file)
+    return occ_shape
+
+def _fromOCC(occ_shape):
+    """ Convert a pythonocc TopoDS_Shape into a FreeCAD Part.Shape """
+    from OCC.BRepTools import breptools_Write
+    fd, brep_file = tempfile.mkstemp(suffix='.brep')
+    os.close(fd)
+    try:
+        breptools_Write(occ_shape, brep_file)
+        shape = Part.Shape()
+        shape.importBrep(brep_file)
+    finally:
+        os.remove(brep_file)
+    return shape
+
+def _writeXCAF(parts, StepFileName):
+    """ Write the parts with face colors through the OCC XCAF document
+    (see pythonocc/ImportExportStepR3.py) """
+    from OCC.TCollection import TCollection_ExtendedString
+    from OCC.TDocStd import Handle_TDocStd_Document
+    from OCC.XCAFApp import XCAFApp_Application
+    from OCC.XCAFDoc import XCAFDoc_DocumentTool_ShapeTool, XCAFDoc_DocumentTool_ColorTool, \
+        XCAFDoc_ColorSurf
+    from OCC.TDataStd import TDataStd_Name
+    from OCC.STEPCAFControl import STEPCAFControl_Writer
+    from OCC.STEPControl import STEPControl_AsIs
+    from OCC.Interface import Interface_Static_SetCVal
+    from OCC.IFSelect import IFSelect_RetDone
+    from OCC.Quantity import Quantity_Color, Quantity_TOC_RGB
+    from OCC.TopTools import TopTools_IndexedMapOfShape
+    from OCC.TopExp import topexp_MapShapes
+    from OCC.TopAbs import TopAbs_FACE
+
+    h_doc = Handle_TDocStd_Document()
+    app = XCAFApp_Application.GetApplication().GetObject()
+    app.NewDocument(TCollection_ExtendedString("MDTV-XCAF"), h_doc)
+    doc = h_doc.GetObject()
+    shape_tool = XCAFDoc_DocumentTool_ShapeTool(doc.Main()).GetObject()
+    color_tool = XCAFDoc_DocumentTool_ColorTool(doc.Main()).GetObject()
+
+    def quantity(color):
+        r, g, b = colorToRGB(color)
+        return Quantity_Color(r, g, b, Quantity_TOC_RGB)
+
+    for part in parts:
+        occ_shape = _toOCC(part.shape)
+        label = shape_tool.AddShape(occ_shape, False)
+        TDataStd_Name.Set(label, TCollection_ExtendedString(part.name))
+        colors = partFaceColors(part)
+        if len(set(colors)) <= 1:
+            color_tool.SetColor(label, quantity(part.color if not colors else colors[0]), XCAFDoc_ColorSurf)
+            continue
+        # same face indexing as FreeCAD's shape.Faces
+        face_map = TopTools_IndexedMapOfShape()
+        topexp_MapShapes(occ_shape, TopAbs_FACE, face_map)
+        for i in range(face_map.Extent()):
+            face_label = shape_tool.AddSubShape(label, face_map.FindKey(i+1))
+            color_tool.SetColor(face_label, quantity(colors[i]), XCAFDoc_ColorSurf)
+
+    writer = STEPCAFControl_Writer()
+    writer.SetColorMode(True)
+    writer.SetNameMode(True)
+    Interface_Static_SetCVal("write.step.schema", "AP214")
+    writer.Transfer(h_doc, STEPControl_AsIs)
+    return writer.Write(StepFileName) == IFSelect_RetDone
+
+def _exportShapes(parts, StepFileName):
+    """ the parts exported by FreeCAD, without colors """
+    if len(parts) == 1:
+        shape = parts[0].shape
+    else:
+        shape = Part.makeCompound([p.shape for p in parts])
+    shape.exportStep(StepFileName)
+
+@profiled('exportSTEPheadless')
+def exportSTEPheadless(parts, modelName, dir):
+    """ Export colored parts to dir/modelName.step without FreeCADGui.
+
+    Colors are written with pythonocc when it is installed; otherwise the
+    shapes are exported by FreeCAD without colors. """
+    StepFileName = dir+os.sep+modelName+'.step'
+    say(StepFileName)
+    has_occ = _hasOCC()
+    if not (has_occ and _writeXCAF(parts, StepFileName)):
+        sayw('pythonocc not available, '+StepFileName+' is written without colors')
+        has_occ = False
+        _exportShapes(parts, StepFileName)
+    if add_license.check_stable_export:
+        def exportAgain(filepath):
+            if not (has_occ and _writeXCAF(parts, filepath)):
+                _exportShapes(parts, filepath)
+        add_license.checkStableExport(exportAgain, StepFileName)
+    result = step_optimize.optimizeExport(StepFileName)
+    if result is not None:
+        say('STEP optimized: '+step_optimize.describe(result))
+    return StepFileName
+
+###################################################################
+# VRML export
+###################################################################
+def exportVRMLheadless(parts, modelName, dir, licence_info=None, scale=1/2.54,
+                       creaseAngle=expVRML.creaseAngle_default, merge=True, profile=None,
+                       extension='.wrl'):
+    """ Export colored parts to dir/modelName.wrl without FreeCADGui
+
+    `merge` writes one welded IndexedFaceSet per material (see expVRML.mergeMeshes)
+    `profile` is the tessellation profile (see expVRML.tessellation_profiles)
+    `extension` selects another mesh format, e.g. '.wrl.gz' or '.glb' (see exportMeshFormats) """
+    VrmlFileName = dir+os.sep+modelName+extension
+    colored_meshes = expVRML.iterColoredMeshFromParts(parts, scale, merge, profile)
+    used_color_keys = expVRML.getNamedColors([c for p in parts for c in partFaceColors(p)])
+    exportMeshFormats.writeMeshFile(colored_meshes, VrmlFileName, used_color_keys, licence_info, creaseAngle)
+    return VrmlFileName
@@ -29,8 +29,74 @@ def poline(points, plane):
     plane=plane.polyline(points)
     return plane
 
+def _boundBox(o, tolerance):
+    """ enlarged FreeCAD bounding box of a cadquery Workplane (all its
+    solids, like make_compound) or Shape """
+    import FreeCAD
+    bb = FreeCAD.BoundBox()
+    for shape in (o.vals() if hasattr(o, 'vals') else [o]):
+        bb.add(shape.wrapped.BoundBox)
+    bb.enlarge(tolerance)
+    return bb
+
+def touching_groups(objects, tolerance=1e-3):
+    """ Split `objects` into groups whose bounding boxes overlap (or touch),
+    objects of different groups cannot share any volume.
+
+    A sweep along x keeps this about linear for a grid of pins. """
+    boxes = [_boundBox(o, tolerance) for o in objects]
+    parent = list(range(len(objects)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    order = sorted(range(len(objects)), key=lambda i: boxes[i].XMin)
+    active = []
+    for i in order:
+        active = [j for j in active if boxes[j].XMax >= boxes[i].XMin]
+        for j in active:
+            if boxes[i].intersect(boxes[j]):
+                parent[find(i)] = find(j)
+        active.append(i)
+    groups = {}
+    for i in range(len(objects)):
+        groups.setdefault(find(i), []).append(i)
+    return [[objects[i] for i in g] for g in sorted(groups.values())]
+
+def union_tree(objects):
+    """ Union cadquery objects pairwise in a balanced tree.
+
+    Folding o = o.union(next) makes OCC rework a growing solid for every
+    object; with pairs of similar size the work is about n log n. """
+    objects = list(objects)
+    while len(objects) > 1:
+        paired = [objects[i].union(objects[i+1]) for i in range(0, len(objects)-1, 2)]
+        if len(objects) % 2:
+            paired.append(objects[-1])
+        objects = paired
+    return objects[0]
+
+def make_compound(objects):
+    """ One cadquery Workplane holding the disjoint `objects` as a compound,
+    no boolean operation at all """
+    import cadquery as cq
+    import Part
+    shapes = []
+    for o in objects:
+        shapes += [v.wrapped for v in (o.vals() if hasattr(o, 'vals') else [o])]
+    # cadquery treats a compound of several solids as a Solid
+    return cq.Workplane("XY").newObject([cq.Solid(Part.makeCompound(shapes))])
+
 def union_all(objects):
-    o = objects[0]
-    for i in range(1,len(objects)):
-        o = o.union(objects[i])
-    return o
+    """ Union of cadquery objects (e.g. all the pins of a package).
+
+    Objects touching each other are fused in a balanced tree; groups that
+    cannot touch (separate pins, balls) are only collected in a compound. """
+    objects = list(objects)
+    if len(objects) == 1:
+        return objects[0]
+    groups = [union_tree(g) for g in touching_groups(objects)]
+    if len(groups) == 1:
+        return groups[0]
+    return make_compound(groups)
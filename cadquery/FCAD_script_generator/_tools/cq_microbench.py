@@ -0,0 +1,235 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* micro-benchmarks of the writers, license and colors, without FreeCAD     *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## Times the plain python parts of an export, no FreeCAD needed:
+##   writeVRMLFile          synthetic meshes and the meshes of test-vrml/*.wrl
+##                          (points are the Vector stand-in below)
+##   toVRMLdefinition       all the shaderColors.named_colors
+##   FNCT_modify_step       the headers of pythonocc/*.stp
+##   addLicenseToStep       the whole rewrite of a copy of pythonocc/*.stp
+##   getListOfNumbers       the pin arguments of the generators
+## Every benchmark is calibrated to run about --min-time seconds per round,
+## the table gives min/median/mean/stddev per call over --rounds rounds.
+##
+## usage:
+##   python cq_microbench.py
+##   python cq_microbench.py -k vrml --rounds 10 --json before.json
+##   python cq_microbench.py --compare before.json
+
+__title__ = "micro-benchmarks of the writers without FreeCAD"
+__Comment__ = 'time the VRML writer, the STEP license, the colors and the argument helpers without FreeCAD'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import re
+import json
+import time
+import math
+import shutil
+import tempfile
+from collections import OrderedDict
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import shaderColors
+import exportPartToVRML as expVRML
+import add_license
+import cq_cad_tools
+
+samples_dir = os.path.join(tools_dir, os.pardir, os.pardir, os.pardir)
+vrml_samples = ['test-vrml/nasty_cheese-fc-ksu.wrl']
+step_samples = ['pythonocc/cube-out-fc.stp', 'pythonocc/sg1-c5-214.stp', 'pythonocc/sg1-c5-214-out.stp']
+
+class Vector(object):
+    """ Stand-in of FreeCAD.Vector for the meshes """
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __mul__(self, scale):
+        return Vector(self.x*scale, self.y*scale, self.z*scale)
+
+def syntheticMesh(rows, columns, color='black body'):
+    """ A wavy grid of rows x columns quads as 2 triangles each """
+    points = [Vector(i*0.1, j*0.1, 0.05*math.sin(i*0.3)*math.cos(j*0.2))
+              for i in range(rows+1) for j in range(columns+1)]
+    faces = []
+    for i in range(rows):
+        for j in range(columns):
+            a = i*(columns+1) + j
+            b = a + columns + 1
+            faces += [(a, b, a+1), (a+1, b, b+1)]
+    return expVRML.Mesh(points=points, faces=faces, color=color, transp=0.0)
+
+_face_set = re.compile(r"IndexedFaceSet\s*\{(.*?)\}\s*\}", re.S)
+_coord_index = re.compile(r"coordIndex\s*\[([^\]]*)\]")
+_point = re.compile(r"point\s*\[([^\]]*)\]")
+
+def readVRMLMeshes(filepath, color='metal grey pins'):
+    """ The IndexedFaceSets of a VRML file as Meshes, polygons as triangle fans """
+    with open(filepath) as f:
+        text = f.read()
+    meshes = []
+    for face_set in _face_set.finditer(text):
+        indexes = _coord_index.search(face_set.group(1))
+        coordinates = _point.search(face_set.group(1))
+        if indexes is None or coordinates is None:
+            continue
+        values = [float(v) for v in coordinates.group(1).replace(',', ' ').split()]
+        points = [Vector(*values[i:i+3]) for i in range(0, len(values) - 2, 3)]
+        faces = []
+        polygon = []
+        for index in indexes.group(1).replace(',', ' ').split():
+            index = int(index)
+            if index >= 0:
+                polygon.append(index)
+                continue
+            faces += [(polygon[0], polygon[k], polygon[k+1]) for k in range(1, len(polygon) - 1)]
+            polygon = []
+        if faces:
+            meshes.append(expVRML.Mesh(points=points, faces=faces, color=color, transp=0.0))
+    return meshes
+
+def samplePath(sample):
+    return os.path.normpath(os.path.join(samples_dir, sample))
+
+def benchmark(function, rounds=5, min_time=0.2):
+    """ pytest-benchmark style timing of function(): the number of calls per
+    round is calibrated to last about min_time. Returns the statistics per call """
+    calls = 1
+    while True:
+        start = time.time()
+        for i in range(calls):
+            function()
+        elapsed = time.time() - start
+        if elapsed >= min_time or calls >= 1000000:
+            break
+        calls *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed) + 1)
+    times = [elapsed / calls]
+    for r in range(rounds - 1):
+        start = time.time()
+        for i in range(calls):
+            function()
+        times.append((time.time() - start) / calls)
+    times.sort()
+    mean = sum(times) / len(times)
+    median = times[len(times) // 2] if len(times) % 2 else (times[len(times)//2 - 1] + times[len(times)//2]) / 2.0
+    stddev = math.sqrt(sum((t - mean)**2 for t in times) / (len(times) - 1)) if len(times) > 1 else 0.0
+    return OrderedDict([('min', times[0]), ('median', median), ('mean', mean), ('stddev', stddev),
+                        ('rounds', len(times)), ('calls', calls)])
+
+def benchmarks(work_dir):
+    """ OrderedDict(name: function) of the micro-benchmarks """
+    cases = OrderedDict()
+    color_keys = list(shaderColors.named_colors)
+
+    def vrml(name, meshes, keys):
+        filepath = os.path.join(work_dir, name + '.wrl')
+        cases['writeVRMLFile[%s]' % name] = lambda: expVRML.writeVRMLFile(
+            meshes, filepath, keys, add_license.LIST_int_license)
+
+    vrml('synthetic-20x5k', [syntheticMesh(50, 50, color_keys[i % len(color_keys)]) for i in range(20)],
+         color_keys)
+    vrml('synthetic-1x200k', [syntheticMesh(316, 316)], ['black body'])
+    for sample in vrml_samples:
+        if os.path.isfile(samplePath(sample)):
+            vrml(os.path.basename(sample), readVRMLMeshes(samplePath(sample)), ['metal grey pins'])
+
+    colors = list(shaderColors.named_colors.values())
+    cases['toVRMLdefinition[named_colors]'] = lambda: [c.toVRMLdefinition() for c in colors]
+
+    for sample in step_samples:
+        if not os.path.isfile(samplePath(sample)):
+            continue
+        name = os.path.basename(sample)
+        with open(samplePath(sample), 'rb') as f:
+            header, positions, newline = add_license.readStepHeader(f)
+        cases['FNCT_modify_step[%s]' % name] = (lambda header=header, positions=positions, name=name:
+            add_license.FNCT_modify_step(header[:positions["E"]], positions, add_license.LIST_int_license,
+                                         name, add_license.STR_int_licAuthor, add_license.STR_int_licEmail,
+                                         add_license.STR_int_licOrgSys, add_license.STR_int_licPreProc,
+                                         add_license.STR_int_licOrg))
+        copy = os.path.join(work_dir, name)
+        shutil.copy(samplePath(sample), copy)
+        cases['addLicenseToStep[%s]' % name] = (lambda name=name:
+            add_license.addLicenseToStep(work_dir, name, add_license.LIST_int_license,
+                                         add_license.STR_int_licAuthor))
+
+    arguments = ['1', '40', '3-8', '1-40', '2,4,6,8,10,12,14,16,18,20', 'x', '8-3', '1,x,3']
+    cases['getListOfNumbers[pins]'] = lambda: [cq_cad_tools.getListOfNumbers(a) for a in arguments]
+    return cases
+
+def _format(seconds):
+    for unit, scale in (('s', 1.0), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1.0:
+            return '%.3f%s' % (seconds * scale, unit)
+    return '%.1fns' % (seconds * 1e9)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='micro-benchmarks of the writers, license and colors, without FreeCAD')
+    parser.add_argument('-k', '--filter', default=None, help='only the benchmarks whose name contains this')
+    parser.add_argument('--rounds', type=int, default=5, help='timed rounds per benchmark')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds of one round at least')
+    parser.add_argument('--json', default=None, help='save the results to this json file')
+    parser.add_argument('--compare', default=None, help='json file of an earlier run, the medians are compared')
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    # keep the table readable, the writers report every file
+    expVRML.verbose = False
+    add_license.verbose = False
+
+    work_dir = tempfile.mkdtemp(prefix='cq_microbench_')
+    results = OrderedDict()
+    try:
+        cases = benchmarks(work_dir)
+        print('%-44s %12s %12s %12s %12s %8s' % ('benchmark', 'min', 'median', 'mean', 'stddev', 'calls'))
+        for name, function in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            stats = benchmark(function, max(1, args.rounds), args.min_time)
+            results[name] = stats
+            line = '%-44s %12s %12s %12s %12s %8d' % (name, _format(stats['min']), _format(stats['median']),
+                                                    _format(stats['mean']), _format(stats['stddev']), stats['calls'])
+            if name in previous:
+                line += '  %+.1f%%' % (100.0 * (stats['median'] / previous[name]['median'] - 1.0))
+            print(line)
+            sys.stdout.flush()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('results written to %s' % args.json)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* build profiling: time, memory and sizes of every stage of a variant      *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## Wall time, peak RSS, faces, triangles and output bytes of every build
+## stage of every variant (re-exported by cq_cad_tools). Records are kept in
+## profile_records and written by writeProfileReport(), at exit too when
+## CQ_PROFILE names a report file (.csv rows are appended, so the processes
+## of cq_batch/cq_build can share one; any other name is json).
+## cq_batch_worker ends FreeCAD with os._exit, it calls flushProfile() itself.
+##
+##   setProfileVariant(ModelName)
+##   with profileStage('exportSTEP') as stage:
+##       exportSTEP(doc, ModelName, out_dir)
+##       stage.output(out_dir+os.sep+ModelName+'.step')
+##
+## Stages nest: `seconds` includes the nested stages, `self_seconds` does
+## not, so the self_seconds of all the records add up to the profiled time.
+## The exporters of _tools are profiled stages themselves (profiled()).
+## An accumulating stage (e.g. the tessellation of every face) keeps one
+## record per variant, with the number of calls.
+
+__title__ = "build profiling"
+__Comment__ = 'record time, memory, faces, triangles and output bytes of the build stages'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import os, sys
+import csv
+import json
+import time
+import errno
+import atexit
+import functools
+from collections import OrderedDict
+try:
+    from StringIO import StringIO
+except ImportError: # python 3
+    from io import StringIO
+
+try:
+    import resource
+except ImportError: # windows
+    resource = None
+
+profile_fields = ['variant', 'stage', 'calls', 'seconds', 'self_seconds', 'peak_rss_kb',
+                  'faces', 'triangles', 'output_bytes']
+profile_records = []
+profile_variant = None
+
+_running = []       # stages entered and not left yet
+_accumulated = {}   # (variant, stage): record of an accumulating stage
+
+def say(*arg):
+    try:
+        import FreeCAD
+        FreeCAD.Console.PrintMessage(" ".join(map(str,arg)) + "\r\n")
+    except ImportError:
+        print(" ".join(map(str,arg)))
+
+def peakRSS():
+    """ Peak resident memory of the process in kB, None when unknown """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # bytes there
+        rss //= 1024
+    return rss
+
+def setProfileVariant(name):
+    global profile_variant
+    profile_variant = name
+
+def _add(a, b):
+    if b is None:
+        return a
+    return (a or 0) + b
+
+class profileStage(object):
+
+    def __init__(self, name, variant=None, accumulate=False):
+        self.name = name
+        self.variant = variant
+        self.accumulate = accumulate
+        self.faces = None
+        self.triangles = None
+        self.output_bytes = None
+        self.nested_seconds = 0.0
+
+    def shape(self, obj):
+        """ count the faces of a shape, document object or ColoredPart """
+        shape = obj.Shape if hasattr(obj, 'Shape') else getattr(obj, 'shape', obj)
+        self.faces = _add(self.faces, len(shape.Faces))
+
+    def meshes(self, meshes):
+        """ pass the meshes of expVRML through, counting their triangles """
+        for mesh in meshes:
+            for m in getattr(mesh, 'meshes', [mesh]): # MeshInstances
+                self.triangles = _add(self.triangles, len(m.faces))
+            yield mesh
+
+    def output(self, filepath):
+        if os.path.isfile(filepath):
+            self.output_bytes = _add(self.output_bytes, os.path.getsize(filepath))
+
+    def __enter__(self):
+        _running.append(self)
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.time() - self.start
+        if self in _running:
+            _running.remove(self)
+        if _running:
+            _running[-1].nested_seconds += seconds
+        variant = self.variant if self.variant is not None else profile_variant
+        name = self.name + ('' if exc_type is None else ' (failed)')
+        record = _accumulated.get((variant, name)) if self.accumulate else None
+        if record is None:
+            record = OrderedDict((field, None) for field in profile_fields)
+            record.update(variant=variant, stage=name, calls=0, seconds=0.0, self_seconds=0.0)
+            profile_records.append(record)
+            if self.accumulate:
+                _accumulated[(variant, name)] = record
+        record['calls'] += 1
+        record['seconds'] = round(record['seconds'] + seconds, 6)
+        record['self_seconds'] = round(record['self_seconds'] + seconds - self.nested_seconds, 6)
+        record['peak_rss_kb'] = peakRSS()
+        record['faces'] = _add(record['faces'], self.faces)
+        record['triangles'] = _add(record['triangles'], self.triangles)
+        record['output_bytes'] = _add(record['output_bytes'], self.output_bytes)
+        return False
+
+def profiled(name, accumulate=False):
+    """ decorator recording every call of a function as a stage; a call
+    inside a stage of the same name (the caller's own) is part of it """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _running and _running[-1].name == name:
+                return function(*args, **kwargs)
+            with profileStage(name, accumulate=accumulate):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _appendCsv(filepath, records):
+    """ append the rows with a single write, the processes of a batch share
+    the file; only the process creating it writes the header """
+    try:
+        fd = os.open(filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL, 0o666)
+        header = True
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+        fd = os.open(filepath, os.O_WRONLY | os.O_APPEND)
+        header = False
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, profile_fields, lineterminator='\n')
+    if header:
+        writer.writeheader()
+    writer.writerows(records)
+    text = buffer.getvalue()
+    try:
+        os.write(fd, text if isinstance(text, bytes) else text.encode('utf-8'))
+    finally:
+        os.close(fd)
+
+def writeProfileReport(filepath, records=None):
+    """ write the stage records to a .csv (appended) or json file """
+    records = profile_records if records is None else records
+    if filepath.lower().endswith('.csv'):
+        _appendCsv(filepath, records)
+    else:
+        with open(filepath, 'w') as f:
+            json.dump(records, f, indent=2)
+    say('stage profile written to ' + filepath)
+
+def readProfileReport(filepath):
+    """ Return the records of a .csv or json report, numbers converted """
+    if not filepath.lower().endswith('.csv'):
+        with open(filepath) as f:
+            return json.load(f)
+    records = []
+    with open(filepath) as f:
+        # the rows of another process may come before the header
+        for row in csv.DictReader(f, profile_fields):
+            if row['stage'] == 'stage':
+                continue
+            record = OrderedDict()
+            for field in profile_fields:
+                value = row.get(field)
+                if field not in ('variant', 'stage'):
+                    value = float(value) if value not in (None, '') else None
+                record[field] = value
+            records.append(record)
+    return records
+
+def flushProfile():
+    """ write the records to the CQ_PROFILE report, once """
+    if profile_records and os.environ.get('CQ_PROFILE'):
+        writeProfileReport(os.environ['CQ_PROFILE'])
+        del profile_records[:]
+
+if os.environ.get('CQ_PROFILE'):
+    atexit.register(flushProfile)
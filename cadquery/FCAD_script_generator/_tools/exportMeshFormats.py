@@ -0,0 +1,272 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* mesh formats: X3D and glTF/GLB writers for the VRML mesh pipeline        *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#****************************************************************************
+
+## The writers take the same objects as expVRML.writeVRMLFile: Mesh and
+## MeshInstances with named color keys of shaderColors or (r, g, b) colors.
+##
+##   meshes = expVRML.iterColoredMesh(Gui, export_objects, scale)
+##   writeMeshFile(meshes, out_dir+os.sep+ModelName+'.glb', used_color_keys, LIST_license)
+##
+## the format is chosen by the file extension:
+##   .wrl                VRML 2.0 (expVRML.writeVRMLFile)
+##   .wrl.gz .wrz        gzip compressed VRML 2.0
+##   .x3d / .x3dz        X3D XML encoding, plain or gzip compressed
+##   .gltf / .glb        glTF 2.0, buffer embedded as base64 or binary GLB
+
+__title__ = "mesh file formats"
+__Comment__ = 'write the colored meshes of the VRML exporter as gzip VRML, X3D and glTF/GLB'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import json
+import struct
+import base64
+from math import sin, cos, sqrt
+from xml.sax.saxutils import quoteattr
+
+import shaderColors
+import exportPartToVRML as expVRML
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def materialOf(color, transp=0.0):
+    """ shaderColor of a Mesh color: a named color key or (r, g, b) """
+    if not isinstance(color, (tuple, list)) and color in shaderColors.named_colors:
+        return shaderColors.named_colors[color]
+    return shaderColors.shaderColor(diffuseColor=tuple(color[:3]), transparency=transp)
+
+def _floats(values):
+    return ' '.join('%g' % v for v in values)
+
+###################################################################
+# X3D
+###################################################################
+def _x3dMaterial(f, mesh, defined):
+    material = materialOf(mesh.color, mesh.transp)
+    if material.name is not None and material.name in defined:
+        f.write("<Appearance><Material USE=%s/></Appearance>\n" % quoteattr(material.name))
+        return
+    f.write("<Appearance><Material")
+    if material.name is not None:
+        f.write(" DEF=%s" % quoteattr(material.name))
+        defined.add(material.name)
+    f.write(' ambientIntensity="%g" diffuseColor="%s" specularColor="%s" emissiveColor="%s"'
+            ' transparency="%g" shininess="%g"/></Appearance>\n'
+            % (material.ambientIntensity, _floats(material.diffuseColor), _floats(material.specularColor),
+               _floats(material.emissiveColor), material.transparency, material.shininess))
+
+def _x3dShape(f, mesh, defined, creaseAngle):
+    flat_points, flat_faces = expVRML._flatten(mesh)
+    f.write("<Shape>\n")
+    _x3dMaterial(f, mesh, defined)
+    # commas are white space within X3D attributes, the VRML formatting fits as is
+    f.write('<IndexedFaceSet creaseAngle="%.2f" coordIndex="' % creaseAngle)
+    f.write(expVRML.formatCoordIndex(flat_faces))
+    f.write('">\n<Coordinate point="')
+    f.write(expVRML.formatPoints(flat_points))
+    f.write('"/>\n</IndexedFaceSet>\n</Shape>\n')
+
+def writeX3DFile(objects, filepath, licence_info=None, creaseAngle=expVRML.creaseAngle_default):
+    """ Write Mesh / MeshInstances objects to an X3D file (.x3d, or .x3dz gzip) """
+    defined = set()
+    with expVRML.openMeshFile(filepath) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<!DOCTYPE X3D PUBLIC "ISO//Web3D//DTD X3D 3.0//EN" "http://www.web3d.org/specifications/x3d-3.0.dtd">\n')
+        f.write('<X3D version="3.0" profile="Immersive">\n<head>\n')
+        f.write('<meta name="generator" content="kicad StepUp"/>\n')
+        for line in licence_info or []:
+            f.write('<meta name="license" content=%s/>\n' % quoteattr(line))
+        f.write('</head>\n<Scene>\n')
+        for obj in objects:
+            if isinstance(obj, expVRML.MeshInstances):
+                for i, (translation, axis, angle) in enumerate(obj.placements):
+                    f.write('<Transform translation="%.3f %.3f %.3f" rotation="%f %f %f %f">\n'
+                            % (tuple(translation) + tuple(axis) + (angle,)))
+                    if i == 0:
+                        f.write('<Group DEF=%s>\n' % quoteattr(obj.name))
+                        for mesh in obj.meshes:
+                            _x3dShape(f, mesh, defined, creaseAngle)
+                        f.write('</Group>\n')
+                    else:
+                        f.write('<Group USE=%s/>\n' % quoteattr(obj.name))
+                    f.write('</Transform>\n')
+            else:
+                _x3dShape(f, obj, defined, creaseAngle)
+        f.write('</Scene>\n</X3D>\n')
+    expVRML.say(filepath+' written')
+
+###################################################################
+# glTF 2.0
+###################################################################
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_INT = 5125
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+
+def _pack(fmt, values):
+    """ little endian binary of a flat list of numbers, fmt 'f' or 'I' """
+    if np is not None:
+        return np.asarray(values, dtype='<f4' if fmt == 'f' else '<u4').tobytes()
+    return struct.pack('<%d%s' % (len(values), fmt), *values)
+
+def _quaternion(axis, angle):
+    x, y, z = axis
+    n = sqrt(x*x + y*y + z*z) or 1.0
+    s = sin(angle/2.0)/n
+    return [x*s, y*s, z*s, cos(angle/2.0)]
+
+class _GLTFBuilder(object):
+    """ collects the json document and the binary buffer of a glTF file """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.doc = {'asset': {'version': '2.0', 'generator': 'kicad StepUp'},
+                    'scene': 0, 'scenes': [{'nodes': [0]}],
+                    'nodes': [], 'meshes': [], 'materials': [],
+                    'accessors': [], 'bufferViews': []}
+        self.materials = {}
+
+    def _view(self, data, target):
+        offset = len(self.buffer)
+        self.buffer += data
+        self.buffer += b'\0' * (-len(self.buffer) % 4)
+        self.doc['bufferViews'].append({'buffer': 0, 'byteOffset': offset,
+                                        'byteLength': len(data), 'target': target})
+        return len(self.doc['bufferViews']) - 1
+
+    def material(self, color, transp):
+        key = (color if not isinstance(color, list) else tuple(color), transp)
+        if key not in self.materials:
+            m = materialOf(color, transp)
+            alpha = 1.0 - (m.transparency or transp)
+            entry = {'pbrMetallicRoughness': {
+                         'baseColorFactor': [float(c) for c in m.diffuseColor] + [alpha],
+                         'metallicFactor': 0.0,
+                         'roughnessFactor': 1.0 - min(1.0, float(m.shininess))},
+                     'doubleSided': True}
+            if m.name is not None:
+                entry['name'] = m.name
+            if alpha < 1.0:
+                entry['alphaMode'] = 'BLEND'
+            self.doc['materials'].append(entry)
+            self.materials[key] = len(self.doc['materials']) - 1
+        return self.materials[key]
+
+    def primitive(self, mesh):
+        """ glTF primitive of a Mesh, None for an empty one """
+        flat_points, flat_faces = expVRML._flatten(mesh)
+        if not flat_faces:
+            return None
+        accessors = self.doc['accessors']
+        xs, ys, zs = flat_points[0::3], flat_points[1::3], flat_points[2::3]
+        accessors.append({'bufferView': self._view(_pack('f', flat_points), GLTF_ARRAY_BUFFER),
+                          'componentType': GLTF_FLOAT, 'count': len(flat_points) // 3, 'type': 'VEC3',
+                          'min': [min(xs), min(ys), min(zs)], 'max': [max(xs), max(ys), max(zs)]})
+        position = len(accessors) - 1
+        accessors.append({'bufferView': self._view(_pack('I', flat_faces), GLTF_ELEMENT_ARRAY_BUFFER),
+                          'componentType': GLTF_UNSIGNED_INT, 'count': len(flat_faces), 'type': 'SCALAR'})
+        return {'attributes': {'POSITION': position}, 'indices': len(accessors) - 1,
+                'material': self.material(mesh.color, mesh.transp)}
+
+    def mesh(self, meshes, name=None):
+        primitives = [p for p in (self.primitive(m) for m in meshes) if p is not None]
+        if not primitives:
+            return None
+        entry = {'primitives': primitives}
+        if name is not None:
+            entry['name'] = name
+        self.doc['meshes'].append(entry)
+        return len(self.doc['meshes']) - 1
+
+def buildGLTF(objects, licence_info=None, unit_scale=None):
+    """ Return (json document, binary buffer) of the objects.
+
+    The models are z-up, the root node turns them to the y-up of glTF;
+    `unit_scale` scales the model units to meters (0.001 for mm). """
+    builder = _GLTFBuilder()
+    nodes = builder.doc['nodes']
+    root = {'name': 'model', 'children': [], 'rotation': [-sqrt(0.5), 0.0, 0.0, sqrt(0.5)]}
+    if unit_scale is not None:
+        root['scale'] = [unit_scale] * 3
+    nodes.append(root)
+    if licence_info:
+        builder.doc['asset']['copyright'] = ' '.join(l for l in licence_info if l)
+    for obj in objects:
+        if isinstance(obj, expVRML.MeshInstances):
+            mesh = builder.mesh(obj.meshes, obj.name)
+            if mesh is None:
+                continue
+            for translation, axis, angle in obj.placements:
+                nodes.append({'mesh': mesh, 'translation': [float(t) for t in translation],
+                              'rotation': _quaternion(axis, angle)})
+                root['children'].append(len(nodes) - 1)
+        else:
+            mesh = builder.mesh([obj])
+            if mesh is None:
+                continue
+            nodes.append({'mesh': mesh})
+            root['children'].append(len(nodes) - 1)
+    builder.doc['buffers'] = [{'byteLength': len(builder.buffer)}]
+    # glTF does not allow empty arrays
+    if not root['children']:
+        del root['children']
+    for key in ('meshes', 'materials', 'accessors', 'bufferViews', 'buffers'):
+        if not builder.doc[key] or key == 'buffers' and not builder.buffer:
+            del builder.doc[key]
+    return builder.doc, bytes(builder.buffer)
+
+def writeGLTFFile(objects, filepath, licence_info=None, unit_scale=None):
+    """ Write Mesh / MeshInstances objects to glTF 2.0: binary .glb, or
+    .gltf json with the buffer embedded as base64 """
+    doc, data = buildGLTF(objects, licence_info, unit_scale)
+    if filepath.lower().endswith('.glb'):
+        json_chunk = json.dumps(doc, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        json_chunk += b' ' * (-len(json_chunk) % 4)
+        bin_chunk = data + b'\0' * (-len(data) % 4)
+        length = 12 + 8 + len(json_chunk) + (8 + len(bin_chunk) if data else 0)
+        with open(filepath, 'wb') as f:
+            f.write(struct.pack('<4sII', b'glTF', 2, length))
+            f.write(struct.pack('<I4s', len(json_chunk), b'JSON'))
+            f.write(json_chunk)
+            if data:
+                f.write(struct.pack('<I4s', len(bin_chunk), b'BIN\0'))
+                f.write(bin_chunk)
+    else:
+        if data:
+            doc['buffers'][0]['uri'] = 'data:application/octet-stream;base64,' + \
+                base64.b64encode(data).decode('ascii')
+        with open(filepath, 'w') as f:
+            json.dump(doc, f, separators=(',', ':'), sort_keys=True)
+    expVRML.say(filepath+' written')
+
+###################################################################
+# all formats
+###################################################################
+def writeMeshFile(objects, filepath, used_color_keys, licence_info=None,
+                  creaseAngle=expVRML.creaseAngle_default, unit_scale=None):
+    """ Write the objects in the format given by the extension of filepath
+    (.wrl .wrl.gz .wrz .x3d .x3dz .gltf .glb) """
+    name = filepath.lower()
+    if name.endswith(('.gltf', '.glb')):
+        writeGLTFFile(objects, filepath, licence_info, unit_scale)
+    elif name.endswith(('.x3d', '.x3dz', '.x3d.gz')):
+        writeX3DFile(objects, filepath, licence_info, creaseAngle)
+    elif name.endswith(('.wrl', '.wrz', '.wrl.gz')):
+        expVRML.writeVRMLFile(objects, filepath, used_color_keys, licence_info, creaseAngle)
+    else:
+        raise ValueError('unknown mesh format: ' + filepath)
+    return filepath
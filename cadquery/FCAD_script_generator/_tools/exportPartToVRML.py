@@ -51,24 +51,55 @@ __Requires__ = "Freecad"
 ## to do
 #  export material properties to vrml
 
-import FreeCAD,FreeCADGui,Part,Mesh
-#import PySide
-from PySide import QtGui, QtCore
+try:
+    import FreeCAD,Part,Mesh
+except ImportError: # the VRML writer is plain text, it also runs without FreeCAD (cq_microbench.py)
+    FreeCAD = None
+if FreeCAD is not None and FreeCAD.GuiUp:
+    import FreeCADGui
+    #import PySide
+    from PySide import QtGui, QtCore
 from collections import namedtuple
 import sys, os
 from os.path import expanduser
 import re
 import shaderColors
+try:
+    from cq_profile import profiled
+except ImportError: # profiling is optional
+    profiled = lambda name, accumulate=False: (lambda function: function)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    basestring
+except NameError: # python 3
+    basestring = str
+
+verbose = True # messages of say() outside of FreeCAD
 
 def say(msg):
+    if FreeCAD is None:
+        if verbose:
+            print(msg)
+        return
     FreeCAD.Console.PrintMessage(msg)
     FreeCAD.Console.PrintMessage('\n')
 
 def sayw(msg):
+    if FreeCAD is None:
+        if verbose:
+            print(msg)
+        return
     FreeCAD.Console.PrintWarning(msg)
     FreeCAD.Console.PrintWarning('\n')
     
 def sayerr(msg):
+    if FreeCAD is None:
+        if verbose:
+            print(msg)
+        return
     FreeCAD.Console.PrintError(msg)
     FreeCAD.Console.PrintWarning('\n')
 
@@ -81,7 +112,8 @@ def clear_console():
     r.clear()
 
 #if not Mod_ENABLED:
-clear_console()
+if FreeCAD is not None and FreeCAD.GuiUp:
+    clear_console()
 
 creaseAngle_default=0.5
 
@@ -158,10 +190,70 @@ def infoDialog(msg):
 Mesh = namedtuple('Mesh', ['points', 'faces', 'color', 'transp'])
 #object name: I get an error for freecad_object.Transparency so i use App.getObject('name')
 exportObject = namedtuple('exportObject', ['freecad_object', 'shape_color', 'face_colors'])
-
-def shapeToMesh(shape, color, transp, scale=None):
-    mesh_deviation=0.03 #the smaller the best quality, 1 coarse; 0.03 good compromise :)
-    mesh_data = shape.tessellate(mesh_deviation)
+# meshes: [Mesh, ...] of a template part (pin, ball), tessellated once
+# placements: [((tx, ty, tz), (ax, ay, az), angle), ...], angle in radians, the
+#             template is rotated around the axis through its origin, then translated
+# name: DEF name of the template within the VRML file
+MeshInstances = namedtuple('MeshInstances', ['meshes', 'placements', 'name'])
+
+# deviation: maximal linear deviation of the triangles from the surface, in mm
+# relative: deviation taken relative to the size of the edges and faces (OCC Relative mode)
+# angular: maximal angle between the normals of adjacent triangles, radians;
+#          None tessellates with the linear deviation only
+TessellationProfile = namedtuple('TessellationProfile', ['deviation', 'relative', 'angular'])
+tessellation_profiles = {
+    'draft':    TessellationProfile(deviation=0.1,  relative=False, angular=0.8),
+    'standard': TessellationProfile(deviation=0.03, relative=False, angular=None),
+    'high':     TessellationProfile(deviation=0.01, relative=False, angular=0.25),
+}
+# profile used when none is given; None keeps the historic 0.03 tessellation of
+# every face. A family generator can choose its own, e.g. expVRML.tessellation_profile='draft'
+tessellation_profile = None
+planar_deviation = 1.0 # any value gives the same triangles for a polygon
+
+try:
+    import MeshPart
+except ImportError:
+    MeshPart = None
+
+def getTessellationProfile(profile):
+    """ TessellationProfile of a profile name, None for the historic tessellation """
+    if profile is None or isinstance(profile, TessellationProfile):
+        return profile
+    return tessellation_profiles[profile]
+
+def isPolygonFace(face):
+    """ True for a planar face bounded by straight edges only, its triangles
+    do not depend on the deviation """
+    try:
+        if type(face.Surface).__name__ != 'Plane':
+            return False
+        return all(type(e.Curve).__name__ in ('Line', 'LineSegment') for e in face.Edges)
+    except Exception:
+        return False
+
+def tessellateFace(shape, profile):
+    """ (points, faces) of a face tessellated with a TessellationProfile """
+    if isPolygonFace(shape):
+        return shape.tessellate(planar_deviation)
+    if MeshPart is not None and (profile.angular is not None or profile.relative):
+        try:
+            mesh = MeshPart.meshFromShape(Shape=shape, LinearDeflection=profile.deviation,
+                                          AngularDeflection=profile.angular or 0.5,
+                                          Relative=bool(profile.relative))
+            return mesh.Topology
+        except TypeError:
+            pass # FreeCAD older than 0.17, linear deviation only
+    return shape.tessellate(profile.deviation)
+
+@profiled('shapeToMesh', accumulate=True)
+def shapeToMesh(shape, color, transp, scale=None, profile=None):
+    profile = getTessellationProfile(profile if profile is not None else tessellation_profile)
+    if profile is None:
+        mesh_deviation=0.03 #the smaller the best quality, 1 coarse; 0.03 good compromise :)
+        mesh_data = shape.tessellate(mesh_deviation)
+    else:
+        mesh_data = tessellateFace(shape, profile)
     points = mesh_data[0]
     if scale != None:
         points = map(lambda p: p*scale, points)
@@ -170,10 +262,187 @@ def shapeToMesh(shape, color, transp, scale=None):
                 color = color, transp=transp)
     return newMesh
 
+def meshToArrays(mesh):
+    """Return the tessellation of a Mesh as contiguous arrays:
+    points (N x 3 float) and faces (M x 3 int).
+
+    The Mesh may already hold arrays, then they are returned as they are."""
+    points, faces = mesh.points, mesh.faces
+    if not (isinstance(points, np.ndarray) and points.ndim == 2):
+        points = np.array([(p.x, p.y, p.z) for p in points], dtype=float).reshape(-1, 3)
+    if not (isinstance(faces, np.ndarray) and faces.ndim == 2):
+        faces = np.array(faces, dtype=np.int64).reshape(-1, 3)
+    return np.ascontiguousarray(points), np.ascontiguousarray(faces)
+
+def _flatten(mesh):
+    """flat lists of the coordinates and of the face indexes of a Mesh.
+
+    Array meshes are flattened by numpy, a list of Vectors is read once
+    without building an intermediate array."""
+    points, faces = mesh.points, mesh.faces
+    if np is not None and isinstance(points, np.ndarray):
+        flat_points = np.ascontiguousarray(points, dtype=float).ravel().tolist()
+    else:
+        flat_points = [c for p in points for c in (p.x, p.y, p.z)]
+    if np is not None and isinstance(faces, np.ndarray):
+        flat_faces = np.ascontiguousarray(faces).ravel().tolist()
+    else:
+        flat_faces = [i for f in faces for i in f]
+    return flat_points, flat_faces
+
+def formatCoordIndex(flat_faces):
+    """'a,b,c,-1,...' for a flat list of triangle indexes.
+
+    A single format operation over the whole block, the text is the same as
+    ','.join("%d,%d,%d,-1" % f for f in faces) without the per face call."""
+    n = len(flat_faces) // 3
+    if n == 0:
+        return ''
+    return (("%d,%d,%d,-1," * n) % tuple(flat_faces))[:-1]
+
+def formatPoints(flat_points):
+    """'x y z,...' with 3 decimals for a flat list of coordinates,
+    same text as ','.join('%.3f %.3f %.3f' % (p.x, p.y, p.z) for p in points)"""
+    n = len(flat_points) // 3
+    if n == 0:
+        return ''
+    return (('%.3f %.3f %.3f,' * n) % tuple(flat_points))[:-1]
+
+weld_tolerance_default=0.001 # same as the 3 decimals written to the VRML file
+
+def _weldArrays(points, faces, tolerance):
+    """numpy version of the vertex welding in mergeMeshes"""
+    keys = np.round(points / tolerance).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    # keep the vertices in the order they first appear
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    faces = rank[inverse.ravel()][faces]
+    return points[first[order]], faces
+
+def _weldLists(points, faces, tolerance):
+    """pure python version of the vertex welding in mergeMeshes"""
+    index = {}
+    welded = []
+    remap = []
+    for p in points:
+        key = (int(round(p.x / tolerance)), int(round(p.y / tolerance)), int(round(p.z / tolerance)))
+        i = index.get(key)
+        if i is None:
+            i = index[key] = len(welded)
+            welded.append(p)
+        remap.append(i)
+    return welded, [(remap[a], remap[b], remap[c]) for a, b, c in faces]
+
+def mergeMeshes(meshes, weld=True, tolerance=weld_tolerance_default):
+    """Merge the meshes sharing color and transparency into one Mesh per material.
+
+    One B-rep face gives one Mesh, so a model writes one VRML Shape node per
+    face. After merging every material is a single IndexedFaceSet; with
+    `weld` the vertices closer than `tolerance` are shared between the
+    faces and the triangles collapsed by welding are dropped.
+    The order of the materials is the order they first appear in."""
+    groups = []
+    by_material = {}
+    for mesh in meshes:
+        material = (mesh.color, mesh.transp)
+        if material not in by_material:
+            by_material[material] = len(groups)
+            groups.append([])
+        groups[by_material[material]].append(mesh)
+
+    merged = []
+    for group in groups:
+        color, transp = group[0].color, group[0].transp
+        if np is not None:
+            arrays = [meshToArrays(m) for m in group]
+            offsets = np.cumsum([0] + [len(p) for p, f in arrays[:-1]])
+            points = np.vstack([p for p, f in arrays])
+            faces = np.vstack([f + o for (p, f), o in zip(arrays, offsets)])
+            if weld and len(points):
+                points, faces = _weldArrays(points, faces, tolerance)
+                faces = faces[(faces[:,0] != faces[:,1]) & (faces[:,1] != faces[:,2]) &
+                              (faces[:,0] != faces[:,2])]
+        else:
+            points = []
+            faces = []
+            for m in group:
+                offset = len(points)
+                mesh_points = list(m.points)
+                points.extend(mesh_points)
+                faces.extend((a+offset, b+offset, c+offset) for a, b, c in m.faces)
+            if weld:
+                points, faces = _weldLists(points, faces, tolerance)
+                faces = [f for f in faces if f[0] != f[1] and f[1] != f[2] and f[0] != f[2]]
+        merged.append(Mesh(points=points, faces=faces, color=color, transp=transp))
+    return merged
+
+gzip_extensions = ('.gz', '.wrz', '.x3dz')
+
+def openMeshFile(filepath):
+    """ Open a text mesh file for writing, gzip compressed for the
+    extensions in gzip_extensions (e.g. model.wrl.gz, model.wrz) """
+    if not filepath.lower().endswith(gzip_extensions):
+        return open(filepath, 'w')
+    import gzip
+    # no time stamp in the header, same model gives the same file
+    gz = gzip.GzipFile(filepath, 'wb', mtime=0)
+    if sys.version_info[0] >= 3:
+        import io
+        return io.TextIOWrapper(gz, encoding='utf-8')
+    return gz
+
+def _writeShape(f, obj, used_colors, creaseAngle):
+    """write one Mesh as a VRML Shape node"""
+    if creaseAngle==0:
+        f.write("Shape { geometry IndexedFaceSet \n{ coordIndex [")
+    else:
+        f.write("Shape { geometry IndexedFaceSet \n{ creaseAngle %.2f coordIndex [" % creaseAngle)
+    #f.write("Shape { geometry IndexedFaceSet \n{ coordIndex [")
+    flat_points, flat_faces = _flatten(obj)
+    # write coordinate indexes for each face
+    f.write(formatCoordIndex(flat_faces))
+    f.write("]\n") # closes coordIndex
+    f.write("coord Coordinate { point [")
+    # write coordinate points for each vertex
+    #f.write(','.join('%.3f %.3f %.3f' % (p.x, p.y, p.z) for p in obj.points))
+    f.write(formatPoints(flat_points))
+    f.write("]\n}") # closes Coordinate
+    #shape_col=(1.0, 0.0, 0.0)#, 0.0)
+    f.write("}\n") # closes points
+
+    #say(color_list_mat[col_index])
+    if not isinstance(obj.color,basestring) or isinstance(used_colors, basestring):
+        shape_transparency=obj.transp
+        f.write("appearance Appearance{material Material{diffuseColor %f %f %f\n" % obj.color)
+        f.write("transparency %f}}" % shape_transparency)
+    else:
+        #say(obj.color)
+        f.write(used_colors[obj.color].toVRMLuseColor())
+    f.write("}\n") # closes shape
+
+def _writeInstances(f, obj, used_colors, creaseAngle):
+    """write the template of MeshInstances once (DEF) and USE it at every placement"""
+    for i, (translation, axis, angle) in enumerate(obj.placements):
+        f.write("Transform { translation %.3f %.3f %.3f rotation %f %f %f %f children [\n"
+                % (tuple(translation) + tuple(axis) + (angle,)))
+        if i == 0:
+            f.write("DEF %s Group { children [\n" % obj.name)
+            for mesh in obj.meshes:
+                _writeShape(f, mesh, used_colors, creaseAngle)
+            f.write("]}\n") # closes Group
+        else:
+            f.write("USE %s\n" % obj.name)
+        f.write("]}\n") # closes Transform
+
+@profiled('writeVRMLFile')
 def writeVRMLFile(objects, filepath, used_color_keys, licence_info=None, creaseAngle=creaseAngle_default):
     """Export given list of Mesh objects to a VRML file.
 
-    `Mesh` structure is defined at root."""
+    `Mesh` structure is defined at root. MeshInstances are written as one
+    DEF template and a USE per placement. `objects` may be a generator
+    (see iterColoredMesh), every Mesh is written as soon as it is produced."""
     used_colors = None
     
     #creaseAngle=creaseAngle_default #creaseAngle=0.5 good compromise
@@ -182,7 +451,7 @@ def writeVRMLFile(objects, filepath, used_color_keys, licence_info=None, creaseA
         used_colors = { x: shaderColors.named_colors[x] for x in used_color_keys }
     say(used_color_keys)
     say(used_colors.values())
-    with open(filepath, 'w') as f:
+    with openMeshFile(filepath) as f:
         # write the standard VRML header
         f.write("#VRML V2.0 utf8\n#kicad StepUp wrl exported\n\n")
         if licence_info is not None:
@@ -192,31 +461,10 @@ def writeVRMLFile(objects, filepath, used_color_keys, licence_info=None, creaseA
             f.write(shader_color.toVRMLdefinition())
 
         for obj in objects:
-            if creaseAngle==0:
-                f.write("Shape { geometry IndexedFaceSet \n{ coordIndex [")
-            else:
-                f.write("Shape { geometry IndexedFaceSet \n{ creaseAngle %.2f coordIndex [" % creaseAngle)
-            #f.write("Shape { geometry IndexedFaceSet \n{ coordIndex [")
-            # write coordinate indexes for each face
-            f.write(','.join("%d,%d,%d,-1" % f for f in obj.faces))
-            f.write("]\n") # closes coordIndex
-            f.write("coord Coordinate { point [")
-            # write coordinate points for each vertex
-            #f.write(','.join('%.3f %.3f %.3f' % (p.x, p.y, p.z) for p in obj.points))
-            f.write(','.join('%.3f %.3f %.3f' % (p.x, p.y, p.z) for p in obj.points))
-            f.write("]\n}") # closes Coordinate
-            #shape_col=(1.0, 0.0, 0.0)#, 0.0)
-            f.write("}\n") # closes points
-
-            #say(color_list_mat[col_index])
-            if not isinstance(obj.color,basestring) or isinstance(used_colors, basestring):
-                shape_transparency=obj.transp
-                f.write("appearance Appearance{material Material{diffuseColor %f %f %f\n" % obj.color)
-                f.write("transparency %f}}" % shape_transparency)
+            if isinstance(obj, MeshInstances):
+                _writeInstances(f, obj, used_colors, creaseAngle)
             else:
-                #say(obj.color)
-                f.write(used_colors[obj.color].toVRMLuseColor())
-            f.write("}\n") # closes shape
+                _writeShape(f, obj, used_colors, creaseAngle)
         say(filepath+' written')
 ###
 def comboBox_Changed(text_combo):
@@ -231,15 +479,9 @@ def comboBox_Changed(text_combo):
         ui.plainTextEdit_2.viewport().setPalette(pal)
 
 ###
-def getColoredMesh(Gui, export_objects , scale=None):
-    """ Exports given ComponentModel object using FreeCAD.
-
-    `componentObjs` : a ComponentObjs list
-    `fullfilePathName` : name of the FC file, extension is important
-
-    """
-    meshes=[]
-    applyDiffuse=0
+def _coloredFaces(Gui, export_objects):
+    """ (face, color, transparency) of every face of the export objects,
+    nothing is tessellated here """
     for exp_obj in export_objects:
         gui_obj = Gui.ActiveDocument.getObject(exp_obj.freecad_object.Name)
         color=exp_obj.shape_color
@@ -258,25 +500,165 @@ def getColoredMesh(Gui, export_objects , scale=None):
         for face_index in range(len(shape1.Faces)):
             singleFace=shape1.Faces[face_index]
             if applyDiffuse:
-                meshes.append(shapeToMesh(singleFace, exp_obj.face_colors[face_index], transparency, scale))
+                yield singleFace, exp_obj.face_colors[face_index], transparency
             else:
-                meshes.append(shapeToMesh(singleFace, color, transparency, scale))
+                yield singleFace, color, transparency
+
+def _partFaces(parts):
+    """ (face, color, transparency) of every face of colored parts """
+    for part in parts:
+        faces=part.shape.Faces
+        if part.face_colors is None or len(part.face_colors) != len(faces):
+            face_colors=[part.color]*len(faces)
+        else:
+            face_colors=part.face_colors
+        for face_index in range(len(faces)):
+            yield faces[face_index], face_colors[face_index], 0.0
+
+def iterMeshes(colored_faces, scale=None, merge=False, profile=None):
+    """ Tessellate (face, color, transparency) items one at a time.
+
+    Yields one Mesh per face, or with `merge` one welded Mesh per material:
+    the faces are grouped by material first and only the group being
+    yielded is tessellated, so at most one group is held in memory. """
+    if not merge:
+        for face, color, transp in colored_faces:
+            yield shapeToMesh(face, color, transp, scale, profile)
+        return
+    groups = []
+    by_material = {}
+    for face, color, transp in colored_faces:
+        material = (color, transp)
+        if material not in by_material:
+            by_material[material] = len(groups)
+            groups.append([])
+        groups[by_material[material]].append(face)
+    for (color, transp), faces in zip(sorted(by_material, key=by_material.get), groups):
+        for mesh in mergeMeshes([shapeToMesh(face, color, transp, scale, profile) for face in faces]):
+            yield mesh
+
+def iterColoredMesh(Gui, export_objects , scale=None, merge=False, profile=None, skip_colors=()):
+    """ Same as getColoredMesh, but a generator: every Mesh is tessellated
+    when writeVRMLFile asks for it and released once written.
+
+    The faces of the colors in `skip_colors` are neither tessellated nor
+    yielded, e.g. pins exported apart with getInstancedMesh. """
+    colored_faces = _coloredFaces(Gui, export_objects)
+    if skip_colors:
+        colored_faces = (item for item in colored_faces if item[1] not in skip_colors)
+    return iterMeshes(colored_faces, scale, merge, profile)
+
+def getColoredMesh(Gui, export_objects , scale=None, merge=False, profile=None):
+    """ Exports given ComponentModel object using FreeCAD.
+
+    `componentObjs` : a ComponentObjs list
+    `fullfilePathName` : name of the FC file, extension is important
+    `merge` : one welded mesh per material instead of one mesh per face
+    (see mergeMeshes)
+    `profile` : tessellation profile name ('draft', 'standard', 'high')
+    or TessellationProfile, default tessellation_profile
+
+    """
+    return list(iterColoredMesh(Gui, export_objects, scale, merge, profile))
+###
+def iterColoredMeshFromParts(parts, scale=None, merge=False, profile=None):
+    """ Generator version of getColoredMeshFromParts """
+    return iterMeshes(_partFaces(parts), scale, merge, profile)
+
+def getColoredMeshFromParts(parts, scale=None, merge=False, profile=None):
+    """ Same as getColoredMesh but without FreeCADGui.
+
+    `parts` : objects with shape, color and face_colors attributes
+    (see cq_headless.ColoredPart), the colors are named color keys or (r, g, b)
+
+    """
+    return list(iterColoredMeshFromParts(parts, scale, merge, profile))
+###
+def getInstancedMesh(shape, placements, color, transp=0.0, scale=None, name='PIN-INSTANCE', face_colors=None,
+                     profile=None):
+    """ Tessellate a template part once for all its copies.
+
+    `shape` : Part.Shape of one pin or ball in its own coordinates
+    `placements` : where the copies are (see MeshInstances)
+    `color`, `face_colors` : like the shape_color and face_colors of exportObject
+
+    The template is merged per material; the translations are scaled like the points. """
+    faces=shape.Faces
+    if face_colors is None or len(face_colors) != len(faces):
+        face_colors=[color]*len(faces)
+    meshes=mergeMeshes([shapeToMesh(faces[i], face_colors[i], transp, scale, profile) for i in range(len(faces))])
+    if scale is not None:
+        placements=[(tuple(c*scale for c in t), axis, angle) for t, axis, angle in placements]
+    return MeshInstances(meshes=meshes, placements=list(placements), name=name)
+
+def _rotationMatrix(axis, angle):
+    """3x3 rotation matrix (rows) around a unit axis, angle in radians"""
+    from math import cos, sin, sqrt
+    x, y, z = axis
+    n = sqrt(x*x + y*y + z*z) or 1.0
+    x, y, z = x/n, y/n, z/n
+    c, s, t = cos(angle), sin(angle), 1-cos(angle)
+    return [[t*x*x+c,   t*x*y-s*z, t*x*z+s*y],
+            [t*x*y+s*z, t*y*y+c,   t*y*z-s*x],
+            [t*x*z-s*y, t*y*z+s*x, t*z*z+c]]
+
+def expandInstances(objects):
+    """ Replace every MeshInstances in `objects` by plain Meshes, one per copy,
+    for writers and viewers without DEF/USE """
+    meshes=[]
+    for obj in objects:
+        if not isinstance(obj, MeshInstances):
+            meshes.append(obj)
+            continue
+        for translation, axis, angle in obj.placements:
+            r = _rotationMatrix(axis, angle)
+            for mesh in obj.meshes:
+                if np is not None:
+                    points, faces = meshToArrays(mesh)
+                    points = points.dot(np.array(r).T) + np.array(translation, dtype=float)
+                else:
+                    faces = mesh.faces
+                    points = [FreeCAD.Vector(r[0][0]*p.x+r[0][1]*p.y+r[0][2]*p.z+translation[0],
+                                             r[1][0]*p.x+r[1][1]*p.y+r[1][2]*p.z+translation[1],
+                                             r[2][0]*p.x+r[2][1]*p.y+r[2][2]*p.z+translation[2])
+                              for p in mesh.points]
+                meshes.append(Mesh(points=points, faces=faces, color=mesh.color, transp=mesh.transp))
     return meshes
+
 ###
 def getNamedColors(color_list):
      used_colors = list(set(color_list))
      return [x for x in used_colors if isinstance(x, basestring)]
 
-def determineColors(Gui, objects, know_material_substitutions=None):
+# unknown colors are asked for in a dialog by determineColors, when the GUI is up
+ask_unknown_colors = True
+
+def _askMaterial(Dialog, color):
+    say(color)
+    pal = QtGui.QPalette()
+    bgc = QtGui.QColor(color[0]*255, color[1]*255, color[2]*255)
+    pal.setColor(QtGui.QPalette.Base, bgc)
+    ui.plainTextEdit.viewport().setPalette(pal)
+    reply=Dialog.exec_()
+    if reply==1:
+        retval = str(ui.comboBox.currentText())
+        if retval != "as is":
+            return retval
+    return color
+
+def determineColors(Gui, objects, know_material_substitutions=None, interactive=None):
+    """ Resolve the face colors of the objects to materials.
+
+    Every color is looked up once, exactly, in know_material_substitutions
+    (the generators key it by the DiffuseColor of the view providers).
+    A color not found is asked for in a dialog when `interactive`
+    (default: ask_unknown_colors with the GUI up), else exported as is. """
     global ui
     if know_material_substitutions is None:
         know_material_substitutions={}
-    Dialog = QtGui.QDialog()
-    ui = Ui_Dialog()
-    ui.setupUi(Dialog)
-    ui.comboBox.addItems(["as is"]+shaderColors.named_colors.keys())
-    material="as is"
-
+    if interactive is None:
+        interactive = ask_unknown_colors and FreeCAD.GuiUp
+    Dialog = None
 
     objs = []
     for obj in objects:
@@ -284,30 +666,19 @@ def determineColors(Gui, objects, know_material_substitutions=None):
         face_colors = []
         for color in freecad_object.DiffuseColor:
             color = color[:-1]
-            if color not in know_material_substitutions:
-                say(color)
-                pal = QtGui.QPalette()
-                bgc = QtGui.QColor(color[0]*255, color[1]*255, color[2]*255)
-                pal.setColor(QtGui.QPalette.Base, bgc)
-                ui.plainTextEdit.viewport().setPalette(pal)
-                #ui.comboBox.addItems(color_list)
-                reply=Dialog.exec_()
-                #Dialog.exec_()
-                #say(reply)
-                if reply==1:
-                    retval = str(ui.comboBox.currentText())
-                    if retval == "as is":
-                        material = color
-                    else:
-                        material = retval
+            material = know_material_substitutions.get(color)
+            if material is None:
+                if interactive:
+                    if Dialog is None:
+                        Dialog = QtGui.QDialog()
+                        ui = Ui_Dialog()
+                        ui.setupUi(Dialog)
+                        ui.comboBox.addItems(["as is"]+list(shaderColors.named_colors.keys()))
+                    material = _askMaterial(Dialog, color)
                 else:
-                    #material="as is"
-                    material=color
-                know_material_substitutions.update({color:material})
-                #say(material)
-                face_colors.append(material)
-            else:
-                face_colors.append(know_material_substitutions[color])
+                    material = color
+                know_material_substitutions[color] = material
+            face_colors.append(material)
         objs.append(exportObject(freecad_object = obj,
                 shape_color=face_colors[0],
                 face_colors=face_colors))
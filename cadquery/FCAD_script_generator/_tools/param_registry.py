@@ -0,0 +1,282 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* parameter registry: builds only the Params of the requested variants     *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## The cq_parameters files build every Params of a family when imported,
+## thousands of namedtuples for a single model. loadModule() reads such a
+## file once, stores every entry of its top level dict literals
+##   kicad_naming_params_qfn = { 'QFN-16...': Params(...), ... }
+## as compiled code in an sqlite index and returns a stand-in of the module:
+## the other top level names (Params, destination_dir ...) are there as
+## usual, the dicts are LazyParams building an entry when it is looked up.
+##
+##   import param_registry
+##   cq_parameters = param_registry.loadModule('cq_parameters')
+##   all_params = cq_parameters.kicad_naming_params_qfn.copy()
+##   all_params.update(cq_parameters_diode.kicad_naming_params_diode)
+##   params = all_params[variant]   # only this Params is built
+##
+## The index (param_index.sqlite) lives in the model cache folder (cq_cache)
+## and is rebuilt when the parameter file changes; without a cache folder it
+## is kept in memory. A file the index can not describe (a dict changed
+## after its definition, entries built by code ...) is imported as usual.
+
+__title__ = "lazy parameter registry"
+__Comment__ = 'index the Params dicts of the cq_parameters files and build only the requested variants'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import os, sys
+import ast
+import json
+import marshal
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import cq_cache
+
+FNME_index = "param_index.sqlite" # in cq_cache.cacheDir()
+
+try:
+    import __builtin__ as builtins
+except ImportError: # python 3
+    import builtins
+
+_connection = None
+_modules = {}   # path: loaded module
+
+def connection():
+    """ Return the connection to the index, created on first use """
+    global _connection
+    if _connection is None:
+        folder = cq_cache.cacheDir()
+        filepath = ':memory:'
+        if folder is not None:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            filepath = os.path.join(folder, FNME_index)
+        _connection = sqlite3.connect(filepath, timeout=60)
+        with _connection:
+            _connection.execute("CREATE TABLE IF NOT EXISTS modules "
+                                "(path TEXT PRIMARY KEY, digest TEXT, preamble BLOB, imports TEXT)")
+            _connection.execute("CREATE TABLE IF NOT EXISTS variants "
+                                "(path TEXT, tbl TEXT, pos INTEGER, name TEXT, code BLOB)")
+            _connection.execute("CREATE INDEX IF NOT EXISTS variants_name ON variants (path, tbl, name)")
+    return _connection
+
+class LazyParams(object):
+    """ Read only dict of Params, every entry is built on first access.
+
+    copy() and update() combine the tables of several modules like the
+    dicts they replace; update() also takes plain dicts. """
+    def __init__(self, loaders=None):
+        self._loaders = OrderedDict() if loaders is None else OrderedDict(loaders)
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self._values[name] = self._loaders[name](name)
+        return self._values[name]
+
+    def get(self, name, default=None):
+        if name not in self._loaders:
+            return default
+        return self[name]
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def keys(self):
+        return list(self._loaders)
+
+    def values(self):
+        return [self[name] for name in self._loaders]
+
+    def items(self):
+        return [(name, self[name]) for name in self._loaders]
+
+    def copy(self):
+        lazy = LazyParams(self._loaders)
+        lazy._values.update(self._values)
+        return lazy
+
+    def update(self, other):
+        if isinstance(other, LazyParams):
+            for name in other._loaders:
+                self._loaders[name] = other._loaders[name]
+                self._values.pop(name, None)
+                if name in other._values:
+                    self._values[name] = other._values[name]
+        else:
+            for name in other:
+                self._loaders[name] = lambda name, value=other[name]: value
+                self._values[name] = other[name]
+
+class LazyModule(object):
+    """ Stand-in of a parameter module: its top level names, the dicts as LazyParams """
+    def __init__(self, name, path, namespace):
+        self.__name__ = name
+        self.__file__ = path
+        self.__dict__.update((k, v) for k, v in namespace.items() if not k.startswith('__'))
+
+def _digest(source):
+    # the index holds code objects, they depend on the python version
+    return hashlib.sha1(source + sys.version.encode('utf-8')).hexdigest()
+
+def _stringKey(node):
+    try:
+        key = ast.literal_eval(node)
+    except ValueError:
+        return None
+    return key if isinstance(key, (type(''), type(u''))) else None
+
+def _names(node):
+    return set(n.id for n in ast.walk(node) if isinstance(n, ast.Name))
+
+def _compileModule(statements, path):
+    module = ast.Module(body=statements)
+    module.type_ignores = []    # python 3.8+
+    return compile(module, path, 'exec')
+
+def indexSource(source, path):
+    """ Split the source of a parameter module into
+    (preamble code, [(kind, module, name)] sibling imports,
+     [(table, [(name, code)])]), None when it can not be indexed """
+    tree = ast.parse(source, path)
+    folder = os.path.dirname(path)
+    tables = OrderedDict()
+    preamble = []
+    imports = []
+    for statement in tree.body:
+        if (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and
+                isinstance(statement.targets[0], ast.Name) and isinstance(statement.value, ast.Dict)):
+            keys = [_stringKey(k) for k in statement.value.keys]
+            if keys and None not in keys:
+                table = statement.targets[0].id
+                if table in tables:
+                    return None
+                # a repeated key keeps its first position and its last value, like a dict
+                tables[table] = list(OrderedDict(zip(keys, statement.value.values)).items())
+                continue
+        # the parameter files of a family import each other: loaded lazily too
+        if isinstance(statement, ast.Import) and all(
+                os.path.isfile(os.path.join(folder, a.name+'.py')) for a in statement.names):
+            imports += [('import', a.name, a.asname or a.name) for a in statement.names]
+            continue
+        if (isinstance(statement, ast.ImportFrom) and statement.level == 0 and
+                [a.name for a in statement.names] == ['*'] and
+                os.path.isfile(os.path.join(folder, statement.module+'.py'))):
+            imports.append(('star', statement.module, None))
+            continue
+        preamble.append(statement)
+
+    # the entries are built apart: nothing may refer to a whole table
+    for statement in preamble:
+        if _names(statement) & set(tables):
+            return None
+    entries = []
+    for table in tables:
+        codes = []
+        for name, value in tables[table]:
+            if _names(value) & set(tables):
+                return None
+            expression = ast.Expression(body=value)
+            codes.append((name, compile(expression, path, 'eval')))
+        entries.append((table, codes))
+    return _compileModule(preamble, path), imports, entries
+
+def _storeIndex(db, path, digest, indexed):
+    preamble, imports, entries = indexed
+    with db:
+        db.execute("DELETE FROM variants WHERE path=?", (path,))
+        db.execute("INSERT OR REPLACE INTO modules VALUES (?, ?, ?, ?)",
+                   (path, digest, sqlite3.Binary(marshal.dumps(preamble)), json.dumps(imports)))
+        db.executemany("INSERT INTO variants VALUES (?, ?, ?, ?, ?)",
+                       [(path, table, pos, name, sqlite3.Binary(marshal.dumps(code)))
+                        for table, codes in entries for pos, (name, code) in enumerate(codes)])
+
+def _run(code, namespace):
+    exec(code, namespace)
+
+def _findModule(name, search_path):
+    for folder in search_path:
+        path = os.path.join(folder or '.', name + '.py')
+        if os.path.isfile(path):
+            return os.path.realpath(path)
+    return None
+
+def loadModule(name, search_path=None):
+    """ Return the parameter module `name` with lazily built dicts.
+
+    The module is searched in search_path (default sys.path); a module
+    the index can not describe is imported as usual. """
+    path = _findModule(name, search_path if search_path is not None else sys.path)
+    if path is None:
+        return __import__(name)
+    if path in _modules:
+        return _modules[path]
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = _digest(source)
+    db = connection()
+    row = db.execute("SELECT digest, preamble, imports FROM modules WHERE path=?", (path,)).fetchone()
+    if row is None or row[0] != digest:
+        indexed = indexSource(source, path)
+        if indexed is None:
+            return __import__(name)
+        _storeIndex(db, path, digest, indexed)
+        row = db.execute("SELECT digest, preamble, imports FROM modules WHERE path=?", (path,)).fetchone()
+
+    namespace = {'__name__': name, '__file__': path, '__builtins__': builtins}
+    folder = [os.path.dirname(path)]
+    for kind, module, asname in json.loads(row[2]):
+        imported = loadModule(module, folder)
+        if kind == 'import':
+            namespace[str(asname)] = imported
+        else:
+            namespace.update((k, v) for k, v in vars(imported).items() if not k.startswith('_'))
+    _run(marshal.loads(bytes(row[1])), namespace)
+
+    def build(table):
+        def loader(variant):
+            code = db.execute("SELECT code FROM variants WHERE path=? AND tbl=? AND name=?",
+                              (path, table, variant)).fetchone()[0]
+            return eval(marshal.loads(bytes(code)), namespace)
+        return loader
+    tables = OrderedDict()
+    for table, variant in db.execute("SELECT tbl, name FROM variants WHERE path=? ORDER BY rowid", (path,)):
+        tables.setdefault(str(table), []).append(variant)
+    for table, variants in tables.items():
+        loader = build(table)
+        namespace[table] = LazyParams((variant, loader) for variant in variants)
+
+    module = LazyModule(name, path, namespace)
+    _modules[path] = module
+    return module
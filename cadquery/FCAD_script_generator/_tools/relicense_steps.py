@@ -0,0 +1,213 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* bulk relicensing: rewrites the header of every STEP file of a tree       *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## STEP_add_license.py relicenses one folder from inside FreeCAD. The header
+## rewrite (add_license.addLicenseToStep) is plain text processing, so this
+## script runs it from plain python over a whole library tree
+## (e.g. _3Dmodels with its *.3dshapes folders) across a process pool.
+##
+## usage:
+##   python relicense_steps.py ../_3Dmodels --author "your name" --email "your email" -j 8
+##   python relicense_steps.py Package_DFN_QFN.3dshapes --license-file LICENSE.txt --org FreeCAD
+##
+## every folder holding STEP files gets a _StepFileHashes.txt manifest with the
+## sha1 of each file as written by the last run and of the license settings.
+## Files whose hash still matches are skipped; changed license settings or
+## --force relicense everything again.
+
+__title__ = "bulk relicensing of STEP files"
+__Comment__ = 'rewrite the license header of all STEP files of a tree in parallel, skipping the unchanged ones'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import time
+import hashlib
+from collections import namedtuple
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import add_license
+
+FNME_hashfile = "_StepFileHashes.txt" # stored in every STEP folder
+step_extensions = ('.step', '.stp')
+
+LicenseSettings = namedtuple('LicenseSettings', ['license', 'author', 'email', 'org_sys', 'org', 'preproc'])
+
+# outcome of a single file
+# status: 'licensed', 'skipped' or 'failed'
+FileResult = namedtuple('FileResult', ['folder', 'filename', 'status', 'sha1', 'error'])
+
+def default_jobs():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def fileHash(filepath):
+    h = hashlib.sha1()
+    with open(filepath, 'rb') as f:
+        while True:
+            chunk = f.read(add_license.copy_buffer_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def settingsHash(settings):
+    # a new SOURCE_DATE_EPOCH re-stamps the files too
+    stamp = os.environ.get('SOURCE_DATE_EPOCH', '').strip()
+    return hashlib.sha1(repr((tuple(settings), stamp)).encode('utf-8')).hexdigest()
+
+def readManifest(folder, settings_hash):
+    """ Return {filename: sha1} of the manifest of folder
+
+    an empty dict when there is none or it was written with other settings """
+    filepath = os.path.join(folder, FNME_hashfile)
+    hashes = {}
+    if not os.path.isfile(filepath):
+        return hashes
+    with open(filepath) as f:
+        lines = f.read().splitlines()
+    if not lines or lines[0] != '# settings ' + settings_hash:
+        return hashes
+    for line in lines[1:]:
+        if line and not line.startswith('#'):
+            sha1, filename = line.split(' ', 1)
+            hashes[filename.strip()] = sha1
+    return hashes
+
+def writeManifest(folder, settings_hash, hashes):
+    with open(os.path.join(folder, FNME_hashfile), 'w') as f:
+        f.write('# settings ' + settings_hash + '\n')
+        for filename in sorted(hashes):
+            f.write(hashes[filename] + '  ' + filename + '\n')
+
+def findStepFolders(roots):
+    """ Return [(folder, [step file names])] below the given folders """
+    folders = []
+    for root in roots:
+        for folder, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            steps = sorted(f for f in filenames if os.path.splitext(f)[1] in step_extensions)
+            if steps:
+                folders.append((folder, steps))
+    return folders
+
+def _quiet():
+    add_license.verbose = False
+
+def relicenseFile(job):
+    """ Relicense one file unless its hash matches the manifest, returns a FileResult """
+    folder, filename, known_hash, settings = job
+    try:
+        filepath = os.path.join(folder, filename)
+        if known_hash is not None and fileHash(filepath) == known_hash:
+            return FileResult(folder, filename, 'skipped', known_hash, None)
+        # an empty first line selects the built in license text of add_license
+        license = list(settings.license) if settings.license else [""]
+        if not add_license.addLicenseToStep(folder, filename, license, settings.author,
+                                            settings.email, settings.org_sys, settings.org,
+                                            settings.preproc):
+            return FileResult(folder, filename, 'failed', None, 'no STEP header found')
+        return FileResult(folder, filename, 'licensed', fileHash(filepath), None)
+    except Exception as e:
+        return FileResult(folder, filename, 'failed', None, '%s: %s' % (type(e).__name__, e))
+
+def relicenseTree(roots, settings, jobs=None, force=False, progress=None):
+    """ Relicense all the STEP files below roots, returns the list of FileResult """
+    settings_hash = settingsHash(settings)
+    folders = findStepFolders(roots)
+    manifests = {}
+    work = []
+    for folder, steps in folders:
+        manifests[folder] = {} if force else readManifest(folder, settings_hash)
+        for filename in steps:
+            work.append((folder, filename, manifests[folder].get(filename), settings))
+
+    jobs = jobs or default_jobs()
+    if jobs > 1 and len(work) > 1:
+        from multiprocessing import Pool
+        pool = Pool(jobs, _quiet)
+        outcomes = pool.imap_unordered(relicenseFile, work, 8)
+    else:
+        pool = None
+        _quiet()
+        outcomes = (relicenseFile(job) for job in work)
+    results = []
+    try:
+        for result in outcomes:
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # failed files stay out of the manifest and are retried on the next run
+    for folder, steps in folders:
+        hashes = dict((r.filename, r.sha1) for r in results
+                      if r.folder == folder and r.sha1 is not None)
+        if hashes != manifests[folder] or force:
+            writeManifest(folder, settings_hash, hashes)
+    return results
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='rewrite the license header of the STEP files of a model tree')
+    parser.add_argument('roots', nargs='+', help='folders to walk, e.g. _3Dmodels or a .3dshapes folder')
+    parser.add_argument('-j', '--jobs', type=int, default=default_jobs(), help='number of processes')
+    parser.add_argument('--force', action='store_true', help='ignore the hash manifests and relicense every file')
+    parser.add_argument('--license-file', default=None,
+                        help='text of the license, one comment line per line (default: the GPL text of add_license)')
+    parser.add_argument('--author', default=add_license.STR_int_licAuthor)
+    parser.add_argument('--email', default=add_license.STR_int_licEmail)
+    parser.add_argument('--org-sys', default=add_license.STR_int_licOrgSys, help='originating system')
+    parser.add_argument('--org', default=add_license.STR_int_licOrg, help='organization')
+    parser.add_argument('--preproc', default=add_license.STR_int_licPreProc, help='preprocessor version')
+    parser.add_argument('-v', '--verbose', action='store_true', help='list every file')
+    args = parser.parse_args(argv)
+
+    license = ()
+    if args.license_file:
+        with open(args.license_file) as f:
+            license = tuple(f.read().splitlines())
+    settings = LicenseSettings(license, args.author, args.email, args.org_sys, args.org, args.preproc)
+
+    def progress(result):
+        if args.verbose or result.status == 'failed':
+            print('%-8s %s%s' % (result.status, os.path.join(result.folder, result.filename),
+                                 '  ('+result.error+')' if result.error else ''))
+            sys.stdout.flush()
+
+    start = time.time()
+    results = relicenseTree(args.roots, settings, args.jobs, args.force, progress)
+    counts = dict((status, sum(1 for r in results if r.status == status))
+                  for status in ('licensed', 'skipped', 'failed'))
+    print('%d STEP files: %d licensed, %d up to date, %d failed in %.1fs' % (
+          len(results), counts['licensed'], counts['skipped'], counts['failed'], time.time() - start))
+    return 1 if counts['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
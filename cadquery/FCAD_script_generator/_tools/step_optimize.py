@@ -0,0 +1,274 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* STEP optimizer: merges duplicated entities, rounds coordinates           *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## The OCC STEP writer emits a new CARTESIAN_POINT, DIRECTION, placement,
+## pcurve ... for every use, and a whole style chain for every colored face.
+## This pass rewrites the DATA section of a STEP file:
+## - entities of the types in mergeable_entities that are equal once their
+##   references are merged are written once, the references are redirected
+## - the entities are renumbered from #1 in file order, comments and
+##   line breaks inside the entities are dropped
+## - optionally the coordinates of CARTESIAN_POINTs are rounded to
+##   `precision` decimals (mm), making nearly equal points mergeable too
+## Topology (vertices, edges, faces ...) is never merged: two solids
+## touching each other keep their own vertices and edges.
+##
+##   result = step_optimize.optimizeStepFile('model.step', precision=6)
+##   python step_optimize.py --precision 6 ../_3Dmodels/*.3dshapes/*.step
+##
+## The header (and the license in it) is copied unchanged.
+
+__title__ = "STEP file optimizer"
+__Comment__ = 'merge the duplicated geometry and style entities of a STEP file and round its coordinates'
+
+___ver___ = "1.0.0 18/10/2026"
+
+import sys, os
+import re
+import shutil
+import tempfile
+from collections import namedtuple
+
+tools_dir = os.path.dirname(os.path.realpath(__file__))
+if tools_dir not in sys.path:
+    sys.path.append(tools_dir)
+import add_license
+
+# geometry and presentation entities, sharing them is legal and does not
+# change the shape
+mergeable_entities = frozenset((
+    'CARTESIAN_POINT', 'DIRECTION', 'VECTOR',
+    'AXIS1_PLACEMENT', 'AXIS2_PLACEMENT_2D', 'AXIS2_PLACEMENT_3D',
+    'LINE', 'CIRCLE', 'ELLIPSE', 'B_SPLINE_CURVE_WITH_KNOTS',
+    'PLANE', 'CYLINDRICAL_SURFACE', 'CONICAL_SURFACE', 'SPHERICAL_SURFACE',
+    'TOROIDAL_SURFACE', 'SURFACE_OF_LINEAR_EXTRUSION', 'SURFACE_OF_REVOLUTION',
+    'B_SPLINE_SURFACE_WITH_KNOTS',
+    'PCURVE', 'DEFINITIONAL_REPRESENTATION',
+    'COLOUR_RGB', 'DRAUGHTING_PRE_DEFINED_COLOUR', 'FILL_AREA_STYLE_COLOUR',
+    'FILL_AREA_STYLE', 'SURFACE_STYLE_FILL_AREA', 'SURFACE_SIDE_STYLE',
+    'SURFACE_STYLE_USAGE', 'PRESENTATION_STYLE_ASSIGNMENT',
+    'CURVE_STYLE', 'DRAUGHTING_PRE_DEFINED_CURVE_FONT',
+    ))
+
+# post-processing of the exports of cq_cad_tools.exportSTEP and
+# cq_headless.exportSTEPheadless, off by default; in a generator:
+#   import step_optimize
+#   step_optimize.optimize_exports = True
+#   step_optimize.export_precision = 6
+optimize_exports = False
+export_precision = None
+
+StepOptimizeResult = namedtuple('StepOptimizeResult', ['size_before', 'size_after',
+                                                       'entities_before', 'entities_after'])
+
+_string = re.compile(r"('[^']*')")
+_space = re.compile(r"\s+")
+_space_around = re.compile(r" ?([(),=]) ?")
+_instance = re.compile(r"#(\d+)\s*=\s*(.*)$", re.S)
+_reference = re.compile(r"#(\d+)")
+_type = re.compile(r"([A-Z][A-Z0-9_]*)\s*\(")
+_real = re.compile(r"[-+]?\d+\.\d*(?:[Ee][-+]?\d+)?")
+
+def _text(data):
+    if isinstance(data, str): # python 2
+        return data
+    return data.decode('latin-1')
+
+def _bytes(text):
+    if isinstance(text, bytes): # python 2
+        return text
+    return text.encode('latin-1')
+
+def _compact(text):
+    """ Split an entity (without comments) into [code, string, code, string ...]
+    parts, with the white space of the code parts reduced """
+    parts = _string.split(text)
+    for i in range(0, len(parts), 2):
+        code = _space.sub(' ', parts[i])
+        parts[i] = _space_around.sub(r'\1', code).strip() if code.strip() else ''
+    return parts
+
+def _formatReal(value, precision):
+    text = '%.*f' % (precision, value)
+    if '.' in text:
+        text = text.rstrip('0')
+    if text in ('-0.', '0.') or float(text) == 0.0:
+        return '0.'
+    return text
+
+def _roundReals(parts, precision):
+    rounded = list(parts)
+    for i in range(0, len(parts), 2):
+        rounded[i] = _real.sub(lambda m: _formatReal(float(m.group(0)), precision), parts[i])
+    return rounded
+
+def _references(parts):
+    return [int(r) for i in range(0, len(parts), 2) for r in _reference.findall(parts[i])]
+
+def _substitute(parts, number):
+    """ join the parts, the references renumbered by number(id) """
+    replace = lambda m: '#%d' % number(int(m.group(1)))
+    return ''.join(_reference.sub(replace, p) if i % 2 == 0 else p
+                   for i, p in enumerate(parts))
+
+def mergeEntities(entities, types, order):
+    """ Return {id: representative id} for the entities of the mergeable types
+
+    entities: {id: compacted parts}, types: {id: entity type}
+    an entity is a duplicate when its type and text are equal to an earlier
+    one once the references of both are replaced by their representatives """
+    rep = {}
+    keys = {}
+    active = set()
+    for root in order:
+        if root in rep or types.get(root) not in mergeable_entities:
+            continue
+        stack = [(root, False)]
+        while stack:
+            n, expanded = stack.pop()
+            if n in rep:
+                continue
+            if expanded:
+                active.discard(n)
+                key = _substitute(entities[n], lambda r: rep.get(r, r))
+                rep[n] = keys.setdefault(key, n)
+            elif n not in active: # n in active: a reference cycle, keep the raw id
+                active.add(n)
+                stack.append((n, True))
+                for r in _references(entities[n]):
+                    if r not in rep and types.get(r) in mergeable_entities:
+                        stack.append((r, False))
+    return rep
+
+def optimizeStepData(data, precision=None):
+    """ Optimize the DATA sections of a STEP file
+
+    data: the text after the header, from the first DATA line on
+    Returns (list of the statement lines, entities before, entities after) """
+    statements = []     # other statements (DATA; ENDSEC; ...) as text, entities as ids
+    entities = {}
+    types = {}
+    # the statements come without their comments (add_license's scanner)
+    all_statements, rest = add_license.splitStepStatements(data)
+    if rest.strip():
+        raise ValueError("unterminated statement at the end of the DATA section")
+    for statement in all_statements:
+        statement = statement[:-1].strip()
+        instance = _instance.match(statement)
+        if instance is None:
+            statements.append(''.join(_compact(statement)) + ';')
+            continue
+        n = int(instance.group(1))
+        parts = _compact(instance.group(2))
+        entity_type = _type.match(parts[0])
+        types[n] = entity_type.group(1) if entity_type is not None else None
+        if precision is not None and types[n] == 'CARTESIAN_POINT':
+            parts = _roundReals(parts, precision)
+        entities[n] = parts
+        statements.append(n)
+
+    order = [s for s in statements if not isinstance(s, str)]
+    rep = mergeEntities(entities, types, order)
+    numbers = {}
+    for n in order:
+        if rep.get(n, n) == n:
+            numbers[n] = len(numbers) + 1
+    for n, r in rep.items():
+        numbers[n] = numbers[r]
+    for n in order:
+        for r in _references(entities[n]):
+            if r not in numbers:
+                raise ValueError("reference to the undefined entity #%d in #%d" % (r, n))
+
+    lines = []
+    for s in statements:
+        if isinstance(s, str):
+            lines.append(s)
+        elif rep.get(s, s) == s:
+            lines.append('#%d = %s;' % (numbers[s], _substitute(entities[s], numbers.get)))
+    return lines, len(order), len(set(numbers.values()))
+
+def optimizeStepFile(filepath, precision=None, outpath=None):
+    """ Optimize a STEP file in place (or write it to outpath)
+
+    `precision` : decimals kept in the coordinates of the points, None keeps them
+    Returns a StepOptimizeResult """
+    size_before = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        header, positions, newline = add_license.readStepHeader(f)
+        if "A" not in positions:
+            raise ValueError("no DATA section in " + filepath)
+        start = f.tell()
+        f.seek(0)
+        header_bytes = f.read(start)
+        data = _text(f.read())
+    lines, entities_before, entities_after = optimizeStepData(data, precision)
+
+    outpath = outpath or filepath
+    fd, tmp = tempfile.mkstemp(prefix='.'+os.path.basename(outpath), suffix='.tmp',
+                               dir=os.path.dirname(os.path.abspath(outpath)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header_bytes)
+            f.write(_bytes(newline.join(lines) + newline))
+        if os.path.exists(outpath):
+            shutil.copymode(outpath, tmp)
+    except:
+        os.remove(tmp)
+        raise
+    add_license.replaceFile(tmp, outpath)
+    return StepOptimizeResult(size_before, os.path.getsize(outpath), entities_before, entities_after)
+
+def optimizeExport(StepFileName):
+    """ Optimize a freshly exported file when optimize_exports is set
+
+    Returns the StepOptimizeResult, None when disabled """
+    if not optimize_exports:
+        return None
+    return optimizeStepFile(StepFileName, export_precision)
+
+def describe(result):
+    saved = result.size_before - result.size_after
+    return '%d -> %d bytes (%.1f%% saved), %d -> %d entities' % (
+        result.size_before, result.size_after,
+        100.0 * saved / result.size_before if result.size_before else 0.0,
+        result.entities_before, result.entities_after)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='merge the duplicated entities of STEP files and round their coordinates')
+    parser.add_argument('files', nargs='+', help='STEP files, optimized in place')
+    parser.add_argument('-p', '--precision', type=int, default=None,
+                        help='decimals kept in point coordinates (default: keep them)')
+    args = parser.parse_args(argv)
+    total_before = total_after = 0
+    for filepath in args.files:
+        result = optimizeStepFile(filepath, args.precision)
+        total_before += result.size_before
+        total_after += result.size_after
+        print('%s: %s' % (filepath, describe(result)))
+    if len(args.files) > 1:
+        print('total: %d -> %d bytes, %d bytes saved' % (total_before, total_after,
+                                                         total_before - total_after))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -285,7 +285,7 @@ if __name__ == "__main__" or __name__ == "main_generator":
         #export_file_name=destination_dir+os.sep+ModelName+'.wrl'
         #export_file_name=script_dir+os.sep+destination_dir+os.sep+ModelName+'.wrl'
         export_file_name=out_dir+os.sep+ModelName+'.wrl'
-        colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+        colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
         expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
         # Save the doc in Native FC format
         saveFCdoc(App, Gui, doc, ModelName,out_dir)
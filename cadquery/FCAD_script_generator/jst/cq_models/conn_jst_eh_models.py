@@ -58,12 +58,6 @@ import FreeCAD
 from cq_helpers import *
 from conn_jst_eh_params import *
 
-def union_all(objects):
-    o = objects[0]
-    for i in range(1,len(objects)):
-        o = o.union(objects[i])
-    return o
-
 
 def generate_pins(params):
     if params.angled:
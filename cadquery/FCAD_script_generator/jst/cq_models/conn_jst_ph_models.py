@@ -58,12 +58,7 @@ from Helpers import show
 from collections import namedtuple
 import FreeCAD
 from conn_jst_ph_params import *
-
-def union_all(objects):
-    o = objects[0]
-    for i in range(1,len(objects)):
-        o = o.union(objects[i])
-    return o
+from cq_helpers import union_all
 
 
 def generate_pins(params):
@@ -138,7 +138,7 @@ import cq_cad_tools
 # Reload tools
 reload(cq_cad_tools)
 # Explicitly load all needed functions
-from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
+from cq_cad_tools import FuseObjs_wColors, compoundObjs_wColors, GetListOfObjects, restore_Main_Tools, \
  exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject
 
 # Gui.SendMsgToActiveView("Run")
@@ -171,7 +171,7 @@ sys.path.append("cq_models")
 import conn_jst_ph_models as ModelPH
 import conn_jst_eh_models as ModelEH
 import conn_jst_xh_models as ModelXH
-import step_license as L
+import add_license as L
 
 if float(cq.__version__[:-2]) < 0.3:
     msg="missing CadQuery 0.3.0 or later Module!\r\n\r\n"
@@ -218,14 +218,14 @@ def export_one_part(params, series):
             face_colors=None))
 
     scale=1/2.54
-    colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+    colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
     expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
 
-    fusion = FuseObjs_wColors(FreeCAD, FreeCADGui,
-                    ModelName, objs[0].Name, objs[1].Name, keepOriginals=True)
+    fusion = compoundObjs_wColors(FreeCAD, FreeCADGui,
+                    ModelName, objs[:2], keepOriginals=True)
     exportSTEP(doc,FileName,out_dir,fusion)
     L.addLicenseToStep(out_dir+'/', FileName+".step", LIST_license,\
-        STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licPreProc)
+        STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licPreProc=STR_licPreProc)
 
 
     FreeCAD.activeDocument().recompute()
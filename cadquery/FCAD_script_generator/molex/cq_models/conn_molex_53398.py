@@ -58,6 +58,7 @@ from math import sqrt
 from Helpers import show
 from collections import namedtuple
 import FreeCAD
+from cq_helpers import union_all
 
 #global parameter
 pin_width = 0.32
@@ -184,12 +185,6 @@ all_params = {
     "1571" : make_params(15, 'Molex_53398_1571')
 }
 
-def union_all(objects):
-    o = objects[0]
-    for i in range(1,len(objects)):
-        o = o.union(objects[i])
-    return o
-
 
 def generate_pins(params):
     num_pins = params.num_pins
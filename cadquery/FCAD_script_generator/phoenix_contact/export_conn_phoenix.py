@@ -139,7 +139,8 @@ import cq_cad_tools
 reload(cq_cad_tools)
 # Explicitly load all needed functions
 from cq_cad_tools import FuseObjs_wColors, GetListOfObjects, restore_Main_Tools, \
- exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors
+ exportSTEP, close_CQ_Example, saveFCdoc, z_RotateObject, multiFuseObjs_wColors, compoundObjs_wColors, \
+ profileStage, setProfileVariant
 
 # Gui.SendMsgToActiveView("Run")
 Gui.activateWorkbench("CadQueryWorkbench")
@@ -160,7 +161,7 @@ sys.path.append("cq_models")
 import conn_phoenix_mstb as MSTB
 import conn_phoenix_mc as MC
 #import conn_molex_53398 as M2
-import step_license as L
+import add_license as L
 
 def export_one_part(modul, variant, with_plug=False):
     if not variant in modul.all_params:
@@ -179,7 +180,9 @@ def export_one_part(modul, variant, with_plug=False):
     Gui.ActiveDocument=Gui.getDocument(ModelName)
     #App.setActiveDocument(ModelName)
     #Gui.ActiveDocument=Gui.getDocument(ModelName)
-    (pins, body, insert, mount_screw, plug, plug_screws) = modul.generate_part(variant, with_plug)
+    setProfileVariant(ModelName)
+    with profileStage('make_part'):
+        (pins, body, insert, mount_screw, plug, plug_screws) = modul.generate_part(variant, with_plug)
 
     color_attr = body_color + (0,)
     show(body, color_attr)
@@ -260,15 +263,15 @@ def export_one_part(modul, variant, with_plug=False):
                 shape_color=screw_color_key,
                 face_colors=None))
     scale=1/2.54
-    colored_meshes = expVRML.getColoredMesh(Gui, export_objects , scale)
+    colored_meshes = expVRML.iterColoredMesh(Gui, export_objects , scale)
     expVRML.writeVRMLFile(colored_meshes, export_file_name, used_color_keys, LIST_license)
 
-    fusion = multiFuseObjs_wColors(FreeCAD, FreeCADGui,
+    fusion = compoundObjs_wColors(FreeCAD, FreeCADGui,
                      ModelName, objs, keepOriginals=True)
 
     exportSTEP(doc,FileName,out_dir,fusion)
     L.addLicenseToStep(out_dir+'/', FileName+".step", LIST_license,\
-        STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licPreProc)
+        STR_licAuthor, STR_licEmail, STR_licOrgSys, STR_licPreProc=STR_licPreProc)
 
     saveFCdoc(App, Gui, doc, FileName,out_dir)
 
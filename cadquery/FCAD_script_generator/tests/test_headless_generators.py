@@ -0,0 +1,84 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* checks of the generators run by FreeCADCmd (FreeCAD.GuiUp false)         *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## The generators run by cq_batch_worker in FreeCADCmd, where FreeCADGui
+## can't be imported and `Gui` is not defined. FreeCAD, Part and cadquery
+## are replaced by modules without geometry: the variant asked for doesn't
+## exist, so a generator only has to get to its variant loop.
+##
+##   python2 -m unittest discover -s tests
+
+import sys, os
+import json
+import types
+import unittest
+
+generators_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+tools_dir = os.path.join(generators_dir, '_tools')
+
+class _Console(object):
+    def PrintMessage(self, msg):
+        pass
+    PrintWarning = PrintError = PrintMessage
+
+def _headlessModules():
+    FreeCAD = types.ModuleType('FreeCAD')
+    FreeCAD.GuiUp = False
+    FreeCAD.Console = _Console()
+    FreeCAD.Version = lambda: ['0', '17', '']
+    FreeCAD.getUserAppDataDir = lambda: generators_dir
+    FreeCAD.getHomePath = lambda: generators_dir
+    cadquery = types.ModuleType('cadquery')
+    cadquery.__version__ = '1.2.0'
+    modules = {'FreeCAD': FreeCAD, 'cadquery': cadquery}
+    for name in ('Draft', 'Part', 'Mesh'):
+        modules[name] = types.ModuleType(name)
+    return modules
+
+@unittest.skipUnless(sys.version_info[0] == 2, "the generators are python 2 scripts")
+class HeadlessGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (os.getcwd(), list(sys.path), list(sys.argv), dict(sys.modules), dict(os.environ))
+        sys.modules.update(_headlessModules())
+        sys.path.insert(0, tools_dir)
+
+    def tearDown(self):
+        cwd, path, argv, modules, environ = self.saved
+        os.chdir(cwd)
+        sys.path[:] = path
+        sys.argv[:] = argv
+        sys.modules.clear()
+        sys.modules.update(modules)
+        os.environ.clear()
+        os.environ.update(environ)
+
+    def runGenerator(self, family, script='main_generator.py', args=('NO-SUCH-VARIANT',)):
+        import cq_batch_worker
+        os.environ['CQ_BATCH_SCRIPT'] = os.path.join(generators_dir, family, script)
+        os.environ['CQ_BATCH_ARGS'] = json.dumps(list(args))
+        return cq_batch_worker.run_job()
+
+    def test_qfn_without_gui(self):
+        result = self.runGenerator('QFN_packages')
+        self.assertEqual(result['status'], 'ok', result.get('traceback'))
+
+if __name__ == '__main__':
+    unittest.main()
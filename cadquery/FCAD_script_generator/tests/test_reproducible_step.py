@@ -0,0 +1,87 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* checks of the reproducible STEP output (add_license)                     *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+## reference-block.step of the repository root is the exported model.
+
+import sys, os
+import shutil
+import tempfile
+import unittest
+
+generators_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(generators_dir, '_tools'))
+import add_license
+
+fixture = os.path.join(generators_dir, '..', '..', 'reference-block.step')
+
+class ReproducibleStepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved_epoch = os.environ.get('SOURCE_DATE_EPOCH')
+        self.saved_verbose = add_license.verbose
+        add_license.verbose = False
+        self.dir = tempfile.mkdtemp()
+        self.step = os.path.join(self.dir, 'model.step')
+        shutil.copy(fixture, self.step)
+
+    def tearDown(self):
+        if self.saved_epoch is None:
+            os.environ.pop('SOURCE_DATE_EPOCH', None)
+        else:
+            os.environ['SOURCE_DATE_EPOCH'] = self.saved_epoch
+        add_license.verbose = self.saved_verbose
+        shutil.rmtree(self.dir)
+
+    def relicense(self, epoch):
+        os.environ['SOURCE_DATE_EPOCH'] = epoch
+        add_license.addLicenseToStep(self.dir, 'model.step', [""], "author", "email")
+        with open(self.step, 'rb') as f:
+            return f.read()
+
+    def test_same_epoch_same_bytes(self):
+        first = self.relicense('1500000000')
+        shutil.copy(fixture, self.step)
+        self.assertEqual(self.relicense('1500000000'), first)
+
+    def test_digest_ignores_the_header(self):
+        digest = add_license.stepDataDigest(self.step)
+        self.relicense('1600000000')
+        self.assertEqual(add_license.stepDataDigest(self.step), digest)
+
+    def test_malformed_epoch(self):
+        os.environ['SOURCE_DATE_EPOCH'] = '2026-10-18'
+        with self.assertRaises(ValueError) as context:
+            add_license.buildDate()
+        self.assertTrue('SOURCE_DATE_EPOCH' in str(context.exception))
+
+    def test_stable_export(self):
+        self.assertTrue(add_license.checkStableExport(lambda filepath: shutil.copy(fixture, filepath), self.step))
+
+    def test_renumbered_export(self):
+        def renumbered(filepath):
+            with open(fixture) as f:
+                text = f.read()
+            with open(filepath, 'w') as f:
+                f.write(text.replace('#1 =', '#0 ='))
+        self.assertFalse(add_license.checkStableExport(renumbered, self.step))
+        self.assertEqual(os.listdir(self.dir), ['model.step'])
+
+if __name__ == '__main__':
+    unittest.main()
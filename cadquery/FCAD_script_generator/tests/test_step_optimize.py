@@ -0,0 +1,60 @@
+# -*- coding: utf8 -*-
+#****************************************************************************
+#* These are a FreeCAD & cadquery tools                                     *
+#* to export generated models in STEP & VRML format.                        *
+#*                                                                          *
+#* checks of the STEP statement scanner of step_optimize                    *
+#*                                                                          *
+#*   This program is free software; you can redistribute it and/or modify   *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)     *
+#*   as published by the Free Software Foundation; either version 2 of      *
+#*   the License, or (at your option) any later version.                    *
+#*   for detail see the LICENCE text file.                                  *
+#*                                                                          *
+#*   This program is distributed in the hope that it will be useful,        *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of         *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the          *
+#*   GNU Library General Public License for more details.                   *
+#*                                                                          *
+#****************************************************************************
+
+import sys, os
+import time
+import unittest
+
+generators_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(generators_dir, '_tools'))
+import add_license
+import step_optimize
+
+class StepStatementTest(unittest.TestCase):
+
+    def test_strings_and_comments(self):
+        statements, rest = add_license.splitStepStatements(
+            "DATA;\n#1 = PRODUCT('a;b','it''s',/* c; 'd' */#2);\n#2 = X(); ENDSEC;")
+        self.assertEqual(statements, ["DATA;", "\n#1 = PRODUCT('a;b','it''s',#2);",
+                                      "\n#2 = X();", " ENDSEC;"])
+        self.assertEqual(rest, "")
+
+    def test_unterminated(self):
+        for tail in ("#3 = X('abc", "#3 = X(/* abc", "#3 = X(#1"):
+            statements, rest = add_license.splitStepStatements("DATA;\n#1 = X();\n" + tail)
+            self.assertEqual(len(statements), 2)
+            self.assertTrue(rest.strip().startswith("#3"))
+
+    def test_truncated_file_fails_fast(self):
+        data = "DATA;\n#1 = X('" + "a/b" * 20000
+        start = time.time()
+        self.assertRaises(ValueError, step_optimize.optimizeStepData, data)
+        self.assertTrue(time.time() - start < 1.0)
+
+    def test_merge(self):
+        lines, before, after = step_optimize.optimizeStepData(
+            "DATA;\n#1 = CARTESIAN_POINT('',(0.,0.,1.));\n#2 = CARTESIAN_POINT('', ( 0.,0.,1. ) );\n"
+            "#3 = VERTEX_POINT('',#2);\nENDSEC;\n")
+        self.assertEqual(lines, ["DATA;", "#1 = CARTESIAN_POINT('',(0.,0.,1.));",
+                                 "#2 = VERTEX_POINT('',#1);", "ENDSEC;"])
+        self.assertEqual((before, after), (3, 2))
+
+if __name__ == '__main__':
+    unittest.main()